@@ -1,36 +1,72 @@
-from flask import Flask, request, jsonify, render_template, session, redirect, url_for
-from ultralytics import YOLO
+from flask import Flask, request, jsonify, render_template, session, redirect, url_for, g
 import firebase_admin
 from firebase_admin import credentials, firestore
 from firebase_admin.exceptions import FirebaseError
 import os
 import cv2
+import numpy as np
 import threading
 from datetime import datetime
 import time
-import easyocr
+from detection_service import (tracer, recognize_plate, save_plate_crop, plate_grammar, canonical_plate,
+                               registrable_plate)
+from tracing import register_metrics_route
 
 app = Flask(__name__)
-app.secret_key = os.urandom(24)  # Secure secret key
+app.secret_key = os.environ.get('GATE_SECRET_KEY') or os.urandom(24)  # Secure secret key
 
-# ========== SYSTEM INITIALIZATION ==========
-# Initialize OCR reader
-reader = easyocr.Reader(['en'])
+# ========== LATENCY TRACING ==========
+register_metrics_route(app, tracer, extra=plate_grammar.prometheus_text)
 
-# ========== MODELS INITIALIZATION ==========
-plate_model = YOLO(r"C:\Users\siyam\Documents\thesis-1\content\runs\license_plate_model2\weights\best.pt")
-object_model = YOLO("yolov8n.pt")
+@app.before_request
+def start_request_timer():
+    g.start_time = time.time()
 
-# ========== FIREBASE INITIALIZATION ==========
-cred = credentials.Certificate("serviceAccountKey.json")
-firebase_admin.initialize_app(cred)
-db = firestore.client()
+@app.after_request
+def record_request_time(response):
+    if request.endpoint and request.endpoint != 'metrics':
+        tracer.record_span(f"http_{request.endpoint}", g.start_time, time.time())
+    return response
+
+# Models and OCR are loaded by detection_service
 
-# Collection references
-drivers_ref = db.collection('drivers')
-plates_ref = db.collection('plates')
-admins_ref = db.collection('admins')
-users_ref = db.collection('users')
+# ========== FIREBASE INITIALIZATION ==========
+def connect_firestore():
+    """Create the Firestore client and collection references.
+
+    GATE_DB=memory uses the in-process stand-in from memory_firestore.py
+    (seeded from GATE_DB_SEED) for load tests. gunicorn.conf.py calls this
+    again in every worker because gRPC channels must not cross a fork.
+    """
+    global db, drivers_ref, plates_ref, admins_ref, users_ref
+    if os.environ.get('GATE_DB') == 'memory':
+        from memory_firestore import MemoryClient
+        db = MemoryClient(seed_path=os.environ.get('GATE_DB_SEED'))
+    else:
+        try:
+            firebase_admin.delete_app(firebase_admin.get_app())
+        except ValueError:
+            pass  # Not initialized yet
+        cred = credentials.Certificate("serviceAccountKey.json")
+        firebase_admin.initialize_app(cred)
+        db = firestore.client()
+
+    # Collection references
+    drivers_ref = db.collection('drivers')
+    plates_ref = db.collection('plates')
+    admins_ref = db.collection('admins')
+    users_ref = db.collection('users')
+
+connect_firestore()
+
+def find_plate(plate):
+    """(document id, snapshot) for a plate, trying its canonical form, then the text as
+    typed (plates stored before canonicalization)"""
+    for plate_id in dict.fromkeys([canonical_plate(plate), plate]):
+        plate_doc = plates_ref.document(plate_id).get()
+        if plate_doc.exists:
+            break
+    return plate_id, plate_doc
 
 def init_firebase():
     """Initialize Firebase collections with default data"""
@@ -44,22 +80,6 @@ def init_firebase():
     except FirebaseError as e:
         print(f"Firebase initialization error: {e}")
 
-def extract_plate_text(plate_img):
-    """Enhanced plate text extraction with EasyOCR"""
-    try:
-        # Preprocess image
-        gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY)
-        clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
-        enhanced = clahe.apply(gray)
-        _, thresh = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        
-        # OCR with character whitelist
-        results = reader.readtext(thresh, detail=0, allowlist='0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ')
-        return results[0] if results else ""
-    except Exception as e:
-        print(f"OCR error: {e}")
-        return ""
-
 def process_capture_request():
     """Process image capture request"""
     print("Processing capture request")
@@ -73,59 +93,39 @@ def process_capture_request():
         cv2.imwrite(save_path, frame)
         
         # Process the image
-        process_detection(frame, save_path)
+        process_detection(frame, save_crop=True)
     else:
         print("Failed to capture image")
     
     cap.release()
 
-def process_detection(frame, image_path=None):
+def process_detection(frame, save_crop=False):
     """Process frame for vehicles and license plates"""
-    # Vehicle detection
-    vehicle_results = object_model(frame, verbose=False)
-    vehicle_detected = any(int(box.cls) in [2, 3, 5, 7]  # Cars, motorcycles, buses, trucks
-                          for result in vehicle_results 
-                          for box in result.boxes)
-    
-    if not vehicle_detected:
-        print("No vehicle detected")
+    detection = recognize_plate(frame)
+    if detection is None:
         return None
+    plate_text, coordinates, plate_img = detection
     
-    # License plate recognition
-    plate_results = plate_model(frame, conf=0.5, verbose=False)
-    authorized = False
+    # Check database
+    with tracer.span('authorization'):
+        plate_doc = plates_ref.document(plate_text).get()
+    authorized = plate_doc.exists
     
-    for result in plate_results:
-        for box in result.boxes.xyxy.cpu().numpy():
-            x1, y1, x2, y2 = map(int, box)
-            plate_img = frame[y1:y2, x1:x2]
-            
-            plate_text = extract_plate_text(plate_img)
-            if plate_text:
-                print(f"Detected plate: {plate_text}")
-                # Check database
-                plate_doc = plates_ref.document(plate_text).get()
-                authorized = plate_doc.exists
-                
-                # Print access status
-                if authorized:
-                    print(f"Access granted for {plate_text}")
-                else:
-                    print(f"Access denied for {plate_text}")
-                
-                # Save plate image if path provided
-                if image_path:
-                    plate_path = f"captures/plate_{plate_text}_{datetime.now().strftime('%H%M%S')}.jpg"
-                    cv2.imwrite(plate_path, plate_img)
-                
-                return {
-                    'plate': plate_text,
-                    'authorized': authorized,
-                    'coordinates': [x1, y1, x2, y2]
-                }
+    # Print access status
+    if authorized:
+        print(f"Access granted for {plate_text}")
+    else:
+        print(f"Access denied for {plate_text}")
     
-    print("No valid license plates detected")
-    return None
+    # Save plate image if requested
+    if save_crop:
+        save_plate_crop(plate_text, plate_img)
+    
+    return {
+        'plate': plate_text,
+        'authorized': authorized,
+        'coordinates': coordinates
+    }
 
 # ========== ROUTES ==========
 @app.route('/')
@@ -209,7 +209,7 @@ def dashboard():
 
 @app.route('/check_plate', methods=['GET'])
 def check_plate():
-    plate = request.args.get('plate')
+    plate = canonical_plate(request.args.get('plate'))
     if not plate:
         return jsonify({"error": "Plate number required"}), 400
     plate_doc = plates_ref.document(plate).get()
@@ -249,9 +249,12 @@ def update_plate():
 
     if not old_plate or not new_plate:
         return jsonify({"message": "Old and new plate numbers are required"}), 400
+    new_plate = registrable_plate(new_plate)
+    if not new_plate:
+        return jsonify({"message": "New plate number does not match any known plate format"}), 400
 
     try:
-        old_doc = plates_ref.document(old_plate).get()
+        old_plate, old_doc = find_plate(old_plate)
         if not old_doc.exists:
             return jsonify({"message": "Original plate not found"}), 404
 
@@ -288,7 +291,7 @@ def delete_plate():
         if not plate:
             return jsonify({"message": "Plate number required"}), 400
 
-        plate_doc = plates_ref.document(plate).get()
+        plate, plate_doc = find_plate(plate)
         if not plate_doc.exists:
             return jsonify({"message": "License plate not found"}), 404
 
@@ -316,10 +319,12 @@ def register_plate():
         return jsonify({"message": "Please log in to perform this action."}), 401
 
     id_number = request.form.get('id_number')
-    plate = request.form.get('plate')
+    plate = registrable_plate(request.form.get('plate'))
 
     if not session.get('is_admin') and id_number != session.get('user_id'):
         return jsonify({"message": "You can only register plates for your own ID."}), 403
+    if not plate:
+        return jsonify({"message": "Plate number does not match any known plate format"}), 400
 
     try:
         if plates_ref.document(plate).get().exists:
@@ -342,24 +347,18 @@ def detect():
     if 'image' not in request.files:
         return jsonify({"error": "No image provided"}), 400
         
-    file = request.files['image']
-    temp_path = "temp_upload.jpg"
-    file.save(temp_path)
-    
     try:
-        frame = cv2.imread(temp_path)
+        # Decode in memory: a shared temp file would be overwritten by concurrent requests
+        frame = cv2.imdecode(np.frombuffer(request.files['image'].read(), np.uint8), cv2.IMREAD_COLOR)
         if frame is None:
             return jsonify({"error": "Could not read image"}), 400
             
-        result = process_detection(frame, temp_path)
+        result = process_detection(frame, save_crop=True)
         if result:
             return jsonify(result)
         return jsonify({"message": "No valid license plates detected"}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
 
 @app.route('/delete_driver', methods=['POST'])
 def delete_driver():
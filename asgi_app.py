@@ -0,0 +1,397 @@
+#asgi_app.py
+#
+# Async variant of app.py for high fan-in from many gate controllers:
+#
+#   hypercorn asgi_app:app --bind 0.0.0.0:5000 --workers 2
+#
+# Routes and responses match app.py. Firestore calls use the async client,
+# so a waiting lookup does not hold a thread, and inference runs on a small
+# executor so it never blocks the event loop. Set GATE_SECRET_KEY when
+# running more than one worker so sessions are valid across workers.
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import cv2
+import numpy as np
+import firebase_admin
+from firebase_admin import credentials, firestore_async
+from quart import Quart, request, jsonify, render_template, session, redirect, url_for, g, Response
+
+from detection_service import (tracer, recognize_plate, save_plate_crop, plate_grammar, canonical_plate,
+                               registrable_plate)
+
+app = Quart(__name__)
+app.secret_key = os.environ.get('GATE_SECRET_KEY') or os.urandom(24)  # Secure secret key
+
+# YOLO predictors are not thread-safe, so one inference thread by default
+inference_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('GATE_INFERENCE_WORKERS', 1)),
+                                        thread_name_prefix="inference")
+
+# ========== LATENCY TRACING ==========
+@app.before_request
+async def start_request_timer():
+    g.start_time = time.time()
+
+@app.after_request
+async def record_request_time(response):
+    if request.endpoint and request.endpoint != 'metrics':
+        tracer.record_span(f"http_{request.endpoint}", g.start_time, time.time())
+    return response
+
+@app.route('/metrics')
+async def metrics():
+    return Response(tracer.prometheus_text() + plate_grammar.prometheus_text(),
+                    mimetype='text/plain; version=0.0.4')
+
+# ========== FIREBASE INITIALIZATION ==========
+def connect_firestore():
+    """Create the async Firestore client and collection references"""
+    global db, drivers_ref, plates_ref, admins_ref, users_ref
+    if os.environ.get('GATE_DB') == 'memory':
+        from memory_firestore import AsyncMemoryClient
+        db = AsyncMemoryClient(seed_path=os.environ.get('GATE_DB_SEED'))
+    else:
+        try:
+            firebase_admin.get_app()
+        except ValueError:
+            firebase_admin.initialize_app(credentials.Certificate("serviceAccountKey.json"))
+        db = firestore_async.client()
+
+    # Collection references
+    drivers_ref = db.collection('drivers')
+    plates_ref = db.collection('plates')
+    admins_ref = db.collection('admins')
+    users_ref = db.collection('users')
+
+connect_firestore()
+
+async def find_plate(plate):
+    """(document id, snapshot) for a plate, trying its canonical form, then the text as
+    typed (plates stored before canonicalization)"""
+    for plate_id in dict.fromkeys([canonical_plate(plate), plate]):
+        plate_doc = await plates_ref.document(plate_id).get()
+        if plate_doc.exists:
+            break
+    return plate_id, plate_doc
+
+@app.before_serving
+async def init_firebase():
+    """Initialize Firebase collections with default data"""
+    try:
+        if not (await admins_ref.document('admin').get()).exists:
+            await admins_ref.document('admin').set({
+                'username': 'admin',
+                'password': '12341234'
+            })
+            print("Firebase admin initialized")
+    except Exception as e:
+        print(f"Firebase initialization error: {e}")
+
+async def run_inference(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(inference_executor, func, *args)
+
+def decode_and_recognize(image_bytes):
+    """Decode an uploaded image and run the plate pipeline (executor thread)"""
+    frame = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        return None, None
+    return frame, recognize_plate(frame)
+
+# ========== ROUTES ==========
+@app.route('/')
+async def home():
+    return await render_template('home.html')
+
+@app.route('/about')
+async def about():
+    return await render_template('about.html')
+
+@app.route('/login', methods=['GET', 'POST'])
+async def login():
+    if request.method == 'POST':
+        form = await request.form
+        username = form.get('username')
+        password = form.get('password')
+
+        if not username or not password:
+            return jsonify({"message": "Username and password are required!"}), 400
+
+        # Check admin and regular user concurrently
+        admin_doc, user_doc = await asyncio.gather(admins_ref.document(username).get(),
+                                                   users_ref.document(username).get())
+        if admin_doc.exists and admin_doc.to_dict().get('password') == password:
+            session.update({
+                'logged_in': True,
+                'user_id': username,
+                'is_admin': True
+            })
+            return jsonify({"message": "Admin login successful!", "redirect": url_for('dashboard')})
+
+        if user_doc.exists and user_doc.to_dict().get('password') == password:
+            session.update({
+                'logged_in': True,
+                'user_id': username,
+                'is_admin': False
+            })
+            return jsonify({"message": "User login successful!", "redirect": url_for('dashboard')})
+
+        return jsonify({"message": "Invalid username or password!"}), 401
+
+    return await render_template('login.html')
+
+@app.route('/signup', methods=['GET', 'POST'])
+async def signup():
+    if not session.get('is_admin'):
+        return redirect(url_for('login'))
+
+    if request.method == 'POST':
+        form = await request.form
+        id_number = form.get('id_number')
+        password = form.get('password')
+
+        if not id_number or not password:
+            return jsonify({"message": "ID Number and password are required!"}), 400
+
+        try:
+            if (await users_ref.document(id_number).get()).exists:
+                return jsonify({"message": "User already exists!"}), 400
+
+            await asyncio.gather(
+                drivers_ref.document(id_number).set({'id_number': id_number}),
+                users_ref.document(id_number).set({
+                    'id_number': id_number,
+                    'password': password
+                }))
+            return jsonify({"message": "User registered successfully!"}), 200
+        except Exception as e:
+            return jsonify({"message": f"Error: {str(e)}"}), 500
+
+    return await render_template('signup.html')
+
+@app.route('/logout')
+async def logout():
+    session.clear()
+    return redirect(url_for('home'))
+
+@app.route('/dashboard')
+async def dashboard():
+    if not session.get('logged_in'):
+        return redirect(url_for('login'))
+    return await render_template('index.html')
+
+@app.route('/check_plate', methods=['GET'])
+async def check_plate():
+    plate = canonical_plate(request.args.get('plate'))
+    if not plate:
+        return jsonify({"error": "Plate number required"}), 400
+    with tracer.span('authorization'):
+        plate_doc = await plates_ref.document(plate).get()
+    return jsonify({
+        "registered": plate_doc.exists,
+        "details": plate_doc.to_dict() if plate_doc.exists else None
+    })
+
+@app.route('/update_driver', methods=['POST'])
+async def update_driver():
+    if 'logged_in' not in session or not session.get('is_admin'):
+        return jsonify({"message": "Admin access required"}), 403
+
+    form = await request.form
+    id_number = form.get('id_number')
+    new_password = form.get('password')
+
+    if not id_number or not new_password:
+        return jsonify({"message": "ID Number and new password required"}), 400
+
+    try:
+        user_doc = await users_ref.document(id_number).get()
+        if not user_doc.exists:
+            return jsonify({"message": "User does not exist!"}), 404
+
+        await users_ref.document(id_number).update({'password': new_password})
+        return jsonify({"message": "User password updated successfully!"}), 200
+    except Exception as e:
+        return jsonify({"message": f"Error: {str(e)}"}), 500
+
+@app.route('/update_plate', methods=['POST'])
+async def update_plate():
+    if 'logged_in' not in session:
+        return jsonify({"message": "Login required"}), 401
+
+    form = await request.form
+    old_plate = form.get('old_plate')
+    new_plate = form.get('new_plate')
+
+    if not old_plate or not new_plate:
+        return jsonify({"message": "Old and new plate numbers are required"}), 400
+    new_plate = registrable_plate(new_plate)
+    if not new_plate:
+        return jsonify({"message": "New plate number does not match any known plate format"}), 400
+
+    try:
+        (old_plate, old_doc), new_doc = await asyncio.gather(find_plate(old_plate),
+                                                             plates_ref.document(new_plate).get())
+        if not old_doc.exists:
+            return jsonify({"message": "Original plate not found"}), 404
+
+        plate_data = old_doc.to_dict()
+
+        if not session.get('is_admin') and plate_data['id_number'] != session.get('user_id'):
+            return jsonify({"message": "Unauthorized to update this plate"}), 403
+
+        if new_doc.exists:
+            return jsonify({"message": "New plate already exists!"}), 400
+
+        await plates_ref.document(old_plate).delete()
+        plate_data['plate'] = new_plate
+        plate_data['updated_at'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        await plates_ref.document(new_plate).set(plate_data)
+
+        return jsonify({"message": "Plate number updated successfully!"}), 200
+    except Exception as e:
+        return jsonify({"message": f"Error: {str(e)}"}), 500
+
+@app.route('/delete_plate', methods=['POST'])
+async def delete_plate():
+    if 'logged_in' not in session:
+        return jsonify({"message": "Login required"}), 401
+
+    try:
+        # Get plate number from JSON or form data
+        if request.is_json:
+            data = await request.get_json()
+            plate = data.get('plate')
+        else:
+            plate = (await request.form).get('plate')
+
+        if not plate:
+            return jsonify({"message": "Plate number required"}), 400
+
+        plate, plate_doc = await find_plate(plate)
+        if not plate_doc.exists:
+            return jsonify({"message": "License plate not found"}), 404
+
+        plate_data = plate_doc.to_dict()
+        owner_id = plate_data.get('id_number')
+
+        # Authorization check
+        if not session.get('is_admin') and session.get('user_id') != owner_id:
+            return jsonify({"message": "Unauthorized to delete this plate"}), 403
+
+        await plates_ref.document(plate).delete()
+        return jsonify({
+            "success": True,
+            "message": "License plate deleted successfully!"
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error: {str(e)}"
+        }), 500
+
+@app.route('/register_plate', methods=['POST'])
+async def register_plate():
+    if 'logged_in' not in session:
+        return jsonify({"message": "Please log in to perform this action."}), 401
+
+    form = await request.form
+    id_number = form.get('id_number')
+    plate = registrable_plate(form.get('plate'))
+
+    if not session.get('is_admin') and id_number != session.get('user_id'):
+        return jsonify({"message": "You can only register plates for your own ID."}), 403
+    if not plate:
+        return jsonify({"message": "Plate number does not match any known plate format"}), 400
+
+    try:
+        plate_doc, driver_doc = await asyncio.gather(plates_ref.document(plate).get(),
+                                                     drivers_ref.document(id_number).get())
+        if plate_doc.exists:
+            return jsonify({"message": "License Plate already registered!"}), 400
+
+        if not driver_doc.exists:
+            await drivers_ref.document(id_number).set({'id_number': id_number})
+
+        await plates_ref.document(plate).set({
+            'plate': plate,
+            'id_number': id_number,
+            'registered_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        })
+        return jsonify({"message": "License Plate Registered!"}), 200
+    except Exception as e:
+        return jsonify({"message": f"Error: {str(e)}"}), 500
+
+@app.route('/detect', methods=['POST'])
+async def detect():
+    files = await request.files
+    if 'image' not in files:
+        return jsonify({"error": "No image provided"}), 400
+
+    try:
+        # Decode in memory and run inference off the event loop
+        frame, detection = await run_inference(decode_and_recognize, files['image'].read())
+        if frame is None:
+            return jsonify({"error": "Could not read image"}), 400
+        if detection is None:
+            return jsonify({"message": "No valid license plates detected"}), 404
+
+        plate_text, coordinates, plate_img = detection
+        with tracer.span('authorization'):
+            plate_doc = await plates_ref.document(plate_text).get()
+        authorized = plate_doc.exists
+        print(f"Access {'granted' if authorized else 'denied'} for {plate_text}")
+        await run_inference(save_plate_crop, plate_text, plate_img)
+
+        return jsonify({
+            'plate': plate_text,
+            'authorized': authorized,
+            'coordinates': coordinates
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/delete_driver', methods=['POST'])
+async def delete_driver():
+    if 'logged_in' not in session or not session.get('is_admin'):
+        return jsonify({"message": "Admin access required"}), 403
+
+    driver_id = (await request.form).get('delete_driver_id')
+    if not driver_id:
+        return jsonify({"message": "Driver ID required"}), 400
+
+    try:
+        # Check if driver exists
+        if not (await drivers_ref.document(driver_id).get()).exists:
+            return jsonify({"message": "Driver not found!"}), 404
+
+        # Delete driver, corresponding user and their plates together
+        deletions = [drivers_ref.document(driver_id).delete(), users_ref.document(driver_id).delete()]
+        async for plate_doc in plates_ref.where('id_number', '==', driver_id).stream():
+            deletions.append(plates_ref.document(plate_doc.id).delete())
+        await asyncio.gather(*deletions)
+
+        return jsonify({"message": "Driver and associated data deleted successfully!"}), 200
+    except Exception as e:
+        return jsonify({"message": f"Error: {str(e)}"}), 500
+
+@app.route('/test_gate', methods=['POST'])
+async def test_gate():
+    if 'logged_in' not in session or not session.get('is_admin'):
+        return jsonify({"message": "Admin access required"}), 403
+
+    state = (await request.get_json()).get('state')
+    if state not in [True, False]:
+        return jsonify({"message": "Invalid state"}), 400
+
+    return jsonify({
+        "success": True,
+        "message": f"Gate {'opened' if state else 'closed'} (simulated)"
+    })
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=5000)
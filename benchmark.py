@@ -0,0 +1,268 @@
+#benchmark.py
+#
+# Headless benchmark of LicensePlateSystem.process_frame on labeled captures.
+#
+#   python benchmark.py data/gate_bench --output bench.json
+#   python benchmark.py data/gate_bench --compare bench_baseline.json
+#
+# The dataset folder holds images and/or videos plus an optional labels.csv
+# with `file,plate` rows. Files without a label row use their name up to the
+# first '_' as the plate (e.g. 3AA12345_morning.jpg). The gate controller is
+# a no-op stub and authorization is answered locally, so no Arduino or
+# Flask API is needed.
+#
+# --shards reads a split packed by `shard_dataset.py pack-benchmark` instead
+# of a folder, so large datasets load through mmap rather than file opens.
+# Compare runs with and without --no-rectify to measure plate_rectify.py
+# (the 'rectify' stage against the OCR stages and accuracy).
+
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import cv2
+
+from license_plate_recognition import LicensePlateSystem, NullGateController
+from run_mode import RunMode
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+class BenchmarkSystem(LicensePlateSystem):
+    """LicensePlateSystem with the Flask API lookup answered from a set"""
+    def __init__(self, authorized_plates, output_root, joint_model_path=None):
+        super().__init__(gate_controller=NullGateController(), headless=True, run_mode=RunMode('benchmark'),
+                         joint_model_path=joint_model_path)
+        self.authorized_plates = {normalize_plate(p) for p in authorized_plates}
+        self.output_root = output_root
+        self.save_training_samples = False
+        self.tracer.trace_dir = os.path.join(output_root, "traces")
+        self.create_output_dirs()
+
+    def lookup_plate(self, plate_text):
+        return normalize_plate(plate_text) in self.authorized_plates
+
+def normalize_plate(text):
+    return ''.join(c for c in text if c.isalnum()).upper()
+
+def edit_distance(a, b):
+    """Levenshtein distance between two strings"""
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+def peak_rss_mb():
+    """Peak resident set size of this process, or None if unavailable"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+def load_labels(dataset_dir):
+    labels = {}
+    labels_path = os.path.join(dataset_dir, 'labels.csv')
+    if os.path.exists(labels_path):
+        with open(labels_path, newline='') as f:
+            for row in csv.DictReader(f):
+                labels[row['file']] = row['plate']
+    return labels
+
+def dataset_files(dataset_dir):
+    """(name, label) for every image and video in the dataset folder"""
+    labels = load_labels(dataset_dir)
+    return [(name, labels.get(name, os.path.splitext(name)[0].split('_')[0]))
+            for name in sorted(os.listdir(dataset_dir))
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS + VIDEO_EXTENSIONS]
+
+def iter_samples(dataset_dir, frame_skip):
+    """Yield (name, frame_index, frame, label) for every image and sampled video frame"""
+    for name, label in dataset_files(dataset_dir):
+        path = os.path.join(dataset_dir, name)
+        ext = os.path.splitext(name)[1].lower()
+        if ext in IMAGE_EXTENSIONS:
+            frame = cv2.imread(path)
+            if frame is None:
+                print(f"Error loading image: {path}")
+                continue
+            yield name, 0, frame, label
+        elif ext in VIDEO_EXTENSIONS:
+            cap = cv2.VideoCapture(path)
+            index = 0
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if index % frame_skip == 0:
+                    yield name, index, frame, label
+                index += 1
+            cap.release()
+
+def iter_shard_samples(split_dir):
+    """iter_samples for a packed split"""
+    from shard_dataset import ShardReader
+
+    reader = ShardReader(split_dir)
+    try:
+        for i, name in enumerate(reader.names):
+            frame = reader.image(i)
+            if frame is None:
+                print(f"Error decoding packed image: {name}")
+                continue
+            yield name, 0, frame, reader.label(i)
+    finally:
+        reader.close()
+
+def run_benchmark(system, dataset_dir, frame_skip=1, warmup=1, shards=False):
+    """Replay the dataset through process_frame and collect metrics"""
+    non_plate_results = set(system.non_vehicle_classes.values()) | {"No license plate detected"}
+    items = []
+    processed = 0
+    timed_seconds = 0.0
+
+    samples = iter_shard_samples(dataset_dir) if shards else iter_samples(dataset_dir, frame_skip)
+    for name, index, frame, label in samples:
+        start = time.perf_counter()
+        _, result, authorized = system.process_frame(frame, trigger=name)  # One recording, one vehicle
+        elapsed = time.perf_counter() - start
+
+        processed += 1
+        if processed <= warmup:
+            system.tracer.reset()  # Model warm-up is not representative
+            continue
+        timed_seconds += elapsed
+
+        predicted = '' if result in non_plate_results else normalize_plate(result)
+        expected = normalize_plate(label)
+        items.append({
+            'file': name,
+            'frame': index,
+            'expected': expected,
+            'predicted': predicted,
+            'exact': predicted == expected,
+            'char_errors': edit_distance(predicted, expected),
+            'authorized': authorized,
+            'latency_ms': round(elapsed * 1000, 2)
+        })
+
+    total_chars = sum(len(item['expected']) for item in items)
+    return {
+        'dataset': os.path.abspath(dataset_dir),
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'frames': len(items),
+        'warmup_frames': min(warmup, processed),
+        'throughput_fps': round(len(items) / timed_seconds, 3) if timed_seconds else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+        'accuracy': {
+            'exact': round(sum(item['exact'] for item in items) / len(items), 4) if items else 0.0,
+            'cer': round(sum(item['char_errors'] for item in items) / total_chars, 4) if total_chars else 0.0
+        },
+        'stages': system.tracer.summary(),
+        'plate_cache': system.plate_cache.stats() if system.plate_cache else None,
+        'rectifier': system.plate_rectifier.stats() if system.plate_rectifier else None,
+        'items': items
+    }
+
+def compare_results(results, baseline, max_latency_increase=0.10, max_accuracy_drop=0.01):
+    """Print deltas against a baseline run; returns a list of regressions"""
+    regressions = []
+    print(f"\n{'stage':<32}{'baseline p95':>14}{'current p95':>14}")
+    for stage, current in results['stages'].items():
+        previous = baseline['stages'].get(stage)
+        if not previous:
+            continue
+        print(f"{stage:<32}{previous['p95_ms']:>12.1f}ms{current['p95_ms']:>12.1f}ms")
+        if previous['p95_ms'] and current['p95_ms'] > previous['p95_ms'] * (1 + max_latency_increase):
+            regressions.append(f"{stage} p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+
+    if results['throughput_fps'] < baseline['throughput_fps'] * (1 - max_latency_increase):
+        regressions.append(f"throughput {baseline['throughput_fps']} -> {results['throughput_fps']} fps")
+    if results['accuracy']['exact'] < baseline['accuracy']['exact'] - max_accuracy_drop:
+        regressions.append(f"exact accuracy {baseline['accuracy']['exact']} -> {results['accuracy']['exact']}")
+    if results['accuracy']['cer'] > baseline['accuracy']['cer'] + max_accuracy_drop:
+        regressions.append(f"CER {baseline['accuracy']['cer']} -> {results['accuracy']['cer']}")
+    return regressions
+
+def print_report(results):
+    print(f"\nFrames: {results['frames']}  Throughput: {results['throughput_fps']} fps  "
+          f"Peak RSS: {results['peak_rss_mb'] and round(results['peak_rss_mb'], 1)} MB")
+    print(f"Exact match: {results['accuracy']['exact']:.2%}  CER: {results['accuracy']['cer']:.2%}")
+    print(f"\n{'stage':<32}{'count':>7}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for stage, stats in results['stages'].items():
+        print(f"{stage:<32}{stats['count']:>7}{stats['p50_ms']:>8.1f}ms"
+              f"{stats['p95_ms']:>8.1f}ms{stats['p99_ms']:>8.1f}ms")
+    if results.get('plate_cache'):
+        cache = results['plate_cache']
+        print(f"\nPlate cache: {cache['hits']} hits, {cache['misses']} misses ({cache['hit_rate']:.1%})")
+        for path, counts in cache['paths'].items():
+            print(f"  {path}: {counts['hits']} hits, {counts['misses']} misses ({counts['hit_rate']:.1%})")
+    if results.get('rectifier'):
+        rectifier = results['rectifier']
+        print(f"Rectifier: {rectifier['polygon']} polygon, {rectifier['min_area_rect']} rotated box, "
+              f"{rectifier['fallback']} unrectified ({rectifier['rectified_rate']:.1%})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the plate recognition pipeline")
+    parser.add_argument('dataset', help="Folder of labeled images/videos")
+    parser.add_argument('--output', default='benchmark_results.json', help="Results JSON path")
+    parser.add_argument('--compare', help="Baseline results JSON; exit 1 on regression")
+    parser.add_argument('--authorized', help="Text file of authorized plates (default: all labels)")
+    parser.add_argument('--frame-skip', type=int, default=5, help="Process every Nth video frame")
+    parser.add_argument('--warmup', type=int, default=1, help="Frames excluded from timing")
+    parser.add_argument('--artifacts', help="Keep pipeline artifacts here (default: temp dir)")
+    parser.add_argument('--shards', action='store_true', help="Dataset is a packed split (shard_dataset.py)")
+    parser.add_argument('--no-plate-cache', action='store_true', help="OCR every crop, even repeats")
+    parser.add_argument('--no-rectify', action='store_true', help="OCR the raw YOLO crops (A/B the rectifier)")
+    parser.add_argument('--joint-model', help="Joint vehicle+plate weights (joint_detector.py) instead of two models")
+    args = parser.parse_args()
+
+    if args.authorized:
+        with open(args.authorized) as f:
+            authorized = [line.strip() for line in f if line.strip()]
+    elif args.shards:
+        from shard_dataset import ShardReader
+        reader = ShardReader(args.dataset)
+        authorized = [reader.label(i) for i in range(len(reader))]
+        reader.close()
+    else:
+        authorized = [label for _, label in dataset_files(args.dataset)]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        system = BenchmarkSystem(authorized, args.artifacts or temp_dir, args.joint_model)
+        if args.no_plate_cache:
+            system.plate_cache = None
+        if args.no_rectify:
+            system.plate_rectifier = None
+        results = run_benchmark(system, args.dataset, args.frame_skip, args.warmup, args.shards)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print_report(results)
+    print(f"\nResults saved to: {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_results(results, json.load(f))
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
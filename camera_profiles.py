@@ -0,0 +1,209 @@
+#camera_profiles.py
+#
+# Per-camera detector settings, one JSON file per camera under
+# camera_profiles/ (named after the lane, or "default" for the single-camera
+# loop):
+#
+#   {
+#     "roi": [0.0, 0.4, 1.0, 1.0],   lane region as fractions of the frame (x1, y1, x2, y2)
+#     "object_imgsz": 480,           YOLO input size for the COCO vehicle check
+#     "plate_imgsz": 640,            YOLO input size for plate detection
+#     "object_confidence": 0.5,
+#     "plate_confidence": 0.5,
+#     "half": false,                 FP16 inference (CUDA only)
+#     "object_model": null,          exported/quantized model instead of the shared one,
+#     "plate_model": null            e.g. "models/best_int8_openvino_model"
+#   }
+#
+# Missing keys fall back to LicensePlateSystem's defaults. Both detectors
+# only see the ROI crop, so sky and walls cost nothing.
+#
+# Calibrate a camera on recorded footage (a benchmark.py style folder):
+#
+#   python camera_profiles.py calibrate main-in recordings/main-in --plate-model best.pt --sizes 320,416,480,640
+#
+# Reference detections come from the full frame at the largest size. The ROI
+# is the area where vehicles and plates appeared, plus a margin. Each size is
+# then timed on the ROI, and the cheapest size that keeps the target recall
+# of the reference plates and vehicles is written to the profile.
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from detections import box_iou, from_results
+
+PROFILE_DIR = "camera_profiles"
+FULL_FRAME = (0.0, 0.0, 1.0, 1.0)
+VEHICLE_CLASSES = [2, 3, 5, 7]  # COCO classes: car, motorcycle, bus, truck
+
+class CameraProfile:
+    """Detector settings for one camera"""
+    FIELDS = ('roi', 'object_imgsz', 'plate_imgsz', 'object_confidence', 'plate_confidence', 'half',
+              'object_model', 'plate_model')
+
+    def __init__(self, name='default', roi=FULL_FRAME, object_imgsz=640, plate_imgsz=640,
+                 object_confidence=0.5, plate_confidence=0.5, half=False, object_model=None, plate_model=None):
+        self.name = name
+        self.roi = tuple(roi)
+        self.object_imgsz = object_imgsz
+        self.plate_imgsz = plate_imgsz
+        self.object_confidence = object_confidence
+        self.plate_confidence = plate_confidence
+        self.half = half
+        self.object_model = object_model
+        self.plate_model = plate_model
+
+    @classmethod
+    def load(cls, name, profile_dir=PROFILE_DIR, **defaults):
+        """Profile from <profile_dir>/<name>.json; `defaults` fill keys the file leaves out"""
+        path = os.path.join(profile_dir, f"{name}.json")
+        settings = dict(defaults)
+        if os.path.exists(path):
+            with open(path) as f:
+                settings.update(json.load(f))
+            print(f"Loaded camera profile: {path}")
+        unknown = set(settings) - set(cls.FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown camera profile keys in {path}: {sorted(unknown)}")
+        return cls(name, **settings)
+
+    def save(self, profile_dir=PROFILE_DIR):
+        os.makedirs(profile_dir, exist_ok=True)
+        path = os.path.join(profile_dir, f"{self.name}.json")
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+    def to_dict(self):
+        return {field: list(self.roi) if field == 'roi' else getattr(self, field) for field in self.FIELDS}
+
+    def roi_pixels(self, shape):
+        """ROI as integer (x1, y1, x2, y2) for a frame of the given shape"""
+        height, width = shape[:2]
+        x1, y1, x2, y2 = self.roi
+        return int(x1 * width), int(y1 * height), int(round(x2 * width)), int(round(y2 * height))
+
+    def crop(self, frame):
+        """The lane ROI of the frame (a view, no copy)"""
+        if self.roi == FULL_FRAME:
+            return frame
+        x1, y1, x2, y2 = self.roi_pixels(frame.shape)
+        return frame[y1:y2, x1:x2]
+
+    def predict_args(self, kind):
+        """Keyword arguments for the 'object', 'plate' or 'joint' YOLO call"""
+        if kind == 'joint':  # Plate input size, the looser threshold; results are split per class after
+            return {'imgsz': self.plate_imgsz, 'conf': min(self.object_confidence, self.plate_confidence),
+                    'half': self.half, 'verbose': False}
+        return {'imgsz': getattr(self, f"{kind}_imgsz"), 'conf': getattr(self, f"{kind}_confidence"),
+                'half': self.half, 'verbose': False}
+
+# ========== CALIBRATION ==========
+def matched(reference, detected, min_iou=0.5):
+    """Number of reference boxes with a detection at min_iou"""
+    iou = box_iou(reference, detected)
+    return int((iou.max(1) >= min_iou).sum()) if iou.size else 0
+
+def detect_boxes(model, frame, imgsz, conf, classes=None, half=False):
+    result = model(frame, imgsz=imgsz, conf=conf, classes=classes, half=half, verbose=False)[0]
+    return from_results(result)['box']
+
+def auto_roi(boxes, shape, margin=0.1):
+    """Smallest frame fraction covering every box, grown by margin on each side"""
+    if not boxes:
+        return FULL_FRAME
+    boxes = np.concatenate(boxes)
+    height, width = shape[:2]
+    x1, y1 = boxes[:, 0].min(), boxes[:, 1].min()
+    x2, y2 = boxes[:, 2].max(), boxes[:, 3].max()
+    pad_x, pad_y = margin * (x2 - x1), margin * (y2 - y1)
+    return (round(max(0.0, (x1 - pad_x) / width), 3), round(max(0.0, (y1 - pad_y) / height), 3),
+            round(min(1.0, (x2 + pad_x) / width), 3), round(min(1.0, (y2 + pad_y) / height), 3))
+
+def calibrate(name, footage_dir, plate_model_path, object_model_path='yolov8n.pt', sizes=(320, 416, 480, 640),
+              reference_size=None, target_recall=0.98, frame_skip=10, max_frames=300, margin=0.1, half=False,
+              profile_dir=PROFILE_DIR):
+    """Sweep input sizes on recorded footage and save the cheapest profile that keeps recall"""
+    from ultralytics import YOLO
+
+    from benchmark import iter_samples
+
+    base = CameraProfile.load(name, profile_dir)
+    object_model = YOLO(base.object_model or object_model_path)
+    plate_model = YOLO(base.plate_model or plate_model_path)
+    reference_size = reference_size or max(sizes)
+
+    frames = []
+    for _, _, frame, _ in iter_samples(footage_dir, frame_skip):
+        frames.append(frame)
+        if len(frames) >= max_frames:
+            break
+    if not frames:
+        raise ValueError(f"No frames found in {footage_dir}")
+    print(f"Calibrating {name} on {len(frames)} frames, reference size {reference_size}")
+
+    # Reference: full frame, largest size
+    reference = []
+    for frame in frames:
+        vehicles = detect_boxes(object_model, frame, reference_size, base.object_confidence, VEHICLE_CLASSES, half)
+        plates = detect_boxes(plate_model, frame, reference_size, base.plate_confidence, None, half)
+        reference.append((vehicles, plates))
+    roi = auto_roi([boxes for pair in reference for boxes in pair if len(boxes)], frames[0].shape, margin)
+    print(f"ROI: {roi} ({(roi[2] - roi[0]) * (roi[3] - roi[1]):.0%} of the frame)")
+
+    profile = CameraProfile(name, roi=roi, object_confidence=base.object_confidence,
+                            plate_confidence=base.plate_confidence, half=half,
+                            object_model=base.object_model, plate_model=base.plate_model)
+    x_offset, y_offset = profile.roi_pixels(frames[0].shape)[:2]
+    offset = np.array([x_offset, y_offset, x_offset, y_offset], np.float32)
+    total = {'object': sum(len(v) for v, _ in reference), 'plate': sum(len(p) for _, p in reference)}
+
+    rows = []
+    chosen = {}
+    for kind, model, classes in [('object', object_model, VEHICLE_CLASSES), ('plate', plate_model, None)]:
+        confidence = getattr(profile, f"{kind}_confidence")
+        for size in sorted(sizes):
+            found = 0
+            started = time.perf_counter()
+            for frame, pair in zip(frames, reference):
+                boxes = detect_boxes(model, profile.crop(frame), size, confidence, classes, half) + offset
+                found += matched(pair[0] if kind == 'object' else pair[1], boxes)
+            ms = (time.perf_counter() - started) / len(frames) * 1000
+            recall = found / total[kind] if total[kind] else 1.0
+            rows.append((kind, size, recall, ms))
+            print(f"{kind:<8}{size:>6}  recall {recall:6.1%}  {ms:7.1f}ms/frame")
+            if kind not in chosen and recall >= target_recall:
+                chosen[kind] = size
+        if kind not in chosen:
+            chosen[kind] = max(sizes)
+            print(f"No size kept {target_recall:.0%} {kind} recall on the ROI; using {chosen[kind]}")
+
+    profile.object_imgsz, profile.plate_imgsz = chosen['object'], chosen['plate']
+    path = profile.save(profile_dir)
+    print(f"Saved {path}: object_imgsz={profile.object_imgsz}, plate_imgsz={profile.plate_imgsz}")
+    return profile, rows
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Per-camera detector profiles")
+    commands = parser.add_subparsers(dest='command', required=True)
+    sub = commands.add_parser('calibrate', help="Pick ROI and input sizes from recorded footage")
+    sub.add_argument('name', help="Camera/lane name (profile file name)")
+    sub.add_argument('footage', help="Folder of recorded images/videos")
+    sub.add_argument('--plate-model', required=True, help="Plate detector weights")
+    sub.add_argument('--object-model', default='yolov8n.pt', help="COCO detector weights")
+    sub.add_argument('--sizes', default='320,416,480,640', help="Comma-separated YOLO input sizes to try")
+    sub.add_argument('--reference-size', type=int, help="Full-frame reference size (default: largest)")
+    sub.add_argument('--target-recall', type=float, default=0.98, help="Recall of reference boxes to keep")
+    sub.add_argument('--frame-skip', type=int, default=10, help="Use every Nth video frame")
+    sub.add_argument('--max-frames', type=int, default=300)
+    sub.add_argument('--margin', type=float, default=0.1, help="ROI growth around seen boxes")
+    sub.add_argument('--half', action='store_true', help="Calibrate with FP16 inference")
+    sub.add_argument('--profile-dir', default=PROFILE_DIR)
+    args = parser.parse_args()
+
+    calibrate(args.name, args.footage, args.plate_model, args.object_model, [int(s) for s in args.sizes.split(',')], args.reference_size,
+              args.target_recall, args.frame_skip, args.max_frames, args.margin, args.half, args.profile_dir)
@@ -1,65 +1,127 @@
+import argparse
+import json
 import os
+import shutil
+import time
 import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from tqdm import tqdm
 
-def convert_voc_to_yolo(voc_dir, output_dir, classes):
+IMAGE_MODES = ('symlink', 'hardlink', 'copy')
+SETTINGS_FILE = 'conversion.json'  # Classes and options the labels in an output dir were written with
+
+def parse_annotation(xml_path):
+    """Stream a VOC annotation; returns (width, height, [(name, xmin, ymin, xmax, ymax)])"""
+    width = height = None
+    objects = []
+    for _, elem in ET.iterparse(xml_path, events=('end',)):
+        if elem.tag == 'size':
+            width = int(float(elem.find('width').text))
+            height = int(float(elem.find('height').text))
+        elif elem.tag == 'object':
+            # Direct children only; person <part> elements carry their own bndbox
+            xmlbox = elem.find('bndbox')
+            objects.append((elem.find('name').text.strip(),
+                            float(xmlbox.find('xmin').text), float(xmlbox.find('ymin').text),
+                            float(xmlbox.find('xmax').text), float(xmlbox.find('ymax').text)))
+            elem.clear()
+    return width, height, objects
+
+def place_image(src_img, dst_img, image_mode):
+    """Put the source image into the dataset as a symlink, hardlink or copy"""
+    if os.path.lexists(dst_img):
+        os.remove(dst_img)
+    if image_mode == 'symlink':
+        os.symlink(os.path.abspath(src_img), dst_img)
+    elif image_mode == 'hardlink':
+        try:
+            os.link(src_img, dst_img)
+        except OSError:
+            shutil.copy2(src_img, dst_img)  # Different filesystem
+    else:
+        shutil.copy2(src_img, dst_img)
+
+def convert_image(image_id, split, voc_dir, output_dir, class_ids, image_mode, incremental):
+    """Convert one annotation; returns 'written', 'skipped', 'empty' or 'missing'"""
+    xml_path = os.path.join(voc_dir, 'Annotations', f'{image_id}.xml')
+    label_path = os.path.join(output_dir, 'labels', split, f'{image_id}.txt')
+    src_img = os.path.join(voc_dir, 'JPEGImages', f'{image_id}.jpg')
+    dst_img = os.path.join(output_dir, 'images', split, f'{image_id}.jpg')
+
+    # Incremental mode: the label is newer than the annotation it came from
+    if (incremental and os.path.exists(label_path) and os.path.lexists(dst_img)
+            and os.path.getmtime(label_path) >= os.path.getmtime(xml_path)):
+        return 'skipped'
+
+    width, height, objects = parse_annotation(xml_path)
+
+    # Convert to YOLO format (center x, center y, width, height)
+    yolo_lines = [f"{class_ids[cls]} {((xmin + xmax) / 2) / width:.6f} {((ymin + ymax) / 2) / height:.6f} "
+                  f"{(xmax - xmin) / width:.6f} {(ymax - ymin) / height:.6f}"
+                  for cls, xmin, ymin, xmax, ymax in objects if cls in class_ids]
+
+    if not yolo_lines:
+        # The annotation may have lost its last selected object since the previous run
+        for path in (label_path, dst_img):
+            if os.path.lexists(path):
+                os.remove(path)
+        return 'empty'
+    if not os.path.exists(src_img):
+        return 'missing'
+
+    place_image(src_img, dst_img, image_mode)
+    with open(label_path, 'w') as f:
+        f.write('\n'.join(yolo_lines))
+    return 'written'
+
+def convert_voc_to_yolo(voc_dir, output_dir, classes, workers=None, image_mode='symlink', incremental=True):
     """Convert VOC format dataset to YOLOv8 format"""
+    if image_mode not in IMAGE_MODES:
+        raise ValueError(f"image_mode must be one of {IMAGE_MODES}")
+
     # Create directories
-    os.makedirs(os.path.join(output_dir, 'images', 'train'), exist_ok=True)
-    os.makedirs(os.path.join(output_dir, 'images', 'val'), exist_ok=True)
-    os.makedirs(os.path.join(output_dir, 'labels', 'train'), exist_ok=True)
-    os.makedirs(os.path.join(output_dir, 'labels', 'val'), exist_ok=True)
+    for kind in ['images', 'labels']:
+        for split in ['train', 'val']:
+            os.makedirs(os.path.join(output_dir, kind, split), exist_ok=True)
 
     # Get class mapping
     class_ids = {name: idx for idx, name in enumerate(classes)}
 
+    # Existing labels only count as up to date if they were written with the same classes and options
+    settings = {'voc_dir': os.path.abspath(voc_dir), 'classes': list(classes), 'image_mode': image_mode}
+    settings_path = os.path.join(output_dir, SETTINGS_FILE)
+    if incremental:
+        previous = None
+        if os.path.exists(settings_path):
+            with open(settings_path) as f:
+                previous = json.load(f)
+        if previous != settings:
+            print(f"Conversion settings changed (or unrecorded) in {output_dir} - reconverting everything")
+            incremental = False
+    if not incremental and os.path.exists(settings_path):
+        os.remove(settings_path)  # Until this run finishes the labels match no recorded settings
+
     # Process annotations
-    for split in ['train', 'val']:
-        with open(os.path.join(voc_dir, 'ImageSets', 'Main', f'{split}.txt')) as f:
-            image_ids = f.read().strip().split()
-
-        for image_id in tqdm(image_ids, desc=f'Processing {split}'):
-            # Parse XML
-            tree = ET.parse(os.path.join(voc_dir, 'Annotations', f'{image_id}.xml'))
-            root = tree.getroot()
-
-            # Get image dimensions
-            size = root.find('size')
-            width = int(size.find('width').text)
-            height = int(size.find('height').text)
-
-            # Process objects
-            yolo_lines = []
-            for obj in root.iter('object'):
-                cls = obj.find('name').text
-                if cls not in classes:
-                    continue
-                
-                xmlbox = obj.find('bndbox')
-                xmin = float(xmlbox.find('xmin').text)
-                ymin = float(xmlbox.find('ymin').text)
-                xmax = float(xmlbox.find('xmax').text)
-                ymax = float(xmlbox.find('ymax').text)
-
-                # Convert to YOLO format (center x, center y, width, height)
-                x_center = ((xmin + xmax) / 2) / width
-                y_center = ((ymin + ymax) / 2) / height
-                w = (xmax - xmin) / width
-                h = (ymax - ymin) / height
-
-                yolo_lines.append(f"{class_ids[cls]} {x_center:.6f} {y_center:.6f} {w:.6f} {h:.6f}")
-
-            # Write label file if objects found
-            if yolo_lines:
-                with open(os.path.join(output_dir, 'labels', split, f'{image_id}.txt'), 'w') as f:
-                    f.write('\n'.join(yolo_lines))
-
-                # Copy image (you may need to implement this)
-                src_img = os.path.join(voc_dir, 'JPEGImages', f'{image_id}.jpg')
-                dst_img = os.path.join(output_dir, 'images', split, f'{image_id}.jpg')
-                if os.path.exists(src_img):
-                    if not os.path.exists(dst_img):
-                        os.symlink(src_img, dst_img)  # or copy file
+    started = time.perf_counter()
+    counts = {'written': 0, 'skipped': 0, 'empty': 0, 'missing': 0}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for split in ['train', 'val']:
+            with open(os.path.join(voc_dir, 'ImageSets', 'Main', f'{split}.txt')) as f:
+                image_ids = f.read().strip().split()
+
+            convert = partial(convert_image, split=split, voc_dir=voc_dir, output_dir=output_dir,
+                              class_ids=class_ids, image_mode=image_mode, incremental=incremental)
+            chunksize = max(1, len(image_ids) // (4 * (workers or os.cpu_count() or 1)))
+            for status in tqdm(pool.map(convert, image_ids, chunksize=chunksize),
+                               total=len(image_ids), desc=f'Processing {split}'):
+                counts[status] += 1
+
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    print(f"{total} annotations in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f}/s): "
+          f"{counts['written']} written, {counts['skipped']} unchanged, "
+          f"{counts['empty']} without selected classes, {counts['missing']} missing images")
 
     # Create data.yaml
     data = {
@@ -76,11 +138,26 @@ def convert_voc_to_yolo(voc_dir, output_dir, classes):
         f.write("names:\n")
         for i, name in enumerate(classes):
             f.write(f"  {i}: {name}\n")
+    # Written last, so an interrupted run is reconverted in full next time
+    with open(settings_path, 'w') as f:
+        json.dump(settings, f, indent=2)
+    return counts
 
 if __name__ == "__main__":
-    # Example usage (modify paths as needed)
+    parser = argparse.ArgumentParser(description="Convert a VOC dataset to YOLOv8 format")
+    parser.add_argument('--voc-dir', default="VOCdevkit/VOC2012")
+    parser.add_argument('--output-dir', default="data/voc2012_yolo")
+    parser.add_argument('--classes', default="car,bus,motorbike,person", help="Comma-separated classes to keep")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument('--image-mode', choices=IMAGE_MODES, default='symlink')
+    parser.add_argument('--full', action='store_true', help="Reconvert everything, even unchanged annotations")
+    args = parser.parse_args()
+
     convert_voc_to_yolo(
-        voc_dir="VOCdevkit/VOC2012",
-        output_dir="data/voc2012_yolo",
-        classes=["car", "bus", "motorbike", "person"]  # Your selected classes
-    )
\ No newline at end of file
+        voc_dir=args.voc_dir,
+        output_dir=args.output_dir,
+        classes=args.classes.split(','),
+        workers=args.workers,
+        image_mode=args.image_mode,
+        incremental=not args.full
+    )
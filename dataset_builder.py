@@ -0,0 +1,285 @@
+#dataset_builder.py
+#
+# Turns production captures under detection_results/ into training data:
+#
+#   python dataset_builder.py detection_results data/gate_dataset
+#
+# Plate detection: training_samples/frame_<ts>.json sidecars (written by
+#   record_attempt in the 'collect' run mode) hold the plate boxes of a saved
+#   frame, usually original_frames/attempt_<n>_<ts>.jpg; frame and boxes
+#   become YOLO images and labels with a data.yaml.
+# Plate OCR: plate_crops/plate_<ts>.jpg plus the text read into
+#   tesseract_results/plate_processed_<ts>.txt become ocr/<split>/ crops
+#   with a labels.tsv (name, text, verified). Those texts are the ensemble's
+#   own reads, so they are marked unverified; corrections typed into
+#   ocr/verified.tsv ("ocr_<ts>.jpg<TAB>TEXT", one per line) replace them
+#   and are marked verified. plate_recognizer.py trains and compares on
+#   verified labels only.
+#
+# Near-identical images, such as a car standing at the gate for a few
+# seconds, are dropped by dHash. Samples are processed in chunks, and each
+# finished chunk is appended to manifest.jsonl. The manifest is the only
+# record of progress: a rerun skips everything already in it, so an
+# interrupted build resumes and new captures are added incrementally. The
+# train/val split is derived from the sample name, so it is stable across
+# runs.
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from convert_voc import IMAGE_MODES, place_image
+from plate_cache import dhash
+from plate_ocr import pick_result
+
+CLASS_NAMES = ['license_plate']
+HASH_SIZE = 16  # 256-bit dHash; at 8x8 the static gate background makes all frames look alike
+
+# ========== ARTIFACT INDEX ==========
+def index_detection_samples(root):
+    """Frames saved with a plate-box sidecar"""
+    for sidecar in sorted(glob.glob(os.path.join(root, 'training_samples', 'frame_*.json'))):
+        with open(sidecar) as f:
+            frame = json.load(f)['frame']  # Relative to the sidecar
+        image = os.path.normpath(os.path.join(os.path.dirname(sidecar), frame))
+        if os.path.exists(image):
+            name = os.path.basename(sidecar)[len('frame_'):-len('.json')]
+            yield {'id': f"det_{name}", 'kind': 'detection', 'image': image, 'sidecar': sidecar}
+
+def index_ocr_samples(root):
+    """Plate crops whose OCR results were saved alongside"""
+    for result_path in sorted(glob.glob(os.path.join(root, 'tesseract_results', 'plate_processed_*.txt'))):
+        name = os.path.basename(result_path)[len('plate_processed_'):-len('.txt')]
+        crop = os.path.join(root, 'plate_crops', f"plate_{name}.jpg")
+        if os.path.exists(crop):
+            yield {'id': f"ocr_{name}", 'kind': 'ocr', 'image': crop, 'ocr_result': result_path}
+
+def read_ocr_text(result_path):
+    """Text the pipeline settled on, from an 'EasyOCR: ...\\nTesseract: ...' file"""
+    texts = {'EasyOCR': '', 'Tesseract': ''}
+    with open(result_path) as f:
+        for line in f:
+            engine, _, text = line.partition(':')
+            if engine in texts:
+                texts[engine] = text.strip()
+    return pick_result(texts['EasyOCR'], texts['Tesseract'])
+
+# ========== DEDUPLICATION ==========
+def hash_image(path):
+    """dHash of an image file decoded at reduced size; None if unreadable"""
+    image = cv2.imread(path, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    if image is None:
+        image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)  # Crops too small to reduce
+    return dhash(image, HASH_SIZE) if image is not None else None
+
+class HashIndex:
+    """Near-duplicate lookup for fixed-width hashes.
+
+    A hash is split into max_distance + 1 bands. Two hashes within
+    max_distance bits must agree exactly on at least one band, so only
+    hashes sharing a band are compared.
+    """
+    def __init__(self, max_distance=12, bits=HASH_SIZE ** 2):
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        edges = [round(i * bits / bands) for i in range(bands + 1)]
+        self.bands = [(start, (1 << (end - start)) - 1) for start, end in zip(edges, edges[1:])]
+        self.tables = [{} for _ in self.bands]
+        self.size = 0
+
+    def band_keys(self, value):
+        return [(value >> shift) & mask for shift, mask in self.bands]
+
+    def near(self, value):
+        for table, key in zip(self.tables, self.band_keys(value)):
+            for other in table.get(key, ()):
+                if bin(value ^ other).count('1') <= self.max_distance:
+                    return True
+        return False
+
+    def add(self, value):
+        for table, key in zip(self.tables, self.band_keys(value)):
+            table.setdefault(key, []).append(value)
+        self.size += 1
+
+# ========== OUTPUT ==========
+def split_for(sample_id, val_fraction):
+    digest = int(hashlib.md5(sample_id.encode()).hexdigest()[:8], 16)
+    return 'val' if digest / 0xFFFFFFFF < val_fraction else 'train'
+
+def yolo_lines(sidecar, min_confidence):
+    with open(sidecar) as f:
+        sample = json.load(f)
+    width, height = sample['width'], sample['height']
+    lines = []
+    for plate in sample['plates']:
+        if plate['confidence'] < min_confidence:
+            continue
+        x1, y1, x2, y2 = plate['box']
+        x1, x2 = max(0, x1), min(width, x2)
+        y1, y2 = max(0, y1), min(height, y2)
+        if x2 <= x1 or y2 <= y1:
+            continue
+        lines.append(f"0 {(x1 + x2) / 2 / width:.6f} {(y1 + y2) / 2 / height:.6f} "
+                     f"{(x2 - x1) / width:.6f} {(y2 - y1) / height:.6f}")
+    return lines
+
+def sample_label(sample, min_confidence):
+    """YOLO label lines or OCR text for a sample, or None if it has no usable label"""
+    if sample['kind'] == 'detection':
+        return yolo_lines(sample['sidecar'], min_confidence) or None
+    return read_ocr_text(sample['ocr_result']) or None
+
+def write_sample(sample, label, split, output_dir, image_mode):
+    """Write one kept sample with its label; returns the manifest fields"""
+    if sample['kind'] == 'detection':
+        place_image(sample['image'], os.path.join(output_dir, 'images', split, f"{sample['id']}.jpg"), image_mode)
+        with open(os.path.join(output_dir, 'labels', split, f"{sample['id']}.txt"), 'w') as f:
+            f.write('\n'.join(label))
+        return {'labels': len(label)}
+
+    place_image(sample['image'], os.path.join(output_dir, 'ocr', split, f"{sample['id']}.jpg"), image_mode)
+    return {'text': label}
+
+def load_manifest(manifest_path, max_distance):
+    """Finished sample ids and the hash index of kept samples per kind"""
+    done = set()
+    indexes = {'detection': HashIndex(max_distance), 'ocr': HashIndex(max_distance)}
+    if os.path.exists(manifest_path):
+        line = '\n'
+        with open(manifest_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Torn last line from an interrupted run
+                done.add(entry['id'])
+                if entry['status'] == 'kept':
+                    indexes[entry['kind']].add(int(entry['hash'], 16))
+        if not line.endswith('\n'):
+            with open(manifest_path, 'a') as f:
+                f.write('\n')  # Keep the next chunk off the torn line
+    return done, indexes
+
+def load_verified(output_dir):
+    """Human-checked OCR labels from ocr/verified.tsv, by crop name"""
+    path = os.path.join(output_dir, 'ocr', 'verified.tsv')
+    verified = {}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                name, _, text = line.rstrip('\n').partition('\t')
+                if name and text:
+                    verified[name] = text
+    return verified
+
+def finalize(output_dir, manifest_path):
+    """Write data.yaml and the OCR label files from the manifest"""
+    verified = load_verified(output_dir)
+    ocr_labels = {'train': [], 'val': []}
+    with open(manifest_path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if entry['status'] == 'kept' and entry['kind'] == 'ocr':
+                name = f"{entry['id']}.jpg"
+                text = verified.get(name)
+                ocr_labels[entry['split']].append(f"{name}\t{text}\t1" if text else f"{name}\t{entry['text']}\t0")
+    for split, lines in ocr_labels.items():
+        print(f"ocr/{split}: {sum(line.endswith('1') for line in lines)} of {len(lines)} labels verified")
+        with open(os.path.join(output_dir, 'ocr', split, 'labels.tsv'), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + ('\n' if lines else ''))
+
+    with open(os.path.join(output_dir, 'data.yaml'), 'w') as f:
+        f.write(f"path: {os.path.abspath(output_dir)}\n")
+        f.write("train: images/train\n")
+        f.write("val: images/val\n")
+        f.write("names:\n")
+        for i, name in enumerate(CLASS_NAMES):
+            f.write(f"  {i}: {name}\n")
+
+def build_dataset(root, output_dir, chunk_size=1000, val_fraction=0.1, max_distance=12, min_confidence=0.5,
+                  image_mode='hardlink', workers=None):
+    for parts in [('images', 'train'), ('images', 'val'), ('labels', 'train'), ('labels', 'val'),
+                  ('ocr', 'train'), ('ocr', 'val')]:
+        os.makedirs(os.path.join(output_dir, *parts), exist_ok=True)
+
+    manifest_path = os.path.join(output_dir, 'manifest.jsonl')
+    done, indexes = load_manifest(manifest_path, max_distance)
+    samples = [sample for sample in list(index_detection_samples(root)) + list(index_ocr_samples(root))
+               if sample['id'] not in done]
+    print(f"{len(done)} samples already in the manifest, {len(samples)} new")
+
+    counts = {'kept': 0, 'duplicate': 0, 'unlabeled': 0, 'unreadable': 0}
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for offset in range(0, len(samples), chunk_size):
+            chunk = samples[offset:offset + chunk_size]
+            hashes = list(pool.map(hash_image, [sample['image'] for sample in chunk], chunksize=16))
+            labels = list(pool.map(sample_label, chunk, [min_confidence] * len(chunk), chunksize=16))
+
+            # Deduplicate in capture order so reruns make the same choices. Only kept samples
+            # enter the index, so an unlabeled frame never hides a labeled near-duplicate
+            entries = []
+            kept = []
+            for sample, value, label in zip(chunk, hashes, labels):
+                entry = {'id': sample['id'], 'kind': sample['kind'], 'source': sample['image']}
+                entries.append(entry)
+                if value is None:
+                    entry['status'] = 'unreadable'
+                elif label is None:
+                    entry['status'] = 'unlabeled'
+                elif indexes[sample['kind']].near(value):
+                    entry['status'] = 'duplicate'
+                else:
+                    entry.update(status='kept', hash=f"{value:064x}", split=split_for(sample['id'], val_fraction))
+                    indexes[sample['kind']].add(value)
+                    kept.append((sample, label, entry))
+
+            results = pool.map(write_sample, [sample for sample, _, _ in kept], [label for _, label, _ in kept],
+                               [entry['split'] for _, _, entry in kept], [output_dir] * len(kept),
+                               [image_mode] * len(kept))
+            for (_, _, entry), fields in zip(kept, results):
+                entry.update(fields)
+
+            # The chunk only counts as done once its manifest lines are on disk
+            with open(manifest_path, 'a') as f:
+                f.write(''.join(json.dumps(entry) + '\n' for entry in entries))
+                f.flush()
+                os.fsync(f.fileno())
+            for entry in entries:
+                counts[entry['status']] += 1
+
+            processed = offset + len(chunk)
+            elapsed = time.perf_counter() - started
+            print(f"{processed}/{len(samples)} samples ({processed / elapsed:.0f}/s): "
+                  f"{counts['kept']} kept, {counts['duplicate']} duplicates, "
+                  f"{counts['unlabeled']} unlabeled, {counts['unreadable']} unreadable")
+
+    finalize(output_dir, manifest_path)
+    print(f"Dataset written to: {output_dir}")
+    return counts
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build training data from detection_results captures")
+    parser.add_argument('root', nargs='?', default='detection_results', help="Pipeline output root")
+    parser.add_argument('output', nargs='?', default='data/gate_dataset', help="Dataset directory")
+    parser.add_argument('--chunk-size', type=int, default=1000, help="Samples per manifest commit")
+    parser.add_argument('--val-fraction', type=float, default=0.1)
+    parser.add_argument('--max-distance', type=int, default=12,
+                        help=f"Differing dHash bits (of {HASH_SIZE ** 2}) still counted as a duplicate")
+    parser.add_argument('--min-confidence', type=float, default=0.5, help="Plate boxes kept as labels")
+    parser.add_argument('--image-mode', choices=IMAGE_MODES, default='hardlink')
+    parser.add_argument('--workers', type=int, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    build_dataset(args.root, args.output, args.chunk_size, args.val_fraction, args.max_distance,
+                  args.min_confidence, args.image_mode, args.workers)
@@ -0,0 +1,132 @@
+#decision_cache.py
+#
+# Recent gate decisions keyed by (lane, plate). A car waiting at the barrier
+# keeps firing the ultrasonic sensor; without this every trigger would run
+# detection, OCR, the authorization lookup and the artifact/log writes again.
+#
+# The lane is the physical gate (lane_orchestrator.Lane.name, 'default' for
+# the single-camera loop), never the camera profile: lanes may share a
+# profile. Only decisions that drove a gate are stored, i.e. the winning
+# authorization of a trigger, not every frame's read.
+#
+#   trigger level  the vehicle that got the lane's last decision has not left
+#                  the sensor (no CLEAR since) -> reuse it, skip the pipeline
+#   lookup level   the same plate was decided on this lane within the
+#                  cooldown -> reuse the answer instead of asking the API
+#   log level      an admitted plate re-read on its lane within the cooldown
+#                  is logged once; denials and failed reads ("No license
+#                  plate detected", "person", ...) are always logged, they
+#                  are the audit trail
+#
+# Denials are never stored: a waiting car that was refused (or misread) is
+# recognized again on its next trigger.
+#
+# An entry expires `cooldown` seconds after the API authorization it came
+# from (verified_at), not after its latest use. Re-storing a decision that
+# was answered from the cache keeps that time, so a plate revoked in the
+# database is looked up again within one cooldown however often it triggers.
+
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+Decision = namedtuple('Decision', ['lane', 'plate', 'authorized', 'decided_at', 'verified_at'])
+
+class DecisionCache:
+    """Time-windowed cache of gate decisions and logged results per lane"""
+    def __init__(self, cooldown=20.0, max_entries=1024):
+        self.cooldown = cooldown  # Seconds an API authorization is reused
+        self.max_entries = max_entries
+        self.decisions = OrderedDict()  # (lane, plate) -> Decision, oldest first
+        self.latest_by_lane = {}  # lane -> newest Decision
+        self.logged = OrderedDict()  # (lane, plate) -> logged_at
+        self.lock = threading.Lock()
+        self.counts = {'hits': 0, 'misses': 0, 'trigger_short_circuits': 0, 'logs_suppressed': 0}
+
+    def fresh(self, decision, now):
+        return now - decision.verified_at < self.cooldown
+
+    def lookup(self, lane, plate):
+        """Cached Decision for the plate on this lane, or None"""
+        now = time.time()
+        with self.lock:
+            decision = self.decisions.get((lane, plate))
+            if decision is not None and self.fresh(decision, now):
+                self.counts['hits'] += 1
+                return decision
+            self.counts['misses'] += 1
+            return None
+
+    def store(self, lane, plate, authorized=True, verified_at=None):
+        """Remember the decision a lane's gate was driven with.
+
+        Pass the cached Decision's `verified_at` when the authorization came
+        from lookup(); None means the API was just asked.
+        """
+        now = time.time()
+        decision = Decision(lane, plate, authorized, now, verified_at or now)
+        with self.lock:
+            self.decisions.pop((lane, plate), None)
+            self.decisions[(lane, plate)] = decision
+            self.latest_by_lane[lane] = decision
+            while len(self.decisions) > self.max_entries:
+                self.decisions.popitem(last=False)
+        return decision
+
+    def latest(self, lane):
+        """The lane's newest decision if its authorization is still within the cooldown"""
+        with self.lock:
+            decision = self.latest_by_lane.get(lane)
+        return decision if decision is not None and self.fresh(decision, time.time()) else None
+
+    def short_circuit(self, lane, last_clear, vehicle_present):
+        """Decision to reuse for a repeat trigger from a vehicle that never left, or None.
+
+        `last_clear` is when the lane's sensor last reported CLEAR (None if the
+        controller cannot tell).
+        """
+        decision = self.latest(lane)
+        if decision is None or last_clear is None or not vehicle_present or last_clear >= decision.decided_at:
+            return None
+        self.count('trigger_short_circuits')
+        return decision
+
+    def should_log(self, lane, plate):
+        """False when this admitted plate was already logged on this lane within the cooldown"""
+        now = time.time()
+        key = (lane, plate)
+        with self.lock:
+            logged_at = self.logged.get(key)
+            if logged_at is not None and now - logged_at < self.cooldown:
+                self.counts['logs_suppressed'] += 1
+                return False
+            self.logged.pop(key, None)
+            self.logged[key] = now
+            while len(self.logged) > self.max_entries:
+                self.logged.popitem(last=False)
+            return True
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] += 1
+
+    def clear(self):
+        with self.lock:
+            self.decisions.clear()
+            self.latest_by_lane.clear()
+            self.logged.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.counts['hits'] + self.counts['misses']
+            return dict(self.counts, entries=len(self.decisions),
+                        hit_rate=round(self.counts['hits'] / lookups, 4) if lookups else 0.0)
+
+    def prometheus_text(self):
+        """Decision cache counters for /metrics"""
+        stats = self.stats()
+        return (f"gate_decision_cache_hits_total {stats['hits']}\n"
+                f"gate_decision_cache_misses_total {stats['misses']}\n"
+                f"gate_decision_cache_trigger_short_circuits_total {stats['trigger_short_circuits']}\n"
+                f"gate_decision_cache_logs_suppressed_total {stats['logs_suppressed']}\n"
+                f"gate_decision_cache_entries {stats['entries']}\n")
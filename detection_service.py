@@ -0,0 +1,101 @@
+#detection_service.py
+#
+# Models and plate inference shared by app.py (WSGI) and asgi_app.py (ASGI).
+# Everything here is CPU-bound and synchronous; the database lookup is left
+# to the caller so each server can use its own Firestore client.
+
+import os
+from datetime import datetime
+
+import cv2
+import easyocr
+from ultralytics import YOLO
+
+import detections
+from plate_grammar import PlateGrammar
+from plate_rectify import PlateRectifier
+from tracing import Tracer
+
+# ========== LATENCY TRACING ==========
+tracer = Tracer(enabled=True)
+
+# ========== SYSTEM INITIALIZATION ==========
+# Initialize OCR reader
+reader = easyocr.Reader(['en'])
+
+# ========== MODELS INITIALIZATION ==========
+plate_model = YOLO(r"C:\Users\siyam\Documents\thesis-1\content\runs\license_plate_model2\weights\best.pt")
+object_model = YOLO("yolov8n.pt")
+
+VEHICLE_CLASSES = [2, 3, 5, 7]  # Cars, motorcycles, buses, trucks
+
+# Reads matching no plate format are skipped instead of being looked up. Registered
+# plates are stored in the same canonical form, so a read and its document id match
+plate_grammar = PlateGrammar.load()
+plate_rectifier = PlateRectifier()
+
+def canonical_plate(text):
+    """Plate text as recognition looks it up, i.e. its document id in 'plates'"""
+    return plate_grammar.canonicalize(text or '')
+
+def registrable_plate(text):
+    """Canonical plate text, or None when it matches no configured plate format"""
+    text = canonical_plate(text)
+    return text if plate_grammar.validate(text) else None
+
+def extract_plate_text(plate_img):
+    """Enhanced plate text extraction with EasyOCR"""
+    try:
+        # Preprocess image
+        gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY)
+        clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
+        enhanced = clahe.apply(gray)
+        _, thresh = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        
+        # OCR with character whitelist
+        with tracer.span('ocr_easyocr'):
+            results = reader.readtext(thresh, detail=0, allowlist='0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+        return results[0] if results else ""
+    except Exception as e:
+        print(f"OCR error: {e}")
+        return ""
+
+def recognize_plate(frame):
+    """Find a vehicle and read its plate; returns (plate_text, [x1, y1, x2, y2], plate_img) or None"""
+    # Vehicle detection
+    with tracer.span('vehicle_detection'):
+        vehicles = detections.select(detections.from_results(object_model(frame, verbose=False)[0]),
+                                     classes=VEHICLE_CLASSES)
+    
+    if not len(vehicles):
+        print("No vehicle detected")
+        return None
+    
+    # License plate recognition
+    with tracer.span('plate_detection'):
+        plates = detections.from_results(plate_model(frame, conf=0.5, verbose=False)[0])
+    
+    # Plates on a detected vehicle first, then the most confident
+    for box in plates['box'][detections.plate_order(plates, vehicles)].astype(int):
+        x1, y1, x2, y2 = box.tolist()
+        with tracer.span('rectify'):
+            plate_img = plate_rectifier.rectify(frame, (x1, y1, x2, y2))
+        
+        plate_text = extract_plate_text(plate_img)
+        with tracer.span('plate_grammar'):
+            match = plate_grammar.best([plate_text])
+        if match:
+            print(f"Detected plate: {match.text}")
+            return match.text, [x1, y1, x2, y2], plate_img
+        if plate_text:
+            print(f"Rejected read matching no plate format: {plate_text}")
+    
+    print("No valid license plates detected")
+    return None
+
+def save_plate_crop(plate_text, plate_img):
+    os.makedirs("captures", exist_ok=True)
+    plate_path = f"captures/plate_{plate_text}_{datetime.now().strftime('%H%M%S')}.jpg"
+    with tracer.span('artifact_write'):
+        cv2.imwrite(plate_path, plate_img)
+    return plate_path
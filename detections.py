@@ -0,0 +1,74 @@
+#detections.py
+#
+# Detections as compact NumPy structured arrays instead of per-box access
+# to ultralytics Results. Each Results object crosses from the device once
+# (boxes.data -> one (N, 6) array); from there class filtering, thresholds
+# and plate/vehicle association are array operations.
+#
+#   dets = from_results(result)
+#   people = dets[class_mask(dets, result.names, {'person'})]
+#   dets['box'], dets['conf'], dets['cls']
+
+import numpy as np
+
+DETECTION_DTYPE = np.dtype([('box', '<f4', (4,)), ('conf', '<f4'), ('cls', '<i4')])
+
+def empty():
+    return np.zeros(0, DETECTION_DTYPE)
+
+def from_array(data):
+    """(N, 6) xyxy/conf/cls array -> DETECTION_DTYPE array"""
+    data = np.asarray(data, np.float32).reshape(-1, 6)
+    dets = np.empty(len(data), DETECTION_DTYPE)
+    dets['box'] = data[:, :4]
+    dets['conf'] = data[:, 4]
+    dets['cls'] = data[:, 5]
+    return dets
+
+def from_results(result):
+    """One Results object -> DETECTION_DTYPE array, with a single device-to-host copy"""
+    return from_array(result.boxes.data.cpu().numpy()[:, :6])
+
+def select(dets, classes=None, min_conf=None):
+    """Detections of the given class ids at or above min_conf"""
+    mask = np.ones(len(dets), bool)
+    if classes is not None:
+        mask &= np.isin(dets['cls'], list(classes))
+    if min_conf is not None:
+        mask &= dets['conf'] >= min_conf
+    return dets[mask]
+
+def class_mask(dets, names, wanted):
+    """Mask of detections whose class name (per the model's `names`) is in `wanted`"""
+    return np.isin(dets['cls'], [i for i, name in names.items() if name in wanted])
+
+def areas(boxes):
+    return np.clip(boxes[:, 2] - boxes[:, 0], 0, None) * np.clip(boxes[:, 3] - boxes[:, 1], 0, None)
+
+def intersections(a, b):
+    """Pairwise intersection areas between (N, 4) and (M, 4) xyxy boxes"""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    return np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+def box_iou(a, b):
+    """IoU matrix between (N, 4) and (M, 4) xyxy boxes"""
+    if not len(a) or not len(b):
+        return np.zeros((len(a), len(b)), np.float32)
+    inter = intersections(a, b)
+    return inter / np.maximum(areas(a)[:, None] + areas(b)[None, :] - inter, 1e-9)
+
+def associate(plates, vehicles, min_inside=0.8):
+    """Index of the vehicle each plate lies in (-1 if none), by share of plate area inside the box"""
+    if not len(plates) or not len(vehicles):
+        return np.full(len(plates), -1)
+    inside = intersections(plates['box'], vehicles['box']) / np.maximum(areas(plates['box']), 1e-9)[:, None]
+    best = inside.argmax(1)
+    return np.where(inside[np.arange(len(plates)), best] >= min_inside, best, -1)
+
+def plate_order(plates, vehicles, min_inside=0.8):
+    """Indices of plates to read: plates on a detected vehicle first, then by confidence"""
+    on_vehicle = associate(plates, vehicles, min_inside) >= 0
+    return np.lexsort((-plates['conf'], ~on_vehicle))
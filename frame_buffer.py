@@ -0,0 +1,116 @@
+#frame_buffer.py
+
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+class FrameRingBuffer:
+    """Keeps the last few seconds of frames from a video source in memory"""
+    def __init__(self, video_source, seconds=3, max_fps=10):
+        self.video_source = video_source
+        self.seconds = seconds
+        self.min_interval = 1.0 / max_fps
+        self.frames = deque(maxlen=max(1, int(seconds * max_fps)))
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+        self.reconnect_delay = 1  # Seconds before reopening a failed source
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.capture_loop, name="frame-buffer", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2)
+            self.thread = None
+
+    def capture_loop(self):
+        """Read continuously so the stream never lags, keep frames at max_fps"""
+        while self.running:
+            cap = cv2.VideoCapture(self.video_source)
+            if not cap.isOpened():
+                print(f"Error opening video source: {self.video_source}")
+                time.sleep(self.reconnect_delay)
+                continue
+
+            last_kept = 0
+            while self.running:
+                ret, frame = cap.read()
+                if not ret:
+                    print("Frame buffer lost video source - reconnecting")
+                    break
+                now = time.time()
+                if now - last_kept >= self.min_interval:
+                    with self.lock:
+                        self.frames.append((now, frame))
+                    last_kept = now
+            cap.release()
+            time.sleep(self.reconnect_delay)
+
+    def snapshot(self, since=None):
+        """Return buffered (timestamp, frame) pairs, oldest first"""
+        with self.lock:
+            frames = list(self.frames)
+        if since is not None:
+            frames = [(ts, frame) for ts, frame in frames if ts >= since]
+        return frames
+
+    def stable(self, frames):
+        """Selected snapshot() pairs, safe to keep (ours are never overwritten)"""
+        return frames
+
+    def latest(self):
+        with self.lock:
+            return self.frames[-1] if self.frames else None
+
+# ========== FRAME SCORING ==========
+def _small_gray(frame, width=320):
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    scale = width / gray.shape[1]
+    if scale < 1:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return gray
+
+def sharpness(gray):
+    """Variance of the Laplacian - low values mean a blurry frame"""
+    return cv2.Laplacian(gray, cv2.CV_64F).var()
+
+def motion(gray, previous_gray):
+    """Mean absolute difference to the previous frame, 0..1"""
+    if previous_gray is None or previous_gray.shape != gray.shape:
+        return 0.0
+    return float(cv2.absdiff(gray, previous_gray).mean()) / 255.0
+
+def select_best_frames(frames, count, plate_scorer=None, shortlist_factor=2,
+                       sharpness_weight=0.4, plate_weight=0.5, motion_weight=0.1):
+    """Rank buffered frames and return the best `count` (timestamp, frame) pairs.
+
+    Frames are first ranked by sharpness and low motion (a moving car between
+    consecutive frames means motion blur). Only that shortlist is passed to
+    `plate_scorer`, which returns the best plate-box confidence per frame.
+    """
+    if not frames:
+        return []
+
+    grays = [_small_gray(frame) for _, frame in frames]
+    sharp = np.array([sharpness(gray) for gray in grays])
+    moving = np.array([motion(gray, grays[i - 1] if i else None) for i, gray in enumerate(grays)])
+    sharp_norm = sharp / sharp.max() if sharp.max() > 0 else sharp
+    scores = sharpness_weight * sharp_norm - motion_weight * moving
+
+    shortlist = list(np.argsort(-scores)[:max(count, count * shortlist_factor)])
+    if plate_scorer:
+        plate_conf = plate_scorer([frames[i][1] for i in shortlist])
+        for i, conf in zip(shortlist, plate_conf):
+            scores[i] += plate_weight * conf
+        shortlist.sort(key=lambda i: -scores[i])
+
+    return [frames[i] for i in shortlist[:count]]
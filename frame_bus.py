@@ -0,0 +1,244 @@
+#frame_bus.py
+#
+# Shared-memory ring of decoded frames between a capture process and the
+# inference process(es), so stream decoding and YOLO never share a thread
+# and full-resolution frames are never pickled.
+#
+# Layout of the segment:
+#   header  int64[4]             latest published seq, slots, height, width
+#   meta    int64[slots, 5]      version, seq, frame height, frame width, timestamp (us)
+#   data    uint8[slots, H, W, 3]
+#
+# Frame `seq` (1, 2, ...) lives in slot seq % slots. There is one writer per
+# bus. It bumps the slot version to odd before copying a frame in and back
+# to even afterwards (a seqlock), then publishes the seq in the header.
+# Readers never block the writer: they jump to the newest frame and drop
+# whatever they were too slow for. Frames come back as NumPy views into the
+# segment. Because a view can be overwritten once the writer laps the ring,
+# call still_valid() after using it, or copy it.
+
+import multiprocessing
+import os
+import time
+from collections import namedtuple
+from multiprocessing import resource_tracker, shared_memory
+
+import cv2
+import numpy as np
+
+VERSION, SEQ, HEIGHT, WIDTH, TIMESTAMP = range(5)
+HEADER_BYTES = 4 * 8
+
+BusFrame = namedtuple('BusFrame', ['seq', 'timestamp', 'image', 'version'])
+
+def _attach(name):
+    """Open an existing segment; only the creating process may unlink it"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        if os.name == 'posix':
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+class FrameBus:
+    """Fixed-size slots of BGR frames in one shared memory segment"""
+    def __init__(self, name=None, slots=30, height=1080, width=1920):
+        if name is None:
+            meta_bytes = slots * 5 * 8
+            self.shm = shared_memory.SharedMemory(create=True,
+                                                  size=HEADER_BYTES + meta_bytes + slots * height * width * 3)
+            self.owner = True
+            self.header = np.ndarray((4,), np.int64, buffer=self.shm.buf)
+            self.header[:] = (0, slots, height, width)
+        else:
+            self.shm = _attach(name)
+            self.owner = False
+            self.header = np.ndarray((4,), np.int64, buffer=self.shm.buf)
+        self.slots, self.height, self.width = (int(v) for v in self.header[1:])
+        self.meta = np.ndarray((self.slots, 5), np.int64, buffer=self.shm.buf, offset=HEADER_BYTES)
+        self.data = np.ndarray((self.slots, self.height, self.width, 3), np.uint8, buffer=self.shm.buf,
+                               offset=HEADER_BYTES + self.meta.nbytes)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        # Views must go before the mapping can be closed
+        del self.header, self.meta, self.data
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    # ---------- writer ----------
+    def write(self, frame, timestamp=None):
+        """Copy a frame into the next slot and publish it; returns its seq"""
+        h, w = frame.shape[:2]
+        if h > self.height or w > self.width:
+            scale = min(self.height / h, self.width / w)
+            frame = cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+            h, w = frame.shape[:2]
+
+        seq = int(self.header[0]) + 1
+        meta = self.meta[seq % self.slots]
+        meta[VERSION] += 1  # Odd: slot being written
+        self.data[seq % self.slots, :h, :w] = frame
+        meta[SEQ] = seq
+        meta[HEIGHT] = h
+        meta[WIDTH] = w
+        meta[TIMESTAMP] = int((timestamp or time.time()) * 1e6)
+        meta[VERSION] += 1  # Even: slot stable
+        self.header[0] = seq
+        return seq
+
+    # ---------- readers ----------
+    def latest_seq(self):
+        return int(self.header[0])
+
+    def read(self, seq):
+        """Zero-copy view of frame `seq`, or None if it was overwritten or is being written"""
+        if seq <= 0:
+            return None
+        meta = self.meta[seq % self.slots]
+        version = int(meta[VERSION])
+        if version % 2 or meta[SEQ] != seq:
+            return None
+        h, w, timestamp = int(meta[HEIGHT]), int(meta[WIDTH]), meta[TIMESTAMP] / 1e6
+        if meta[VERSION] != version:
+            return None
+        return BusFrame(seq, timestamp, self.data[seq % self.slots, :h, :w], version)
+
+    def still_valid(self, frame):
+        """True if the writer has not touched the frame's slot since it was read"""
+        return self.meta[frame.seq % self.slots, VERSION] == frame.version
+
+    def read_copy(self, seq):
+        """Copy of frame `seq` that stays valid; None if it was overwritten meanwhile"""
+        frame = self.read(seq)
+        if frame is None:
+            return None
+        image = frame.image.copy()
+        if not self.still_valid(frame):
+            return None
+        return frame._replace(image=image)
+
+class FrameBusReader:
+    """Follows the newest frame on a bus, dropping frames it was too slow for"""
+    def __init__(self, bus, poll_interval=0.002):
+        self.bus = bus
+        self.poll_interval = poll_interval
+        self.last_seq = 0
+        self.received = 0
+        self.dropped = 0
+
+    def next(self, timeout=1.0):
+        """Wait for a frame newer than the last one returned; None on timeout"""
+        deadline = time.time() + timeout
+        while True:
+            seq = self.bus.latest_seq()
+            if seq > self.last_seq:
+                frame = self.bus.read(seq)
+                if frame is not None:
+                    if self.last_seq:
+                        self.dropped += seq - self.last_seq - 1
+                    self.last_seq = seq
+                    self.received += 1
+                    return frame
+            if time.time() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+# ========== CAPTURE PROCESS ==========
+def capture_process(bus_name, video_source, max_fps, stop_event, reconnect_delay=1):
+    """Decode `video_source` into the bus until `stop_event` is set"""
+    bus = FrameBus(name=bus_name)
+    min_interval = 1.0 / max_fps
+    try:
+        while not stop_event.is_set():
+            cap = cv2.VideoCapture(video_source)
+            if not cap.isOpened():
+                print(f"Error opening video source: {video_source}")
+                time.sleep(reconnect_delay)
+                continue
+
+            last_kept = 0
+            while not stop_event.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    print("Frame bus lost video source - reconnecting")
+                    break
+                now = time.time()
+                if now - last_kept >= min_interval:
+                    bus.write(frame, now)
+                    last_kept = now
+            cap.release()
+            time.sleep(reconnect_delay)
+    finally:
+        bus.close()
+
+class FrameBusSource:
+    """FrameRingBuffer drop-in whose frames are decoded in a separate process"""
+    def __init__(self, video_source, seconds=3, max_fps=10, height=1080, width=1920):
+        self.video_source = video_source
+        self.max_fps = max_fps
+        self.bus = FrameBus(slots=max(2, int(seconds * max_fps)), height=height, width=width)
+        self.context = multiprocessing.get_context('spawn')
+        self.stop_event = self.context.Event()
+        self.process = None
+
+    def start(self):
+        if self.process and self.process.is_alive():
+            return
+        self.stop_event.clear()
+        self.process = self.context.Process(target=capture_process, name="frame-bus-capture", daemon=True,
+                                            args=(self.bus.name, self.video_source, self.max_fps,
+                                                  self.stop_event))
+        self.process.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.process:
+            self.process.join(timeout=3)
+            if self.process.is_alive():
+                self.process.terminate()
+            self.process = None
+        if self.bus:
+            self.bus.close()
+            self.bus = None
+
+    def snapshot(self, since=None):
+        """Buffered (timestamp, frame) pairs, oldest first, as views into the bus (no copy).
+
+        The writer may overwrite a view once it laps the ring; pass the frames
+        you keep through stable(). Empty after stop().
+        """
+        bus = self.bus
+        if bus is None:
+            return []
+        latest = bus.latest_seq()
+        frames = []
+        for seq in range(max(1, latest - bus.slots + 1), latest + 1):
+            frame = bus.read(seq)
+            if frame is not None and (since is None or frame.timestamp >= since):
+                frames.append((frame.timestamp, frame.image))
+        return frames
+
+    def stable(self, frames):
+        """Copies of selected snapshot() pairs, dropping any the writer overwrote meanwhile"""
+        bus = self.bus
+        if bus is None:
+            return []
+        copies = []
+        for timestamp, _ in frames:
+            slots = np.flatnonzero(bus.meta[:, TIMESTAMP] == int(round(timestamp * 1e6)))
+            frame = bus.read_copy(int(bus.meta[slots[0], SEQ])) if len(slots) else None
+            if frame is not None and frame.timestamp == timestamp:
+                copies.append((frame.timestamp, frame.image))
+        return copies
+
+    def latest(self):
+        """Newest (timestamp, frame view), None when empty or stopped"""
+        bus = self.bus
+        frame = bus.read(bus.latest_seq()) if bus is not None else None
+        return (frame.timestamp, frame.image) if frame else None
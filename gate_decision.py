@@ -0,0 +1,204 @@
+#gate_decision.py
+#
+# Gate decisions, decoupled from recognition. Recognition posts events
+# (plate, authorized) and returns at once; one thread per gate owns the
+# controller and applies the policies on a timer:
+#
+#   debounce        repeat events for the same plate within `debounce` s are
+#                   merged, and gate commands are at least `debounce` s apart
+#   hold open       an authorized vehicle gets HOLD instead of a timed OPEN;
+#                   the gate stays up while the sensor still sees it (at
+#                   least `min_open`, at most `max_hold` seconds)
+#   anti-tailgating each opening admits one vehicle: once it has cleared the
+#                   sensor the gate closes after `clear_delay`. A second
+#                   vehicle arriving under the open gate raises an alarm, and
+#                   no further plate is admitted on this opening; the gate
+#                   closes once the sensor has been clear for `clear_delay`
+#   cooldown        a plate that just passed cannot open the gate again for
+#                   `cooldown` seconds (passback / re-trigger after close)
+#
+# The boom is never lowered while the sensor sees a vehicle, whatever the
+# policy or limit; the firmware applies the same rule to its own timers and
+# closes a HOLD after MAX_HOLD if this host stops sending commands.
+#
+# Vehicle presence comes from the controller's PRESENT/DETECTED/CLEAR state;
+# on controllers without a sensor the gate closes after `min_open`.
+
+import queue
+import threading
+import time
+from collections import namedtuple
+
+GateRequest = namedtuple('GateRequest', ['plate', 'authorized', 'timestamp'])
+
+class GateDecisionService:
+    """Owns one gate controller and decides when it opens and closes"""
+    def __init__(self, controller, name='gate', debounce=0.5, min_open=3.0, max_hold=60.0, clear_delay=1.0,
+                 cooldown=30.0, tick=0.05):
+        self.controller = controller
+        self.name = name
+        self.debounce = debounce
+        self.min_open = min_open
+        self.max_hold = max_hold
+        self.clear_delay = clear_delay
+        self.cooldown = cooldown
+        self.tick = tick
+        self.requests = queue.Queue()
+        self.thread = None
+        self.running = False
+        self.lock = threading.Lock()
+        # Decision state, only touched by the service thread
+        self.is_open = False
+        self.opened_at = None
+        self.admitted = None  # Plate the current opening is for
+        self.vehicle_seen = False  # The admitted vehicle has been under the sensor
+        self.cleared_at = None  # When it left the sensor
+        self.last_present = None  # Last tick the sensor saw a vehicle
+        self.alarm = False  # A second vehicle came in under this opening
+        self.last_command = 0.0
+        self.recent = {}  # plate -> time of its last accepted request
+        self.passed = {}  # plate -> time it last went through
+        self.counts = {'requests': 0, 'debounced': 0, 'opened': 0, 'extended': 0, 'denied': 0,
+                       'cooldown': 0, 'tailgating': 0, 'refused': 0, 'closed': 0, 'forced_close': 0}
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name=f"gate-{self.name}", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, close=True):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=3)
+        if close and self.is_open:
+            self.command(False)
+
+    def post(self, plate, authorized, timestamp=None):
+        """Queue a recognition result; never blocks on the gate"""
+        self.requests.put(GateRequest(plate, authorized, timestamp or time.time()))
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counts, open=self.is_open, alarm=self.alarm, queued=self.requests.qsize())
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] += 1
+
+    # ========== SERVICE THREAD ==========
+    def run(self):
+        while self.running:
+            try:
+                request = self.requests.get(timeout=self.tick)
+            except queue.Empty:
+                request = None
+            try:
+                if request:
+                    self.handle(request)
+                self.update(time.time())
+            except Exception as e:
+                print(f"[{self.name}] Gate decision error: {e}")
+
+    def command(self, open_gate):
+        """Drive the controller (blocks on the serial ACK, which is fine on this thread)"""
+        self.last_command = time.time()
+        if not open_gate:
+            self.controller.close_gate()
+        elif hasattr(self.controller, 'hold_gate'):
+            self.controller.hold_gate()  # The host closes it, not the firmware timer
+        else:
+            self.controller.open_gate()
+
+    def vehicle_present(self):
+        return getattr(self.controller, 'vehicle_present', False)
+
+    def handle(self, request):
+        self.count('requests')
+        now = time.time()
+        if request.plate:
+            last = self.recent.get(request.plate)
+            if last is not None and request.timestamp - last < self.debounce:
+                self.count('debounced')
+                return
+            self.recent[request.plate] = request.timestamp
+
+        if not request.authorized:
+            self.count('denied')
+            if self.is_open and self.cleared_at is not None:
+                self.raise_alarm(f"unauthorized {request.plate or 'vehicle'}")  # Behind the admitted one
+            return
+        if self.alarm:
+            self.count('refused')  # Not on an opening someone already tailgated
+            print(f"[{self.name}] Tailgating alarm active - not admitting {request.plate}")
+            return
+
+        passed = self.passed.get(request.plate)
+        if passed is not None and now - passed < self.cooldown:
+            self.count('cooldown')
+            print(f"[{self.name}] {request.plate} passed {now - passed:.0f}s ago - not reopening")
+            return
+
+        if self.is_open and request.plate == self.admitted:
+            self.count('extended')
+            return
+        # A new authorized vehicle: (re)start an admission
+        if not self.is_open:
+            if now - self.last_command < self.debounce:
+                time.sleep(self.debounce - (now - self.last_command))
+            self.command(True)
+            self.is_open = True
+            self.count('opened')
+        else:
+            self.count('extended')
+            if self.admitted and self.cleared_at is None:
+                self.passed[self.admitted] = now  # Goes through on this opening; keep its cooldown
+        self.opened_at = now
+        self.admitted = request.plate
+        self.vehicle_seen = self.vehicle_present()
+        self.last_present = now if self.vehicle_seen else None
+        self.cleared_at = None
+
+    def update(self, now):
+        """Timer policies: hold while present, close after the vehicle cleared, limits"""
+        if not self.is_open:
+            return
+        open_for = now - self.opened_at
+
+        if self.vehicle_present():
+            if self.cleared_at is not None:
+                self.raise_alarm('second vehicle')  # Under the admitted vehicle's opening
+            self.vehicle_seen = True
+            self.last_present = now
+            return  # Never lower the boom onto a vehicle, not even at max_hold
+        if self.vehicle_seen and self.cleared_at is None:
+            self.cleared_at = now
+            if self.admitted:
+                self.passed[self.admitted] = now
+
+        clear_for = now - self.last_present if self.last_present is not None else None
+        if open_for >= self.max_hold:
+            self.close(now, 'forced_close')
+        elif self.cleared_at is not None and clear_for >= self.clear_delay and (open_for >= self.min_open or self.alarm):
+            self.close(now, 'closed')
+        elif not self.vehicle_seen and open_for >= self.min_open:
+            self.close(now, 'closed')  # No sensor, or the vehicle never moved in
+
+    def raise_alarm(self, what):
+        if self.alarm:
+            return
+        self.alarm = True
+        self.count('tailgating')
+        print(f"[{self.name}] ALARM: {what} behind {self.admitted} - closing once the lane is clear")
+
+    def close(self, now, reason):
+        self.command(False)
+        self.count(reason)
+        if reason != 'closed':
+            self.count('closed')
+        self.is_open = False
+        self.opened_at = self.admitted = self.cleared_at = self.last_present = None
+        self.vehicle_seen = self.alarm = False
+        # Forget old debounce/cooldown entries
+        self.recent = {p: t for p, t in self.recent.items() if now - t < self.debounce}
+        self.passed = {p: t for p, t in self.passed.items() if now - t < self.cooldown}
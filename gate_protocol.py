@@ -0,0 +1,224 @@
+#gate_protocol.py
+#
+# Serial line protocol shared by src/main.cpp and ArduinoGateController.
+#
+# Host -> Arduino, one command per line, framed with '>' so the legacy
+# single-byte '1'/'0' commands still work:
+#     >12 OPEN            open, auto-close after the configured duration
+#     >13 HOLD            open and stay open until CLOSE (at most MAX_HOLD_MS,
+#                         in case the host hangs)
+#     >14 CLOSE
+#     >15 RATE 200        stream a DIST sample every 200 ms (0 = off)
+#     >16 DURATION 10000  auto-close duration in ms
+#     >17 PING
+#
+# Arduino -> host:
+#     READY               after boot
+#     ACK 12 OPEN         command accepted (NAK 12 <reason> if not)
+#     OPENED / CLOSED     gate state changed (also sent on auto-close)
+#     PRESENT / CLEAR     vehicle entered / left the detection range, any gate state
+#     DETECTED            vehicle waiting at the closed gate (repeated every second)
+#     DIST 57             distance sample in cm
+#
+# Timed closes (OPEN's duration, MAX_HOLD_MS) wait while a vehicle is in
+# range; the firmware never lowers the boom onto it by itself.
+
+import queue
+import threading
+import time
+
+SIMULATED_PORT = 'sim://'
+MAX_HOLD_MS = 120000  # MAX_HOLD in src/main.cpp
+
+COMMANDS = ('OPEN', 'HOLD', 'CLOSE', 'RATE', 'DURATION', 'PING')
+EVENT_NAMES = ('READY', 'ACK', 'NAK', 'OPENED', 'CLOSED', 'PRESENT', 'DETECTED', 'CLEAR', 'DIST')
+
+class GateEvent:
+    """Single line received from the Arduino, stamped on arrival"""
+    def __init__(self, name, timestamp, seq=None, value=None):
+        self.name = name
+        self.timestamp = timestamp
+        self.seq = seq
+        self.value = value
+
+    def __repr__(self):
+        return f"GateEvent({self.name!r}, {self.timestamp:.3f}, seq={self.seq}, value={self.value!r})"
+
+def encode_command(seq, name, arg=None):
+    """Build the bytes for one host command"""
+    if name not in COMMANDS:
+        raise ValueError(f"Unknown gate command: {name}")
+    line = f">{seq} {name}" if arg is None else f">{seq} {name} {arg}"
+    return (line + "\n").encode()
+
+def parse_line(line, timestamp=None):
+    """Parse one Arduino line into a GateEvent, or None if unrecognized"""
+    parts = line.strip().split()
+    if not parts or parts[0] not in EVENT_NAMES:
+        return None
+    timestamp = time.time() if timestamp is None else timestamp
+    name = parts[0]
+    try:
+        if name in ('ACK', 'NAK'):
+            return GateEvent(name, timestamp, seq=int(parts[1]), value=' '.join(parts[2:]))
+        if name == 'DIST':
+            return GateEvent(name, timestamp, value=int(parts[1]))
+    except (IndexError, ValueError):
+        return None
+    return GateEvent(name, timestamp)
+
+# ========== SIMULATED GATE DEVICE ==========
+class SimulatedGateDevice:
+    """In-process stand-in for the Arduino, exposing the pyserial calls we use.
+
+    Runs the same commands, timers and events as src/main.cpp on a
+    background thread (without the firmware's sensor debouncing).
+    Set `distance` to move a simulated vehicle in front of the sensor, and
+    `reply_delay` (seconds) to make ACK/NAK replies arrive late.
+    """
+    def __init__(self, timeout=1, open_duration=10000, stream_interval=200,
+                 detection_threshold=30, tick=0.01, max_hold=MAX_HOLD_MS):
+        self.timeout = timeout
+        self.open_duration = open_duration
+        self.max_hold = max_hold
+        self.stream_interval = stream_interval
+        self.detection_threshold = detection_threshold
+        self.detect_repeat = 1000
+        self.tick = tick
+        self.distance = 400  # cm, nothing in front of the sensor
+        self.reply_delay = 0
+        self.gate_open = False
+        self.hold_open = False
+        self.servo_angle = 0
+        self.commands = []  # (seq, name, arg) log for inspection
+        self.is_open = True
+        self._incoming = queue.Queue()
+        self._outgoing = queue.Queue()
+        self._buffer = b''
+        self._opened_at = 0
+        self._last_stream = 0
+        self._last_detect = None
+        self._present = False
+        self._thread = threading.Thread(target=self._run, name="sim-gate", daemon=True)
+        self._thread.start()
+        self._send("READY")
+
+    # ---- pyserial interface ----
+    @property
+    def in_waiting(self):
+        return self._outgoing.qsize()
+
+    def write(self, data):
+        self._incoming.put(bytes(data))
+        return len(data)
+
+    def readline(self):
+        try:
+            return self._outgoing.get(timeout=self.timeout)
+        except queue.Empty:
+            return b''
+
+    def close(self):
+        self.is_open = False
+        self._thread.join(timeout=1)
+
+    # ---- firmware behaviour ----
+    def _millis(self):
+        return time.monotonic() * 1000
+
+    def _send(self, line):
+        self._outgoing.put((line + "\n").encode())
+
+    def _reply(self, line):
+        if self.reply_delay:
+            threading.Timer(self.reply_delay, self._send, [line]).start()
+        else:
+            self._send(line)
+
+    def _run(self):
+        while self.is_open:
+            self._read_commands()
+            self._update(self._millis())
+            time.sleep(self.tick)
+
+    def _read_commands(self):
+        while True:
+            try:
+                data = self._incoming.get_nowait()
+            except queue.Empty:
+                return
+            for byte in data:
+                char = bytes([byte])
+                if not self._buffer and char in (b'1', b'0'):
+                    self._legacy_command(char)
+                elif char == b'\n':
+                    self._handle_line(self._buffer.decode(errors='ignore'))
+                    self._buffer = b''
+                elif self._buffer or char == b'>':
+                    self._buffer += char
+
+    def _legacy_command(self, char):
+        if char == b'1' and not self.gate_open:
+            self._open(hold=False)
+        elif char == b'0':
+            self._close()
+
+    def _handle_line(self, line):
+        parts = line.lstrip('>').split()
+        try:
+            seq, name = int(parts[0]), parts[1]
+            arg = int(parts[2]) if len(parts) > 2 else None
+        except (IndexError, ValueError):
+            return
+        self.commands.append((seq, name, arg))
+        if name in ('RATE', 'DURATION') and (arg is None or arg < 0):
+            self._reply(f"NAK {seq} BADARG")
+            return
+        if name not in COMMANDS:
+            self._reply(f"NAK {seq} UNKNOWN")
+            return
+        self._reply(f"ACK {seq} {name}")
+        if name == 'OPEN':
+            self._open(hold=False)
+        elif name == 'HOLD':
+            self._open(hold=True)
+        elif name == 'CLOSE':
+            self._close()
+        elif name == 'RATE':
+            self.stream_interval = arg
+        elif name == 'DURATION':
+            self.open_duration = arg
+
+    def _open(self, hold):
+        self.hold_open = hold
+        self._opened_at = self._millis()
+        self.servo_angle = 120
+        if not self.gate_open:
+            self.gate_open = True
+            self._send("OPENED")
+
+    def _close(self):
+        self.hold_open = False
+        self.servo_angle = 0
+        self.gate_open = False
+        self._send("CLOSED")
+
+    def _update(self, now):
+        present = 0 < self.distance < self.detection_threshold
+        limit = self.max_hold if self.hold_open else self.open_duration
+        if self.gate_open and not present and now - self._opened_at >= limit:
+            self._close()
+
+        if present and not self.gate_open:
+            if self._last_detect is None or now - self._last_detect >= self.detect_repeat:
+                self._send("DETECTED")
+                self._last_detect = now
+        elif not present:
+            self._last_detect = None
+        if present != self._present:
+            self._send("PRESENT" if present else "CLEAR")
+        self._present = present
+
+        if self.stream_interval and now - self._last_stream >= self.stream_interval:
+            self._send(f"DIST {int(self.distance)}")
+            self._last_stream = now
@@ -0,0 +1,25 @@
+#gunicorn.conf.py
+#
+# Multi-worker serving for app.py: gunicorn -c gunicorn.conf.py wsgi:app
+# Worker and thread counts can be overridden with GATE_WORKERS/GATE_THREADS.
+
+import multiprocessing
+import os
+
+bind = os.environ.get('GATE_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GATE_WORKERS', max(2, multiprocessing.cpu_count() // 2)))
+worker_class = 'gthread'
+threads = int(os.environ.get('GATE_THREADS', 4))  # Firestore calls are I/O bound
+preload_app = True  # Load models once in the master, share them copy-on-write
+timeout = 60
+keepalive = 5
+
+def post_fork(server, worker):
+    import app
+    import torch
+
+    # Split the cores between workers instead of every worker using all of them
+    torch.set_num_threads(max(1, multiprocessing.cpu_count() // workers))
+    # Each worker needs its own Firestore gRPC channel
+    app.connect_firestore()
+    app.init_firebase()
@@ -0,0 +1,159 @@
+#joint_detector.py
+#
+# One YOLO model for vehicles, people/animals and plates, so process_frame
+# needs a single forward pass instead of yolov8n.pt plus the plate model.
+#
+# Recipe:
+#
+#   python convert_voc.py --classes car,bus,motorbike,person,dog,cat,horse,sheep,cow --output-dir data/voc2012_yolo
+#   python dataset_builder.py detection_results data/gate_dataset
+#   python joint_detector.py merge data/voc2012_yolo data/gate_dataset data/joint --plate-teacher best.pt
+#   python joint_detector.py train data/joint --epochs 100
+#
+# then run with LicensePlateSystem(joint_model_path=runs/detect/<name>/weights/best.pt)
+# (lanes.json "joint_model", GATE_JOINT_MODEL or benchmark.py --joint-model); the
+# two-model pair is then never loaded.
+#
+# The sources are labeled for different classes: VOC has no plates and the
+# gate captures only have plates. Merging maps every source's class names
+# onto JOINT_NAMES and fills in the classes a source never labeled with
+# the current models as teachers (yolov8n.pt for the COCO classes, the
+# plate model for plates). Otherwise the joint model would learn that an
+# unlabeled plate or car is background.
+
+import argparse
+import os
+
+import yaml
+
+from convert_voc import IMAGE_MODES, place_image
+from detections import from_results
+
+# Same names as COCO, so non_vehicle_classes keeps working on the joint model
+JOINT_NAMES = ['car', 'motorcycle', 'bus', 'truck', 'person', 'dog', 'cat', 'horse', 'sheep', 'cow',
+               'license_plate']
+ALIASES = {'motorbike': 'motorcycle', 'plate': 'license_plate'}  # VOC / other dataset spellings
+COCO_IDS = {'car': 2, 'motorcycle': 3, 'bus': 5, 'truck': 7, 'person': 0, 'dog': 15, 'cat': 16, 'horse': 17,
+            'sheep': 18, 'cow': 19}
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+def load_names(data_yaml):
+    """Class names of a YOLO dataset, by id"""
+    with open(data_yaml) as f:
+        names = yaml.safe_load(f)['names']
+    return dict(enumerate(names)) if isinstance(names, list) else {int(k): v for k, v in names.items()}
+
+def yolo_line(class_id, box, width, height):
+    x1, y1, x2, y2 = box
+    return (f"{class_id} {(x1 + x2) / 2 / width:.6f} {(y1 + y2) / 2 / height:.6f} "
+            f"{(x2 - x1) / width:.6f} {(y2 - y1) / height:.6f}")
+
+def teacher_lines(model, image_path, class_map, conf):
+    """Pseudo-labels from a teacher model, as joint YOLO label lines"""
+    result = model(image_path, conf=conf, classes=sorted(class_map), verbose=False)[0]
+    height, width = result.orig_shape
+    dets = from_results(result)
+    return [yolo_line(class_map[cls], box, width, height)
+            for box, cls in zip(dets['box'].tolist(), dets['cls'].tolist())]
+
+def merge_datasets(sources, output_dir, object_teacher='yolov8n.pt', plate_teacher=None, teacher_conf=0.5,
+                   image_mode='symlink'):
+    """Merge YOLO datasets into one with JOINT_NAMES, pseudo-labeling classes a source lacks"""
+    from ultralytics import YOLO
+
+    joint_ids = {name: i for i, name in enumerate(JOINT_NAMES)}
+    object_model = YOLO(object_teacher) if object_teacher else None
+    plate_model = YOLO(plate_teacher) if plate_teacher else None
+    counts = {'images': 0, 'labels': 0, 'pseudo_labels': 0}
+
+    for split in ['train', 'val']:
+        for kind in ['images', 'labels']:
+            os.makedirs(os.path.join(output_dir, kind, split), exist_ok=True)
+
+    for source in sources:
+        names = load_names(os.path.join(source, 'data.yaml'))
+        remap = {i: joint_ids[ALIASES.get(name, name)] for i, name in names.items()
+                 if ALIASES.get(name, name) in joint_ids}
+        labeled = {JOINT_NAMES[i] for i in remap.values()}
+        missing_objects = {COCO_IDS[name]: joint_ids[name] for name in COCO_IDS if name not in labeled}
+        teach_plates = 'license_plate' not in labeled and plate_model is not None
+        prefix = os.path.basename(os.path.normpath(source))
+        print(f"{source}: labeled {sorted(labeled)}, teacher fills "
+              f"{sorted(JOINT_NAMES[i] for i in missing_objects.values()) + (['license_plate'] if teach_plates else [])}")
+
+        for split in ['train', 'val']:
+            image_dir = os.path.join(source, 'images', split)
+            if not os.path.isdir(image_dir):
+                continue
+            for name in sorted(os.listdir(image_dir)):
+                if not name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                stem = os.path.splitext(name)[0]
+                image_path = os.path.join(image_dir, name)
+                label_path = os.path.join(source, 'labels', split, f"{stem}.txt")
+
+                lines = []
+                if os.path.exists(label_path):
+                    with open(label_path) as f:
+                        for line in f:
+                            parts = line.split()
+                            if parts and int(parts[0]) in remap:
+                                lines.append(' '.join([str(remap[int(parts[0])])] + parts[1:]))
+                counts['labels'] += len(lines)
+
+                pseudo = []
+                if missing_objects and object_model is not None:
+                    pseudo += teacher_lines(object_model, image_path, missing_objects, teacher_conf)
+                if teach_plates:
+                    pseudo += teacher_lines(plate_model, image_path, {0: joint_ids['license_plate']}, teacher_conf)
+                counts['pseudo_labels'] += len(pseudo)
+
+                out_name = f"{prefix}_{stem}"
+                place_image(image_path, os.path.join(output_dir, 'images', split, out_name + os.path.splitext(name)[1]),
+                            image_mode)
+                with open(os.path.join(output_dir, 'labels', split, f"{out_name}.txt"), 'w') as f:
+                    f.write('\n'.join(lines + pseudo))
+                counts['images'] += 1
+
+    with open(os.path.join(output_dir, 'data.yaml'), 'w') as f:
+        f.write(f"path: {os.path.abspath(output_dir)}\n")
+        f.write("train: images/train\n")
+        f.write("val: images/val\n")
+        f.write("names:\n")
+        for i, name in enumerate(JOINT_NAMES):
+            f.write(f"  {i}: {name}\n")
+    print(f"Merged {counts['images']} images: {counts['labels']} labels, {counts['pseudo_labels']} pseudo-labels")
+    return counts
+
+def train(dataset_dir, model='yolov8n.pt', epochs=100, imgsz=640, batch=16, name='joint'):
+    """Fine-tune from COCO weights on the merged dataset"""
+    from ultralytics import YOLO
+
+    detector = YOLO(model)
+    detector.train(data=os.path.join(dataset_dir, 'data.yaml'), epochs=epochs, imgsz=imgsz, batch=batch, name=name)
+    return detector
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Joint vehicle + plate detector")
+    commands = parser.add_subparsers(dest='command', required=True)
+    sub = commands.add_parser('merge', help="Merge YOLO datasets onto the joint classes")
+    sub.add_argument('sources', nargs='+', help="YOLO dataset roots (convert_voc.py, dataset_builder.py output)")
+    sub.add_argument('output', help="Merged dataset directory")
+    sub.add_argument('--object-teacher', default='yolov8n.pt', help="COCO model for missing vehicle/person/animal labels")
+    sub.add_argument('--plate-teacher', help="Plate model for missing plate labels")
+    sub.add_argument('--teacher-conf', type=float, default=0.5)
+    sub.add_argument('--image-mode', choices=IMAGE_MODES, default='symlink')
+    sub = commands.add_parser('train', help="Train on a merged dataset")
+    sub.add_argument('dataset', help="Merged dataset directory")
+    sub.add_argument('--model', default='yolov8n.pt')
+    sub.add_argument('--epochs', type=int, default=100)
+    sub.add_argument('--imgsz', type=int, default=640)
+    sub.add_argument('--batch', type=int, default=16)
+    sub.add_argument('--name', default='joint')
+    args = parser.parse_args()
+
+    if args.command == 'merge':
+        merge_datasets(args.sources, args.output, args.object_teacher, args.plate_teacher, args.teacher_conf,
+                       args.image_mode)
+    else:
+        train(args.dataset, args.model, args.epochs, args.imgsz, args.batch, args.name)
@@ -0,0 +1,286 @@
+#lane_orchestrator.py
+#
+# Runs several gate lanes in one process with one shared set of models:
+#
+#   python lane_orchestrator.py lanes.json
+#
+# Each lane has its own camera ring buffer and Arduino controller. Lane
+# threads only wait for their sensor; recognition jobs go through one
+# priority scheduler so a lane with a vehicle waiting is always served
+# before background work from idle lanes.
+
+import argparse
+import itertools
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from camera_profiles import CameraProfile
+from frame_bus import FrameBusSource
+from frame_buffer import FrameRingBuffer, select_best_frames
+from license_plate_recognition import ArduinoGateController, LicensePlateSystem, NullGateController
+from tracing import serve_metrics
+
+PRIORITY_TRIGGERED = 0  # Sensor fired, a vehicle is waiting
+PRIORITY_BACKGROUND = 1  # Periodic checks on lanes without a sensor
+
+# ========== SCHEDULER ==========
+class InferenceScheduler:
+    """Priority queue of recognition jobs served by a fixed set of workers.
+
+    Jobs of equal priority run oldest trigger first.
+    """
+    def __init__(self, workers=2):
+        self.jobs = queue.PriorityQueue()
+        self.counter = itertools.count()  # Tie-breaker so jobs are never compared
+        self.threads = [threading.Thread(target=self.worker, name=f"scheduler-{i}", daemon=True)
+                        for i in range(workers)]
+        self.running = False
+
+    def start(self):
+        self.running = True
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.running = False
+        for _ in self.threads:
+            self.jobs.put((float('inf'), 0, next(self.counter), None))
+        for thread in self.threads:
+            thread.join(timeout=5)
+
+    def submit(self, priority, trigger_time, func, *args):
+        self.jobs.put((priority, trigger_time, next(self.counter), (time.time(), func, args)))
+
+    def queue_depth(self):
+        return self.jobs.qsize()
+
+    def worker(self):
+        while self.running:
+            _, _, _, job = self.jobs.get()
+            if job is None:
+                break
+            queued_at, func, args = job
+            try:
+                func(time.time() - queued_at, *args)
+            except Exception as e:
+                print(f"Scheduler job error: {e}")
+
+# ========== LANE ==========
+class Lane:
+    def __init__(self, config, system, scheduler):
+        self.name = config['name']
+        self.system = system
+        self.scheduler = scheduler
+        self.controller = ArduinoGateController(port=config['serial_port'], baudrate=config.get('baudrate', 9600))
+        # "frame_bus": decode the stream in its own process instead of a thread
+        buffer_class = FrameBusSource if config.get('frame_bus') else FrameRingBuffer
+        self.frame_buffer = buffer_class(config['video_source'],
+                                         seconds=config.get('buffer_seconds', system.frame_buffer_seconds),
+                                         max_fps=config.get('buffer_fps', system.frame_buffer_fps))
+        self.candidates = config.get('candidates', system.buffer_candidates)
+        # camera_profiles/<profile>.json, named after the lane unless "profile" says otherwise
+        self.profile = CameraProfile.load(config.get('profile', self.name),
+                                          object_confidence=system.object_confidence,
+                                          plate_confidence=system.plate_confidence)
+        self.background_interval = config.get('background_interval')  # Seconds, for sensorless lanes
+        self.pending = threading.Event()  # A job for this lane is queued or running
+        self.running = False
+        self.thread = None
+        self.lock = threading.Lock()
+        self.stats = {
+            'triggers': 0,
+            'dropped_triggers': 0,
+            'decisions': 0,
+            'cached_decisions': 0,  # Repeat triggers answered from the decision cache
+            'authorized': 0,
+            'errors': 0,
+            'total_decision_ms': 0.0,
+            'last_decision_ms': None,
+            'total_queue_ms': 0.0,
+            'started': time.time()
+        }
+
+    def start(self):
+        self.frame_buffer.start()
+        self.running = True
+        self.thread = threading.Thread(target=self.trigger_loop, name=f"lane-{self.name}", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=3)
+        self.frame_buffer.stop()
+        if self.controller.serial_conn:
+            self.controller.close_gate()
+
+    def trigger_loop(self):
+        """Wait for the lane's sensor and queue a recognition job per trigger"""
+        last_background = time.time()
+        while self.running:
+            event = self.controller.wait_for_detection(1)
+            if event:
+                with self.lock:
+                    self.stats['triggers'] += 1
+                if self.pending.is_set():
+                    # DETECTED repeats while the vehicle waits; one job at a time
+                    with self.lock:
+                        self.stats['dropped_triggers'] += 1
+                    continue
+                self.pending.set()
+                self.scheduler.submit(PRIORITY_TRIGGERED, event.timestamp, self.recognize, event.timestamp)
+            elif (self.background_interval and not self.pending.is_set()
+                  and time.time() - last_background >= self.background_interval):
+                last_background = time.time()
+                self.pending.set()
+                self.scheduler.submit(PRIORITY_BACKGROUND, last_background, self.recognize, last_background)
+
+    def recognize(self, queue_wait, trigger_time):
+        """Scheduler job: pick the best buffered frames and decide"""
+        try:
+            cached = self.system.repeat_decision(trigger_time, self.controller, self.name)
+            if cached is not None:
+                with self.lock:
+                    self.stats['cached_decisions'] += 1
+                return
+            frames = self.frame_buffer.snapshot()
+            if not frames:
+                print(f"[{self.name}] Frame buffer empty - skipping trigger")
+                return
+            candidates = select_best_frames(frames, self.candidates,
+                                            lambda batch: self.system.plate_box_confidence(batch, self.profile))
+            candidates = self.frame_buffer.stable(candidates)  # Only the chosen frames leave the bus
+            authorized = self.system.process_speculative([frame for _, frame in candidates], trigger_time,
+                                                         f"lane:{self.name}", self.controller, self.profile,
+                                                         self.name)
+            decision_ms = (time.time() - trigger_time) * 1000
+            self.system.tracer.record_span(f"lane_{self.name}_decision", trigger_time, time.time())
+            with self.lock:
+                self.stats['decisions'] += 1
+                self.stats['authorized'] += int(authorized)
+                self.stats['total_decision_ms'] += decision_ms
+                self.stats['last_decision_ms'] = round(decision_ms, 1)
+                self.stats['total_queue_ms'] += queue_wait * 1000
+        except Exception as e:
+            with self.lock:
+                self.stats['errors'] += 1
+            print(f"[{self.name}] Recognition error: {e}")
+        finally:
+            self.pending.clear()
+
+    def health(self):
+        """Snapshot of lane health and throughput"""
+        latest = self.frame_buffer.latest()
+        frames = self.frame_buffer.snapshot()
+        span = frames[-1][0] - frames[0][0] if len(frames) > 1 else 0
+        with self.lock:
+            stats = dict(self.stats)
+        uptime = time.time() - stats.pop('started')
+        decisions = stats['decisions']
+        return {
+            'lane': self.name,
+            'serial_connected': self.controller.serial_conn is not None,
+            'gate_open': self.controller.gate_status,
+            'gate_decisions': self.system.gate_service(self.controller).stats(),
+            'camera_fps': round((len(frames) - 1) / span, 1) if span else 0.0,
+            'last_frame_age_s': round(time.time() - latest[0], 2) if latest else None,
+            'decisions_per_min': round(decisions / uptime * 60, 2) if uptime else 0.0,
+            'avg_decision_ms': round(stats['total_decision_ms'] / decisions, 1) if decisions else None,
+            'avg_queue_ms': round(stats['total_queue_ms'] / decisions, 1) if decisions else None,
+            **{key: stats[key] for key in ('triggers', 'dropped_triggers', 'decisions', 'cached_decisions',
+                                           'authorized', 'errors', 'last_decision_ms')}
+        }
+
+# ========== ORCHESTRATOR ==========
+class LaneOrchestrator:
+    def __init__(self, config):
+        self.config = config
+        # One set of models for every lane; each lane drives its own gate
+        self.system = LicensePlateSystem(gate_controller=NullGateController(), headless=True,
+                                         ocr_workers=config.get('ocr_workers'),
+                                         joint_model_path=config.get('joint_model'))
+        self.system.use_frame_buffer = False
+        workers = config.get('inference_workers', 2)
+        self.system.worker_pool = ThreadPoolExecutor(max_workers=workers * self.system.buffer_candidates,
+                                                     thread_name_prefix="recognizer")
+        self.scheduler = InferenceScheduler(workers=workers)
+        self.lanes = [Lane(lane_config, self.system, self.scheduler) for lane_config in config['lanes']]
+        self.stats_interval = config.get('stats_interval', 60)
+        self.metrics_port = config.get('metrics_port', self.system.metrics_port)
+
+    def start(self):
+        self.scheduler.start()
+        for lane in self.lanes:
+            lane.start()
+        if self.metrics_port:
+            serve_metrics(self.system.tracer, self.metrics_port, extra=self.prometheus_text)
+        print(f"Running {len(self.lanes)} lanes: {', '.join(lane.name for lane in self.lanes)}")
+
+    def stop(self):
+        self.system.stop_gate_services()  # Before the lanes close their gates
+        for lane in self.lanes:
+            lane.stop()
+        self.scheduler.stop()
+        self.system.worker_pool.shutdown(wait=False, cancel_futures=True)
+        if self.system.ocr_service:
+            self.system.ocr_service.shutdown()
+
+    def health(self):
+        return {'queue_depth': self.scheduler.queue_depth(), 'lanes': [lane.health() for lane in self.lanes]}
+
+    def prometheus_text(self):
+        """Per-lane gauges appended to /metrics"""
+        lines = []
+        for health in self.health()['lanes']:
+            label = f'lane="{health["lane"]}"'
+            lines.append(f"gate_lane_serial_connected{{{label}}} {int(health['serial_connected'])}")
+            lines.append(f"gate_lane_camera_fps{{{label}}} {health['camera_fps']}")
+            if health['last_frame_age_s'] is not None:
+                lines.append(f"gate_lane_last_frame_age_seconds{{{label}}} {health['last_frame_age_s']}")
+            for key in ('triggers', 'dropped_triggers', 'decisions', 'cached_decisions', 'authorized', 'errors'):
+                lines.append(f"gate_lane_{key}_total{{{label}}} {health[key]}")
+            for key in ('opened', 'debounced', 'cooldown', 'tailgating', 'refused', 'forced_close'):
+                lines.append(f"gate_lane_gate_{key}_total{{{label}}} {health['gate_decisions'][key]}")
+        lines.append(f"gate_scheduler_queue_depth {self.scheduler.queue_depth()}")
+        return '\n'.join(lines) + '\n' + self.system.metrics_text()
+
+    def print_health(self):
+        health = self.health()
+        print(f"\n{'lane':<14}{'serial':>7}{'fps':>6}{'frame age':>10}{'triggers':>9}"
+              f"{'decisions':>10}{'auth':>6}{'avg ms':>8}{'queue ms':>9}{'errors':>7}")
+        for lane in health['lanes']:
+            print(f"{lane['lane']:<14}{'ok' if lane['serial_connected'] else 'DOWN':>7}{lane['camera_fps']:>6}"
+                  f"{lane['last_frame_age_s'] if lane['last_frame_age_s'] is not None else '-':>10}"
+                  f"{lane['triggers']:>9}{lane['decisions']:>10}{lane['authorized']:>6}"
+                  f"{lane['avg_decision_ms'] or '-':>8}{lane['avg_queue_ms'] or '-':>9}{lane['errors']:>7}")
+        print(f"Scheduler queue depth: {health['queue_depth']}")
+
+    def run_forever(self):
+        self.start()
+        try:
+            while True:
+                time.sleep(self.stats_interval)
+                self.print_health()
+        except KeyboardInterrupt:
+            print("\nSystem stopped by user")
+        finally:
+            self.stop()
+
+def load_config(path):
+    with open(path) as f:
+        config = json.load(f)
+    names = [lane['name'] for lane in config.get('lanes', [])]
+    if not names:
+        raise ValueError(f"No lanes configured in {path}")
+    if len(set(names)) != len(names):
+        raise ValueError(f"Lane names must be unique: {names}")
+    return config
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run several gate lanes with shared models")
+    parser.add_argument('config', nargs='?', default='lanes.json', help="Lane configuration JSON")
+    args = parser.parse_args()
+    LaneOrchestrator(load_config(args.config)).run_forever()
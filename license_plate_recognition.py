@@ -6,48 +6,184 @@ import pandas as pd
 import torch
 import serial
 import time
+import threading
+import queue
+import contextvars
+import json
+from collections import namedtuple
 from ultralytics import YOLO
 import os
 from datetime import datetime
 import pytesseract
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from frame_buffer import FrameRingBuffer, select_best_frames
+from gate_decision import GateDecisionService
+from gate_protocol import SIMULATED_PORT, SimulatedGateDevice, encode_command, parse_line
+from ocr_service import OCRService
+from camera_profiles import CameraProfile
+from decision_cache import DecisionCache
+from plate_cache import PlateCache
+from plate_ethiopic import EthiopicPlateReader, plate_text
+from plate_grammar import PlateGrammar
+from plate_recognizer import PlateRecognizer
+from plate_rectify import PlateRectifier
+from run_mode import RunMode
+import detections
+import plate_ocr
+from tracing import Tracer, serve_metrics
+
+# What process_frame found; drawn and saved by record_attempt only after the decision.
+# plates are the ROI's plate detections (None if plate detection never ran), offset is the
+# ROI's top-left corner in the full frame, labels are (text, box or None for the frame corner, BGR color),
+# cached is the DecisionCache entry the authorization came from (None when the API was asked)
+FrameResult = namedtuple('FrameResult', ['object_result', 'plate_result', 'plates', 'offset', 'labels', 'cached'])
 
 # ========== ARDUINO GATE CONTROLLER ==========
 class ArduinoGateController:
     def __init__(self, port='COM4', baudrate=9600):
-        self.port = port
+        self.port = port  # gate_protocol.SIMULATED_PORT runs without hardware
         self.baudrate = baudrate
         self.serial_conn = None
         self.gate_status = False
+        self.vehicle_present = False
+        self.last_clear = 0.0  # When the sensor last reported CLEAR
+        self.last_distance = None  # Latest (cm, timestamp) DIST sample
+        self.ack_timeout = 2  # Seconds to wait for ACK and OPENED/CLOSED
+        self.ready_timeout = 3  # Seconds to wait for READY after the board resets
+        self.stale_detection_age = 2  # DETECTED events older than this are dropped
+        self.events = queue.Queue()
+        self.acks = {}  # seq -> ACK/NAK event
+        self.awaiting = set()  # Seqs send_command is still waiting on; later replies are dropped
+        self.seq = 0
+        self.seq_lock = threading.Lock()
+        self.state_changed = threading.Condition()
+        self.reader_thread = None
+        self.reader_running = False
         self.connect()
         
     def connect(self):
         try:
+            self.stop_reader()
             if self.serial_conn and self.serial_conn.is_open:
                 self.serial_conn.close()
                 
-            self.serial_conn = serial.Serial(self.port, self.baudrate, timeout=1)
-            time.sleep(2)  # Allow Arduino to initialize
+            if self.port == SIMULATED_PORT:
+                self.serial_conn = SimulatedGateDevice(timeout=1)
+            else:
+                self.serial_conn = serial.Serial(self.port, self.baudrate, timeout=1)
+            self.start_reader()
+            # Opening the port resets the board; wait for its READY line
+            if not self.wait_for_event('READY', self.ready_timeout):
+                print("No READY from Arduino - continuing anyway")
             print(f"Connected to Arduino on {self.port}")
             self.close_gate()  # Initialize with closed gate
         except Exception as e:
             print(f"Arduino connection error: {e}")
+            self.stop_reader()
             self.serial_conn = None
+
+    def start_reader(self):
+        """Start the background thread that turns serial lines into events"""
+        self.reader_running = True
+        self.reader_thread = threading.Thread(target=self.read_loop, name=f"serial-{self.port}", daemon=True)
+        self.reader_thread.start()
+
+    def stop_reader(self):
+        self.reader_running = False
+        if self.reader_thread and self.reader_thread is not threading.current_thread():
+            self.reader_thread.join(timeout=2)
+        self.reader_thread = None
+
+    def read_loop(self):
+        """Block on readline so events are handled the moment they arrive"""
+        while self.reader_running:
+            try:
+                raw = self.serial_conn.readline()
+            except Exception as e:
+                print(f"Serial read error: {e}")
+                self.reader_running = False
+                break
+            if not raw:
+                continue  # readline timeout, check the running flag again
+            event = parse_line(raw.decode(errors='ignore'))
+            if event:
+                self.handle_event(event)
+
+    def handle_event(self, event):
+        """Track confirmed state and queue the event for consumers"""
+        if event.name == 'DIST':
+            self.last_distance = (event.value, event.timestamp)
+            return  # Too frequent to queue
+        with self.state_changed:
+            if event.name in ('ACK', 'NAK'):
+                if event.seq in self.awaiting:
+                    self.acks[event.seq] = event
+                else:
+                    print(f"Dropped late {event.name} for seq {event.seq}")
+            elif event.name in ('OPENED', 'CLOSED'):
+                self.gate_status = event.name == 'OPENED'
+            elif event.name in ('PRESENT', 'DETECTED', 'CLEAR'):
+                self.vehicle_present = event.name != 'CLEAR'
+                if event.name == 'CLEAR':
+                    self.last_clear = event.timestamp
+            self.state_changed.notify_all()
+        if event.name not in ('ACK', 'NAK'):
+            self.events.put(event)
+
+    def wait_for_event(self, name, timeout):
+        """Wait for a specific event, discarding others; returns it or None"""
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return None
+            try:
+                event = self.events.get(timeout=remaining)
+            except queue.Empty:
+                return None
+            if event.name == name:
+                return event
+    
+    def send_command(self, name, arg=None):
+        """Send a sequenced command; returns True once the Arduino ACKs it"""
+        with self.seq_lock:
+            self.seq += 1
+            seq = self.seq
+        with self.state_changed:
+            self.awaiting.add(seq)
+        self.serial_conn.write(encode_command(seq, name, arg))
+        with self.state_changed:
+            self.state_changed.wait_for(lambda: seq in self.acks, timeout=self.ack_timeout)
+            self.awaiting.discard(seq)
+            reply = self.acks.pop(seq, None)
+        if reply is None:
+            print(f"No acknowledgement for {name} (seq {seq})")
+            return False
+        if reply.name == 'NAK':
+            print(f"Arduino rejected {name} (seq {seq}): {reply.value}")
+            return False
+        return True
     
-    def control_gate(self, open_gate):
-        """Send gate control command to Arduino"""
+    def control_gate(self, open_gate, hold=False):
+        """Send gate control command and wait for the Arduino to confirm it"""
         if not self.serial_conn:
             print("No Arduino connection!")
             return False
             
         try:
-            if open_gate and not self.gate_status:
-                self.serial_conn.write(b'1')  # Send open command
-                self.gate_status = True
-                print("Gate opened")
-            elif not open_gate and self.gate_status:
-                self.serial_conn.write(b'0')  # Send close command
-                self.gate_status = False
-                print("Gate closed")
+            if not open_gate and not self.gate_status:
+                return True
+            # Re-sending OPEN while open restarts the auto-close timer
+            command = 'HOLD' if hold else ('OPEN' if open_gate else 'CLOSE')
+            if not self.send_command(command):
+                return False
+            with self.state_changed:
+                confirmed = self.state_changed.wait_for(lambda: self.gate_status == open_gate,
+                                                        timeout=self.ack_timeout)
+            if not confirmed:
+                print(f"Gate did not report {'OPENED' if open_gate else 'CLOSED'}")
+                return False
+            print("Gate opened" if open_gate else "Gate closed")
             return True
         except Exception as e:
             print(f"Gate control error: {e}")
@@ -55,41 +191,101 @@ class ArduinoGateController:
 
     def open_gate(self):
         self.control_gate(True)
+
+    def hold_gate(self):
+        """Open the gate and keep it open until close_gate()"""
+        self.control_gate(True, hold=True)
     
     def close_gate(self):
         self.control_gate(False)
+
+    def set_stream_rate(self, interval_ms):
+        """Set the DIST sample period in ms (0 stops streaming)"""
+        return bool(self.serial_conn) and self.send_command('RATE', int(interval_ms))
+
+    def set_open_duration(self, duration_ms):
+        """Set how long OPEN keeps the gate up before auto-closing"""
+        return bool(self.serial_conn) and self.send_command('DURATION', int(duration_ms))
+
+    def wait_for_detection(self, timeout):
+        """Block until a fresh DETECTED event arrives; returns it or None"""
+        deadline = time.time() + timeout
+        while True:
+            event = self.wait_for_event('DETECTED', deadline - time.time())
+            if event is None:
+                return None
+            if time.time() - event.timestamp <= self.stale_detection_age:
+                return event
     
     def check_detection(self):
         """Check if Arduino has detected a vehicle"""
-        if not self.serial_conn:
+        try:
+            while True:
+                event = self.events.get_nowait()
+                if event.name == 'DETECTED':
+                    return True
+        except queue.Empty:
             return False
-            
-        if self.serial_conn.in_waiting > 0:
-            line = self.serial_conn.readline().decode().strip()
-            if line == "DETECTED":
-                return True
-        return False
     
     def __del__(self):
         if self.serial_conn:
             self.close_gate()
+            self.stop_reader()
             self.serial_conn.close()
 
+class NullGateController:
+    """Records gate commands instead of driving hardware (benchmarks, shared-model hosts)"""
+    def __init__(self):
+        self.serial_conn = None
+        self.gate_status = False
+        self.commands = []
+
+    def open_gate(self):
+        self.gate_status = True
+        self.commands.append('OPEN')
+
+    def close_gate(self):
+        self.gate_status = False
+        self.commands.append('CLOSE')
+
+    def wait_for_detection(self, timeout):
+        return None
+
 # ========== LICENSE PLATE RECOGNITION SYSTEM ==========
 class LicensePlateSystem:
-    def __init__(self):
+    def __init__(self, gate_controller=None, headless=False, run_mode=None, ocr_workers=None,
+                 joint_model_path=None):
         torch.serialization.add_safe_globals([])
         
-        # Initialize models
-        self.object_model = YOLO("yolov8n.pt")  # General object detection
-        self.plate_model = YOLO(r"C:\Users\siyam\Documents\thesis-1\runs1\detect\train2\weights\best.pt")  # License plate detection
+        # production / debug / benchmark / collect (run_mode.json or GATE_RUN_MODE); headless callers never display
+        self.run_mode = run_mode or RunMode.load()
+        
+        # Detection models, loaded by path on first use (see detector())
+        self.object_model_path = "yolov8n.pt"  # General object detection
+        self.plate_model_path = r"C:\Users\siyam\Documents\thesis-1\runs1\detect\train2\weights\best.pt"  # License plate detection
         self.reader = easyocr.Reader(['en'])
         
-        # Initialize Arduino controller
-        self.gate_controller = ArduinoGateController(port='COM4')
+        # Joint vehicle + plate model (joint_detector.py); when set it replaces both models above and
+        # they are never loaded. From the joint_model_path argument (lanes.json "joint_model") or GATE_JOINT_MODEL
+        self.joint_model_path = joint_model_path or os.environ.get('GATE_JOINT_MODEL') or None
+        self.joint_plate_name = 'license_plate'  # Plate class in joint_detector.JOINT_NAMES
+        
+        # Initialize Arduino controller (benchmarks pass a stub)
+        self.gate_controller = gate_controller or ArduinoGateController(port='COM4')
+        
+        # Recognition only posts results; a decision thread per gate drives it (gate_decision.py)
+        self.gate_policy = {
+            'debounce': 0.5,  # Seconds: repeat results merged, minimum gap between commands
+            'min_open': 3.0,  # Seconds the gate stays up at least
+            'max_hold': 60.0,  # Seconds before a held gate is closed regardless
+            'clear_delay': 1.0,  # Seconds after the admitted vehicle left the sensor
+            'cooldown': 30.0  # Seconds before a plate that passed can open the gate again
+        }
+        self.gate_services = {}
+        self.gate_services_lock = threading.Lock()
         
         # Configuration
-        self.vehicle_classes = [2, 3, 5, 7]  # COCO classes: car, motorcycle, bus, truck
+        self.vehicle_names = {'car', 'motorcycle', 'bus', 'truck'}  # COCO classes 2, 3, 5, 7; same in the joint model
         self.non_vehicle_classes = {
             0: 'person',
             15: 'dog',
@@ -100,31 +296,79 @@ class LicensePlateSystem:
         }  # Classes to ignore for plate detection
         self.plate_confidence = 0.5
         self.object_confidence = 0.5  # Confidence threshold for object detection
+        # ROI, input sizes, thresholds and backend per camera (camera_profiles/<name>.json);
+        # the two thresholds above are the defaults for keys a profile leaves out
+        self.camera_profile = CameraProfile.load('default', object_confidence=self.object_confidence,
+                                                 plate_confidence=self.plate_confidence)
+        self.detectors = {}  # Loaded models by path: the shared ones and those named by profiles
         self.api_url = "http://localhost:5000"  # Flask API endpoint
         self.output_root = "detection_results"  # Root folder for all outputs
         self.detection_timeout = 30  # Seconds to wait for detection
+        self.save_training_samples = self.run_mode.save_training_samples  # Plate boxes for dataset_builder.py
         self.max_capture_attempts = 3  # Maximum number of capture attempts
         self.capture_delay = 1  # Delay between capture attempts
+        self.use_frame_buffer = True  # Pick the best already-captured frame on trigger
+        self.frame_buffer_seconds = 3  # Seconds of video kept in memory
+        self.frame_buffer_fps = 10  # Frames per second kept in the buffer
+        self.buffer_candidates = 3  # Best buffered frames processed per trigger
+        self.frame_buffer = None
+        self.retry_strategy = 'speculative'  # 'speculative' or 'sequential' live capture
+        self.speculative_frames = 3  # Frames captured per trigger in speculative mode
+        self.speculative_interval = 0.2  # Seconds between speculative captures
+        self.worker_pool = ThreadPoolExecutor(max_workers=self.speculative_frames,
+                                              thread_name_prefix="recognizer")
+        
+        # Per-stage latency tracing, slow detections dumped as Chrome traces
+        self.tracer = Tracer(enabled=True, slow_event_ms=5000,
+                             trace_dir=os.path.join(self.output_root, "traces"))
+        self.metrics_port = 9100  # Local /metrics endpoint, None to disable
+        
+        # YOLO predictors and the EasyOCR reader are not thread-safe
+        self.model_lock = threading.Lock()
+        self.ocr_lock = threading.Lock()
+        
+        # Load the detectors this configuration uses now rather than on the first trigger
+        with self.model_lock:
+            for kind in ('joint',) if self.joint_model_path else ('object', 'plate'):
+                self.detector(kind, self.camera_profile)
         
         # Tesseract config
         pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
         
+        # 'ensemble' reads with EasyOCR + Tesseract, 'ctc' with the trained plate_recognizer.py model,
+        # 'ethiopic' segments code/region/number and reads them with Ethiopic-aware Tesseract
+        self.ocr_engine = 'ensemble'
+        self.ethiopic_reader = None  # Built on the first 'ethiopic' read; needs tesserocr
+        self.ctc_model_path = os.path.join("models", "plate_ctc.onnx")
+        self.ctc_min_confidence = 0.5  # Reads with a weaker character count as unreadable
+        self.plate_recognizer = None  # Loaded on the first 'ctc' read, so ocr_engine can be switched later
+        
+        # Reads that match no plate format are dropped before the lookup, None accepts any read.
+        # plate_formats.json replaces the built-in formats; rejections are counted in /metrics
+        self.plate_grammar = PlateGrammar.load(min_score=0.3)
+        
+        # OCR worker processes (ocr_service.py) sidestep the GIL; 0 runs OCR in this process.
+        # From the ocr_workers argument (lanes.json "ocr_workers") or GATE_OCR_WORKERS
+        self.ocr_workers = ocr_workers if ocr_workers is not None else int(os.environ.get('GATE_OCR_WORKERS', 0))
+        self.ocr_service = None
+        
+        # Deskew plates to a fixed size before OCR, None OCRs the raw YOLO crop
+        self.plate_rectifier = PlateRectifier(pad=0.1)
+        
+        # Reuse OCR results for near-identical crops within one trigger on one lane, None disables
+        self.plate_cache = PlateCache(max_entries=256, ttl=10, max_distance=10, hash_size=16)
+        
+        # Recent decisions per lane and plate: repeat triggers from a waiting vehicle reuse the
+        # decision and identical log rows are written once per cooldown, None disables
+        self.decision_cache = DecisionCache(cooldown=20.0) if self.run_mode.cache_decisions else None
+        if self.ocr_workers:
+            self.enable_ocr_workers(self.ocr_workers)
+        
         # Create output directory structure
         self.create_output_dirs()
         
-        # Check if GUI is available
-        self.gui_enabled = self.check_gui_support()
-
-    def check_gui_support(self):
-        """Check if OpenCV GUI functions are available"""
-        try:
-            test_window = np.zeros((100,100,3), np.uint8)
-            cv2.imshow('test', test_window)
-            cv2.destroyAllWindows()
-            return True
-        except:
-            print("GUI not available - running in headless mode")
-            return False
+        # Debug mode shows results on a viewer thread; production never touches a display
+        self.viewer = None if headless else self.run_mode.create_viewer()
 
     def create_output_dirs(self):
         """Create organized directory structure for outputs"""
@@ -135,7 +379,8 @@ class LicensePlateSystem:
             'plates': os.path.join(self.output_root, "plate_crops"),
             'logs': os.path.join(self.output_root, "logs"),
             'tesseract': os.path.join(self.output_root, "tesseract_results"),
-            'objects': os.path.join(self.output_root, "object_detections")
+            'objects': os.path.join(self.output_root, "object_detections"),
+            'samples': os.path.join(self.output_root, "training_samples")
         }
         
         for dir_path in self.dirs.values():
@@ -143,85 +388,161 @@ class LicensePlateSystem:
 
     def preprocess_plate(self, plate_img):
         """Enhanced image preprocessing combining both methods"""
-        # Convert to grayscale
-        gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY)
-        
-        # Denoising
-        denoised = cv2.fastNlMeansDenoising(gray, h=10)
-        
-        # Contrast enhancement
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-        enhanced = clahe.apply(denoised)
-        
-        # Binarization
-        _, thresh = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        
-        # Morphological operations
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3,3))
-        processed = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
-        
-        return processed
+        return plate_ocr.preprocess_plate(plate_img)
 
     def extract_text_with_easyocr(self, plate_img):
         """Extract text using EasyOCR"""
-        results = self.reader.readtext(plate_img, detail=0,
-                                     allowlist='0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ')
-        return results[0] if results else ""
+        with self.ocr_lock:
+            return plate_ocr.read_easyocr(self.reader, plate_img)
 
     def extract_text_with_tesseract(self, plate_img, language='amh+eng'):
         """Improved text extraction for license plates with Amharic and English support"""
-        # Convert to grayscale
-        gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY)
-        
-        # Apply preprocessing
-        # 1. Denoising
-        denoised = cv2.fastNlMeansDenoising(gray, h=10)
-        
-        # 2. Contrast enhancement
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-        enhanced = clahe.apply(denoised)
-        
-        # 3. Binarization
-        _, thresh = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        
-        # 4. Morphological operations
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3,3))
-        processed = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
-        
-        # Try different PSM modes for better results
-        custom_config = r'--oem 3 --psm 8 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
-        text = pytesseract.image_to_string(processed, lang=language, config=custom_config)
+        return plate_ocr.read_tesseract(plate_ocr.preprocess_plate(plate_img), language)
+
+    def enable_ocr_workers(self, workers):
+        """Run OCR on a pool of worker processes instead of this process"""
+        if self.ocr_service:
+            self.ocr_service.shutdown()
+        self.ocr_service = OCRService(workers=workers,
+                                      tesseract_cmd=pytesseract.pytesseract.tesseract_cmd)
+        self.ocr_service.start()
+
+    def extract_plate_text(self, plate_img, save_path=None, box=None, scope=None, cache_path='sequential'):
+        """Enhanced text extraction with both OCR methods and Amharic support.
+
+        OCR results are reused only between crops with the same `scope`
+        (lane, trigger); without one every crop is read. `cache_path` labels
+        the plate cache statistics ('sequential' or 'concurrent').
+        """
+        use_cache = self.plate_cache is not None and scope is not None
+        if use_cache:
+            with self.tracer.span('plate_cache'):
+                cache_key = self.plate_cache.key(plate_img, box, scope)
+                cached = self.plate_cache.lookup(plate_img, key=cache_key, path=cache_path)
+            if cached is not None:
+                print(f"Plate cache hit: {cached}")
+                return cached
         
-        # Post-process the extracted text
-        text = text.strip()
-        text = ' '.join(text.split())  # Remove extra whitespace
+        candidates = self.read_plate_text(plate_img, save_path)
+        text = self.choose_plate_text(candidates)
+        # Unreadable crops are not cached so the next frame gets a fresh try
+        if use_cache and text:
+            self.plate_cache.store(plate_img, text, key=cache_key)
         return text
 
-    def extract_plate_text(self, plate_img, save_path=None):
-        """Enhanced text extraction with both OCR methods and Amharic support"""
-        processed = self.preprocess_plate(plate_img)
+    def choose_plate_text(self, candidates):
+        """Best grammar-valid candidate in canonical form, or "" when none is a plate"""
+        if not self.plate_grammar:
+            return next((c for c in candidates if isinstance(c, str) and c), "")
+        with self.tracer.span('plate_grammar'):
+            match = self.plate_grammar.best(candidates)
+        if match is None:
+            if any(candidates):
+                print(f"Rejected read(s) matching no plate format: {candidates}")
+            return ""
+        print(f"Plate format {match.format}: {match.text} (score {match.score:.2f})")
+        return match.text
+
+    def read_plate_text(self, plate_img, save_path=None):
+        """Run the configured OCR engine(s) on a plate crop; returns candidates, preferred first"""
+        if self.ocr_engine == 'ctc':
+            return self.read_plate_text_ctc(plate_img)
+        if self.ocr_engine == 'ethiopic':
+            return self.read_plate_text_ethiopic(plate_img)
+        if self.ocr_service:
+            return self.extract_plate_text_pooled(plate_img, save_path)
+        
+        with self.tracer.span('preprocessing'):
+            processed = self.preprocess_plate(plate_img)
         
         # Save processed plate image if requested
         if save_path:
-            cv2.imwrite(save_path, processed)
+            with self.tracer.span('artifact_write'):
+                cv2.imwrite(save_path, processed)
             print(f"Saved processed plate image to: {save_path}")
         
-        # Try both OCR methods
-        easyocr_text = self.extract_text_with_easyocr(processed)
-        tesseract_text = self.extract_text_with_tesseract(plate_img)  # Use original image for Tesseract
+        # Try both OCR methods (Tesseract used to redo the same preprocessing)
+        with self.tracer.span('ocr_easyocr'):
+            easyocr_text = self.extract_text_with_easyocr(processed)
+        with self.tracer.span('ocr_tesseract'):
+            tesseract_text = plate_ocr.read_tesseract(processed)
         
-        # Save Tesseract results separately
-        tesseract_path = os.path.join(self.dirs['tesseract'], os.path.basename(save_path or "temp_plate.jpg"))
-        with open(tesseract_path.replace('.jpg', '.txt'), 'w') as f:
-            f.write(f"EasyOCR: {easyocr_text}\nTesseract: {tesseract_text}")
+        self.save_ocr_results(save_path, easyocr_text, tesseract_text)
+        return self.ensemble_candidates(easyocr_text, tesseract_text)
+
+    def ensemble_candidates(self, easyocr_text, tesseract_text):
+        """Both engine reads, the one pick_result prefers first"""
+        preferred = plate_ocr.pick_result(easyocr_text, tesseract_text)
+        other = tesseract_text if preferred == easyocr_text else easyocr_text
+        return [preferred, other]
+
+    def recognizer(self):
+        """CTC recognizer for ctc_model_path, loaded on first use"""
+        recognizer = self.plate_recognizer
+        if recognizer is None or recognizer.model_path != self.ctc_model_path:
+            with self.ocr_lock:
+                if self.plate_recognizer is None or self.plate_recognizer.model_path != self.ctc_model_path:
+                    print(f"Loading CTC recognizer: {self.ctc_model_path}")
+                    self.plate_recognizer = PlateRecognizer(self.ctc_model_path)
+                recognizer = self.plate_recognizer
+        return recognizer
+
+    def read_plate_text_ctc(self, plate_img):
+        """Read the plate with the CTC recognizer"""
+        with self.tracer.span('ocr_ctc'):
+            alternatives = self.recognizer().recognize_alternatives(plate_img)
+        text = ''.join(options[0][0] for options in alternatives)
+        confidences = [options[0][1] for options in alternatives]
+        if text and min(confidences) < self.ctc_min_confidence:
+            print(f"Rejected low-confidence read {text} (weakest character {min(confidences):.2f})")
+            return []
+        # The grammar can swap a character for its runner-up when that makes a valid plate
+        return [alternatives if self.plate_grammar else text]
+
+    def ethiopic(self):
+        """Ethiopic plate reader, built on first use (raises ImportError without tesserocr)"""
+        if self.ethiopic_reader is None:
+            with self.ocr_lock:
+                if self.ethiopic_reader is None:
+                    self.ethiopic_reader = EthiopicPlateReader()
+        return self.ethiopic_reader
+
+    def read_plate_text_ethiopic(self, plate_img):
+        """Read code, region and number segments of an Ethiopian plate"""
+        reader = self.ethiopic()
+        with self.tracer.span('ocr_ethiopic'):
+            plate = reader.read(plate_img)
+        if plate is None:
+            return []
+        print(f"Ethiopic read: {plate.raw} -> {plate_text(plate)}")
+        return [plate_text(plate)]
+
+    def extract_plate_text_pooled(self, plate_img, save_path=None):
+        """extract_plate_text on an OCR worker process"""
+        with self.tracer.span('ocr_pool'):
+            result = self.ocr_service.submit(plate_img, save_path).result()
+        # Worker stage timings share this machine's clock
+        for name, start, end in result['spans']:
+            self.tracer.record_span(name, start, end, worker=result['worker'])
+        if save_path:
+            print(f"Saved processed plate image to: {save_path}")
         
-        # Return the most confident result
-        if len(easyocr_text) >= len(tesseract_text):
-            return easyocr_text
-        return tesseract_text
+        self.save_ocr_results(save_path, result['easyocr'], result['tesseract'])
+        return self.ensemble_candidates(result['easyocr'], result['tesseract'])
+
+    def save_ocr_results(self, save_path, easyocr_text, tesseract_text):
+        """Save Tesseract results separately"""
+        tesseract_path = os.path.join(self.dirs['tesseract'], os.path.basename(save_path or "temp_plate.jpg"))
+        with self.tracer.span('artifact_write'):
+            with open(tesseract_path.replace('.jpg', '.txt'), 'w') as f:
+                f.write(f"EasyOCR: {easyocr_text}\nTesseract: {tesseract_text}")
 
     def check_authorization(self, plate_text):
         """Check if plate is authorized in database via Flask API"""
+        with self.tracer.span('authorization'):
+            return self.lookup_plate(plate_text)
+
+    def lookup_plate(self, plate_text):
         try:
             response = requests.get(
                 f"{self.api_url}/check_plate?plate={plate_text}",
@@ -234,89 +555,200 @@ class LicensePlateSystem:
             print(f"API request error: {e}")
             return False
 
-    def process_frame(self, frame):
-        """Process single frame with object detection first"""
+    def detector(self, kind, profile):
+        """The 'object', 'plate' or 'joint' model for a camera profile, loaded on first use (call with model_lock held)"""
+        if kind == 'joint':
+            path = self.joint_model_path
+        else:
+            path = getattr(profile, f"{kind}_model") or getattr(self, f"{kind}_model_path")
+        if path not in self.detectors:
+            print(f"Loading {kind} model for camera {profile.name}: {path}")
+            self.detectors[path] = YOLO(path)
+        return self.detectors[path]
+
+    def detect(self, kind, frames, profile=None, **overrides):
+        """Run a detector with the camera profile's input size, threshold and precision"""
+        profile = profile or self.camera_profile
+        args = dict(profile.predict_args(kind), **overrides)
+        with self.model_lock:
+            return self.detector(kind, profile)(frames, **args)
+
+    def split_joint_detections(self, dets, names, profile):
+        """Indices of the joint model's objects and plates, each at its own threshold"""
+        plate = detections.class_mask(dets, names, {self.joint_plate_name})
+        return (np.flatnonzero(~plate & (dets['conf'] >= profile.object_confidence)),
+                np.flatnonzero(plate & (dets['conf'] >= profile.plate_confidence)))
+
+    def process_frame(self, frame, drive_gate=True, cancel_event=None, profile=None, lane='default',
+                      trigger=None):
+        """Process single frame with object detection first.
+
+        When `cancel_event` is set (another frame already won), processing
+        stops at the next stage boundary and returns "Cancelled". Only the
+        camera `profile`'s ROI is processed (default: self.camera_profile).
+        Cached decisions are looked up for the gate `lane`; OCR results are
+        reused only between frames of the same `trigger` (its timestamp).
+        Returns (FrameResult, detection result, authorized); nothing is drawn
+        or written here, see record_attempt.
+        """
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        profile = profile or self.camera_profile
+        offset = profile.roi_pixels(frame.shape)[:2]
+        frame = profile.crop(frame)
         
         # Step 1: Object detection to identify what's in the frame
-        object_results = self.object_model(frame, conf=self.object_confidence, verbose=False)
+        plates = plate_result = None
+        if self.joint_model_path:
+            # One pass finds vehicles, people/animals and plates together
+            with self.tracer.span('joint_detection'):
+                joint_result = self.detect('joint', frame, profile)[0]
+                dets = detections.from_results(joint_result)
+                object_idx, plate_idx = self.split_joint_detections(dets, joint_result.names, profile)
+                objects, plates = dets[object_idx], dets[plate_idx]
+                # Annotate only what passed each threshold, not everything at the joint model's looser one
+                object_result, plate_result = joint_result[object_idx], joint_result[plate_idx]
+        else:
+            with self.tracer.span('vehicle_detection'):
+                object_result = self.detect('object', frame, profile)[0]
+                objects = detections.from_results(object_result)
         
-        # Save object detection results
-        object_path = os.path.join(self.dirs['objects'], f"object_detection_{timestamp}.jpg")
-        annotated_frame = object_results[0].plot()
-        cv2.imwrite(object_path, annotated_frame)
-        print(f"Saved object detection results to: {object_path}")
+        # Check for non-vehicle objects (people, animals, etc.); matched by name so the
+        # joint model's class ids work too
+        non_vehicles = objects[detections.class_mask(objects, object_result.names,
+                                                     set(self.non_vehicle_classes.values()))]
+        if len(non_vehicles):
+            object_name = object_result.names[int(non_vehicles['cls'][0])]
+            if drive_gate:
+                self.drive_gate(False)
+            label = (f"{object_name.capitalize()} detected - No license plate", None, (0, 0, 255))
+            return FrameResult(object_result, None, None, offset, [label], None), object_name, False
         
-        # Check for non-vehicle objects (people, animals, etc.)
-        for box, cls in zip(object_results[0].boxes.xyxy.cpu().numpy(), 
-                           object_results[0].boxes.cls.cpu().numpy()):
-            if cls in self.non_vehicle_classes:
-                object_name = self.non_vehicle_classes[cls]
-                cv2.putText(annotated_frame, f"{object_name.capitalize()} detected - No license plate", 
-                          (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 
-                          0.9, (0, 0, 255), 2)
-                self.gate_controller.close_gate()
-                return annotated_frame, object_name, False
+        if cancel_event is not None and cancel_event.is_set():
+            return FrameResult(object_result, None, None, offset, [], None), "Cancelled", False
         
         # Step 2: If no non-vehicle objects, proceed with license plate recognition
-        plate_results = self.plate_model(frame, conf=self.plate_confidence, verbose=False)
+        if plates is None:
+            with self.tracer.span('plate_detection'):
+                plate_result = self.detect('plate', frame, profile)[0]
+                plates = detections.from_results(plate_result)
         authorized = False
+        found = FrameResult(object_result, plate_result, plates, offset, [], None)
         
-        for result in plate_results:
-            annotated_frame = result.plot()
+        # Plates on a detected vehicle first, then the most confident
+        vehicles = objects[detections.class_mask(objects, object_result.names, self.vehicle_names)]
+        for box in plates['box'][detections.plate_order(plates, vehicles)].astype(int):
+            if cancel_event is not None and cancel_event.is_set():
+                return found, "Cancelled", False
             
-            for box in result.boxes.xyxy.cpu().numpy():
-                x1, y1, x2, y2 = map(int, box)
+            x1, y1, x2, y2 = box.tolist()
+            if self.plate_rectifier:
+                with self.tracer.span('rectify'):
+                    plate_img = self.plate_rectifier.rectify(frame, (x1, y1, x2, y2))
+            else:
                 plate_img = frame[y1:y2, x1:x2]
-                
-                # Generate unique filename for plate crop
-                plate_crop_path = os.path.join(self.dirs['plates'], f"plate_{timestamp}.jpg")
+            
+            # Generate unique filename for plate crop
+            plate_crop_path = os.path.join(self.dirs['plates'], f"plate_{timestamp}.jpg")
+            with self.tracer.span('artifact_write'):
                 cv2.imwrite(plate_crop_path, plate_img)
-                print(f"Saved plate crop to: {plate_crop_path}")
+            print(f"Saved plate crop to: {plate_crop_path}")
+            
+            # Extract text with visualization
+            plate_text = self.extract_plate_text(plate_img, 
+                                               os.path.join(self.dirs['plates'], f"plate_processed_{timestamp}.jpg"),
+                                               box=(x1, y1, x2, y2),
+                                               scope=(lane, trigger) if trigger is not None else None,
+                                               cache_path='concurrent' if cancel_event is not None else 'sequential')
+            
+            if plate_text:
+                cached = self.decision_cache.lookup(lane, plate_text) if self.decision_cache else None
+                if cached:
+                    authorized = cached.authorized  # Admitted on this lane within the cooldown
+                else:
+                    authorized = self.check_authorization(plate_text)
                 
-                # Extract text with visualization
-                plate_text = self.extract_plate_text(plate_img, 
-                                                   os.path.join(self.dirs['plates'], f"plate_processed_{timestamp}.jpg"))
+                # Control gate based on authorization
+                if drive_gate:
+                    self.drive_gate(authorized, plate=plate_text)
                 
-                if plate_text:
-                    authorized = self.check_authorization(plate_text)
-                    status = "AUTHORIZED" if authorized else "UNAUTHORIZED"
-                    color = (0, 255, 0) if authorized else (0, 0, 255)
-                    
-                    # Add visualization
-                    cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
-                    cv2.putText(annotated_frame, f"{plate_text} - {status}", 
-                              (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 
-                              0.9, color, 2)
-                    
-                    # Control gate based on authorization
-                    if authorized:
-                        self.gate_controller.open_gate()
-                    else:
-                        self.gate_controller.close_gate()
-                    
-                    return annotated_frame, plate_text, authorized
-        
+                status = "AUTHORIZED" if authorized else "UNAUTHORIZED"
+                color = (0, 255, 0) if authorized else (0, 0, 255)
+                found.labels.append((f"{plate_text} - {status}", (x1, y1, x2, y2), color))
+                return found._replace(cached=cached), plate_text, authorized
+    
         # No plates detected but vehicle present
-        self.gate_controller.close_gate()
-        return annotated_frame, "No license plate detected", False
+        if drive_gate:
+            self.drive_gate(False)
+        return found, "No license plate detected", False
+
+    def annotate(self, result):
+        """Draw a FrameResult: detections plus the plate/object labels"""
+        annotated = (result.plate_result if result.plate_result is not None else result.object_result).plot()
+        for text, box, color in result.labels:
+            if box is None:
+                cv2.putText(annotated, text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.9, color, 2)
+                continue
+            x1, y1, x2, y2 = box
+            cv2.rectangle(annotated, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(annotated, text, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, color, 2)
+        return annotated
+
+    def save_training_sample(self, image_path, frame, result, timestamp):
+        """Sidecar JSON with the plate boxes of an already saved frame, for dataset_builder.py"""
+        if result.plates is None or not len(result.plates):
+            return
+        boxes = result.plates['box'].astype(int) + np.tile(result.offset, 2)  # ROI -> full frame
+        plates = [{'box': box, 'confidence': round(conf, 4)}
+                  for box, conf in zip(boxes.tolist(), result.plates['conf'].tolist())]
+        
+        with open(os.path.join(self.dirs['samples'], f"frame_{timestamp}.json"), 'w') as f:
+            json.dump({
+                'timestamp': timestamp,
+                'frame': os.path.relpath(image_path, self.dirs['samples']),
+                'width': frame.shape[1],
+                'height': frame.shape[0],
+                'plates': plates
+            }, f)
+
+    def gate_service(self, gate_controller=None):
+        """Decision service for a gate controller, started on first use"""
+        gate_controller = gate_controller or self.gate_controller
+        with self.gate_services_lock:
+            service = self.gate_services.get(id(gate_controller))
+            if service is None:
+                service = GateDecisionService(gate_controller, name=getattr(gate_controller, 'port', 'gate'),
+                                              **self.gate_policy).start()
+                self.gate_services[id(gate_controller)] = service
+        return service
+
+    def drive_gate(self, authorized, gate_controller=None, plate=None):
+        """Post a decision to the gate's decision service; returns without waiting for the servo"""
+        with self.tracer.span('gate_command'):
+            self.gate_service(gate_controller).post(plate, authorized)
+
+    def stop_gate_services(self):
+        with self.gate_services_lock:
+            services, self.gate_services = list(self.gate_services.values()), {}
+        for service in services:
+            service.stop()
 
     def wait_for_detection(self):
-        """Wait for vehicle detection from ultrasonic sensor"""
+        """Wait for vehicle detection; returns the DETECTED event or None"""
         print(f"Waiting for vehicle detection (timeout: {self.detection_timeout}s)...")
-        start_time = time.time()
-        
-        while time.time() - start_time < self.detection_timeout:
-            if self.gate_controller.check_detection():
-                print("Object detected by ultrasonic sensor!")
-                return True
-            time.sleep(0.1)
+        event = self.gate_controller.wait_for_detection(self.detection_timeout)
+        if event:
+            print("Object detected by ultrasonic sensor!")
+            return event
         
         print("Timeout waiting for vehicle detection")
-        return False
+        return None
 
     def capture_frame(self, video_source):
         """Capture single frame from video source"""
+        with self.tracer.span('capture'):
+            return self.read_single_frame(video_source)
+
+    def read_single_frame(self, video_source):
         cap = cv2.VideoCapture(video_source)
         if not cap.isOpened():
             print(f"Error opening video source: {video_source}")
@@ -331,13 +763,251 @@ class LicensePlateSystem:
             
         return frame
 
+    def get_frame_buffer(self, video_source):
+        """Start buffering the video source in the background (once)"""
+        if self.frame_buffer is None or self.frame_buffer.video_source != video_source:
+            if self.frame_buffer:
+                self.frame_buffer.stop()
+            self.frame_buffer = FrameRingBuffer(video_source, seconds=self.frame_buffer_seconds,
+                                                max_fps=self.frame_buffer_fps)
+            self.frame_buffer.start()
+        return self.frame_buffer
+
+    def plate_box_confidence(self, frames, profile=None):
+        """Best plate box confidence per frame, from one batched forward pass"""
+        profile = profile or self.camera_profile
+        with self.tracer.span('frame_selection_plate_detection'):
+            results = self.detect('joint' if self.joint_model_path else 'plate',
+                                  [profile.crop(frame) for frame in frames], profile, conf=0.1)
+        scores = []
+        for result in results:
+            plates = detections.from_results(result)
+            if self.joint_model_path:
+                plates = plates[detections.class_mask(plates, result.names, {self.joint_plate_name})]
+            scores.append(float(plates['conf'].max()) if len(plates) else 0.0)
+        return scores
+
+    def record_attempt(self, attempt, frame, result, detection_result, authorized, lane='default'):
+        """Save original/annotated images and append the detection log.
+
+        All drawing happens here, after the gate decision (`result` is
+        process_frame's FrameResult). Repeat reads of an admitted plate are logged once per cooldown;
+        denials and failed reads are always written.
+        """
+        if authorized and self.decision_cache and not self.decision_cache.should_log(lane, detection_result):
+            print(f"{detection_result} already logged on {lane} - skipping artifacts")
+            return
+        with self.tracer.span('artifact_write'):
+            self.write_attempt(attempt, frame, result, detection_result, authorized)
+
+    def write_attempt(self, attempt, frame, result, detection_result, authorized):
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        object_path = os.path.join(self.dirs['objects'], f"object_detection_{timestamp}.jpg")
+        cv2.imwrite(object_path, result.object_result.plot())
+        print(f"Saved object detection results to: {object_path}")
+        
+        original_path = os.path.join(self.dirs['original'], f"attempt_{attempt}_{timestamp}.jpg")
+        cv2.imwrite(original_path, frame)
+        print(f"Saved detection image to: {original_path}")
+        if self.save_training_samples:
+            self.save_training_sample(original_path, frame, result, timestamp)
+        
+        processed_path = os.path.join(self.dirs['processed'], f"processed_{attempt}_{timestamp}.jpg")
+        cv2.imwrite(processed_path, self.annotate(result))
+        print(f"Saved processed image to: {processed_path}")
+        
+        log_entry = {
+            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'attempt': attempt,
+            'image_path': original_path,
+            'detected_object': detection_result,
+            'plate_text': detection_result if detection_result in self.non_vehicle_classes.values() or 
+                           detection_result == "No license plate detected" else "None",
+            'authorized': authorized,
+            'gate_status': 'OPEN' if authorized else 'CLOSED'
+        }
+        
+        log_path = os.path.join(self.dirs['logs'], "detection_log.csv")
+        log_df = pd.DataFrame([log_entry])
+        log_df.to_csv(log_path, mode='a', header=not os.path.exists(log_path), index=False)
+        print(f"Logged results to: {log_path}")
+
+    def show_results(self, frame, result):
+        """Hand the results to the debug viewer; returns immediately (nothing is drawn without one)"""
+        if self.viewer:
+            self.viewer.show("Original Image", frame)
+            self.viewer.show("Processed Image", self.annotate(result))
+
+    def repeat_decision(self, trigger_time, gate_controller=None, lane='default'):
+        """Reuse the lane's last authorization when the vehicle it was for has not left the sensor.
+
+        `gate_controller` must be the lane's own controller. Returns the
+        authorization, or None when the trigger needs recognition.
+        """
+        if not self.decision_cache:
+            return None
+        gate_controller = gate_controller or self.gate_controller
+        decision = self.decision_cache.short_circuit(lane, getattr(gate_controller, 'last_clear', None),
+                                                     getattr(gate_controller, 'vehicle_present', False))
+        if decision is None:
+            return None
+        print(f"[{lane}] Vehicle still present - reusing the decision for {decision.plate}")
+        self.drive_gate(decision.authorized, gate_controller, decision.plate)
+        self.report_decision_time(trigger_time, decision.authorized, 'cached')
+        return decision.authorized
+
+    def store_decision(self, lane, result, plate, authorized):
+        """Cache the authorization a gate was driven with, keeping the expiry of a cached one"""
+        verified_at = result.cached.verified_at if result.cached else None
+        self.decision_cache.store(lane, plate, authorized, verified_at)
+
+    def metrics_text(self):
+        """Cache and plate grammar counters appended to /metrics"""
+        return ''.join(part.prometheus_text()
+                       for part in (self.plate_cache, self.decision_cache, self.plate_grammar) if part)
+
+    def report_decision_time(self, trigger_time, authorized, strategy):
+        """Log the time from sensor trigger to gate decision"""
+        decided_at = time.time()
+        decision_ms = (decided_at - trigger_time) * 1000
+        self.tracer.record_span('decision', trigger_time, decided_at, strategy=strategy)
+        print(f"Decision ({strategy}) in {decision_ms:.0f} ms after trigger")
+        
+        metrics_path = os.path.join(self.dirs['logs'], "decision_times.csv")
+        pd.DataFrame([{
+            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'strategy': strategy,
+            'decision_ms': round(decision_ms, 1),
+            'authorized': authorized
+        }]).to_csv(metrics_path, mode='a', header=not os.path.exists(metrics_path), index=False)
+        return decision_ms
+
+    def burst_capture(self, video_source):
+        """Yield up to speculative_frames frames in quick succession"""
+        cap = cv2.VideoCapture(video_source)
+        if not cap.isOpened():
+            print(f"Error opening video source: {video_source}")
+            return
+        try:
+            for i in range(self.speculative_frames):
+                if i:
+                    time.sleep(self.speculative_interval)
+                with self.tracer.span('capture'):
+                    ret, frame = cap.read()
+                if ret:
+                    yield frame
+                else:
+                    print("Failed to capture frame")
+        finally:
+            cap.release()
+
+    def process_speculative(self, frames, trigger_time, strategy, gate_controller=None, profile=None,
+                            lane='default'):
+        """Process frames concurrently; the first authorized result wins.
+
+        `frames` may be a generator (burst capture): each frame is submitted as
+        soon as it is available and capturing stops once a winner is found.
+        Remaining work is cancelled before the gate is driven. Multi-lane
+        hosts pass the `lane` name with its `gate_controller` and camera `profile`.
+        """
+        cancel_event = threading.Event()
+        attempts = {}
+        winner = None
+        
+        def succeeded(future):
+            # A frame that raised (OCR, API, ...) counts as not authorized instead of aborting the decision
+            return future.done() and not future.cancelled() and future.exception() is None
+        
+        def first_authorized(futures):
+            return next((f for f in futures if succeeded(f) and f.result()[2]), None)
+        
+        for frame in frames:
+            # Run in a copy of the current context so worker spans join this trace
+            future = self.worker_pool.submit(contextvars.copy_context().run,
+                                             self.process_frame, frame, False, cancel_event, profile, lane,
+                                             trigger_time)
+            attempts[future] = (len(attempts) + 1, frame)
+            winner = first_authorized(attempts)
+            if winner:
+                break
+        
+        pending = {f for f in attempts if not f.done()}
+        while winner is None and pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = first_authorized(done)
+        
+        # Stop the losers: queued ones never start, running ones stop at the next stage
+        cancel_event.set()
+        for future in attempts:
+            future.cancel()
+        
+        authorized = winner is not None
+        self.drive_gate(authorized, gate_controller, winner.result()[1] if winner else None)
+        if winner and self.decision_cache:
+            self.store_decision(lane, *winner.result())  # Only the decision the gate got
+        self.report_decision_time(trigger_time, authorized, strategy)
+        
+        if not attempts:
+            print("No frames captured")
+            return False
+        
+        for future, (attempt, _) in attempts.items():
+            if future.done() and not future.cancelled() and future.exception() is not None:
+                print(f"Attempt {attempt} failed: {future.exception()}")
+        
+        # Artifacts are written after the decision so they don't delay the gate
+        finished = [(attempts[f], f.result()) for f in attempts if succeeded(f) and f.result()[1] != "Cancelled"]
+        for (attempt, frame), (result, detection_result, result_authorized) in finished:
+            self.record_attempt(attempt, frame, result, detection_result, result_authorized, lane)
+        
+        if not winner and not finished:
+            print("\nNo attempt completed. Gate status: CLOSED")
+            return False
+        (_, shown_frame), shown = (attempts[winner], winner.result()) if winner else finished[0]
+        print(f"\nProcessing complete. Gate status: {'OPEN' if authorized else 'CLOSED'}")
+        print(f"Detection result: {shown[1]}")
+        self.show_results(shown_frame, shown[0])
+        return authorized
+
     def process_detection(self, video_source):
         """Main processing workflow triggered by detection"""
+        if self.use_frame_buffer:
+            self.get_frame_buffer(video_source)
+        
         # Step 1: Wait for ultrasonic detection
-        if not self.wait_for_detection():
+        trigger = self.wait_for_detection()
+        if not trigger:
             return False
+        
+        with self.tracer.event('detection', start=trigger.timestamp):
+            self.tracer.record_span('sensor_trigger', trigger.timestamp, time.time())
+            return self.handle_trigger(trigger, video_source)
+
+    def handle_trigger(self, trigger, video_source):
+        """Capture and recognize after a DETECTED event"""
+        # A repeat trigger from a vehicle that was already decided needs no recognition
+        cached = self.repeat_decision(trigger.timestamp)
+        if cached is not None:
+            return cached
+        
+        # Step 2: Use the best frames we already have when the buffer is running
+        if self.use_frame_buffer:
+            frames = self.frame_buffer.snapshot()
+            if frames:
+                with self.tracer.span('frame_selection'):
+                    candidates = self.frame_buffer.stable(
+                        select_best_frames(frames, self.buffer_candidates, self.plate_box_confidence))
+                print(f"\nProcessing best {len(candidates)} of {len(frames)} buffered frames")
+                return self.process_speculative([frame for _, frame in candidates],
+                                                trigger.timestamp, 'buffered')
+            print("Frame buffer empty - falling back to live capture")
+        
+        # Step 3: Capture a burst and process it concurrently
+        if self.retry_strategy == 'speculative':
+            return self.process_speculative(self.burst_capture(video_source),
+                                            trigger.timestamp, 'speculative')
             
-        # Step 2: Attempt capture up to max_attempts times
+        # Step 3 (sequential): Attempt capture up to max_attempts times
         authorized = False
         attempt = 0
         
@@ -345,61 +1015,31 @@ class LicensePlateSystem:
             attempt += 1
             print(f"\nCapture attempt {attempt} of {self.max_capture_attempts}")
             
-            # Step 3: Capture frame when detected
+            # Step 4: Capture frame when detected
             frame = self.capture_frame(video_source)
             if frame is None:
                 time.sleep(self.capture_delay)
                 continue
-                
-            # Step 4: Save original frame
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-            original_path = os.path.join(self.dirs['original'], f"attempt_{attempt}_{timestamp}.jpg")
-            cv2.imwrite(original_path, frame)
-            print(f"Saved detection image to: {original_path}")
             
             # Step 5: Process frame
-            processed_frame, detection_result, authorized = self.process_frame(frame)
+            result, detection_result, authorized = self.process_frame(frame, trigger=trigger.timestamp)
             
-            # Step 6: Save processed frame
-            processed_path = os.path.join(self.dirs['processed'], f"processed_{attempt}_{timestamp}.jpg")
-            cv2.imwrite(processed_path, processed_frame)
-            print(f"Saved processed image to: {processed_path}")
+            if authorized and self.decision_cache:
+                self.store_decision('default', result, detection_result, authorized)
             
-            # Step 7: Log results
-            log_entry = {
-                'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                'attempt': attempt,
-                'image_path': original_path,
-                'detected_object': detection_result,
-                'plate_text': detection_result if detection_result in self.non_vehicle_classes.values() or 
-                               detection_result == "No license plate detected" else "None",
-                'authorized': authorized,
-                'gate_status': 'OPEN' if authorized else 'CLOSED'
-            }
-            
-            log_path = os.path.join(self.dirs['logs'], "detection_log.csv")
-            log_df = pd.DataFrame([log_entry])
-            log_df.to_csv(log_path, mode='a', header=not os.path.exists(log_path), index=False)
-            print(f"Logged results to: {log_path}")
+            # Step 6: Save images and log results
+            self.record_attempt(attempt, frame, result, detection_result, authorized)
             
             print(f"\nProcessing complete. Gate status: {'OPEN' if authorized else 'CLOSED'}")
             print(f"Detection result: {detection_result}")
             
-            # Display results if GUI available
-            if self.gui_enabled:
-                try:
-                    cv2.imshow("Original Image", frame)
-                    cv2.imshow("Processed Image", processed_frame)
-                    cv2.waitKey(3000)  # Show for 3 seconds
-                    cv2.destroyAllWindows()
-                except:
-                    self.gui_enabled = False
-                    print("Failed to display images - continuing in headless mode")
+            self.show_results(frame, result)
             
             # Small delay between attempts
             if not authorized and attempt < self.max_capture_attempts:
                 time.sleep(self.capture_delay)
         
+        self.report_decision_time(trigger.timestamp, authorized, 'sequential')
         return authorized
 
 # ========== MAIN EXECUTION ==========
@@ -407,6 +1047,9 @@ if __name__ == '__main__':
     # Initialize system
     system = LicensePlateSystem()
     
+    if system.metrics_port:
+        serve_metrics(system.tracer, system.metrics_port, extra=system.metrics_text)
+    
     # Check Arduino connection
     if system.gate_controller.serial_conn is None:
         print("Warning: Running without Arduino connection")
@@ -427,5 +1070,12 @@ if __name__ == '__main__':
         print("\nSystem stopped by user")
     finally:
         # Cleanup
+        if system.frame_buffer:
+            system.frame_buffer.stop()
+        if system.ocr_service:
+            system.ocr_service.shutdown()
+        system.stop_gate_services()
+        if system.viewer:
+            system.viewer.stop()
         if system.gate_controller.serial_conn:
             system.gate_controller.close_gate()
\ No newline at end of file
@@ -0,0 +1,184 @@
+#loadtest.py
+#
+# Concurrency benchmark for the gate API (app.py or asgi_app.py).
+#
+#   python loadtest.py --spawn gunicorn --image "static/images/new1 (1).jpg"
+#   python loadtest.py --url http://gate-server:5000 --endpoints check_plate
+#
+# --spawn starts the server itself against the in-memory Firestore stand-in
+# (GATE_DB=memory, seeded with the admin account and --plates plates), as the
+# production gunicorn setup, the async asgi_app under hypercorn, or the
+# Werkzeug dev server. To test against the real Firestore emulator instead,
+# start the server yourself with FIRESTORE_EMULATOR_HOST set and pass --url.
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import requests
+
+ADMIN_USERNAME = 'admin'
+ADMIN_PASSWORD = '12341234'
+
+def write_seed(path, plate_count):
+    """Seed file for memory_firestore: admin account plus registered plates"""
+    plates = {f"3AA{i:05d}": {'plate': f"3AA{i:05d}", 'id_number': f"D{i % 500:04d}"}
+              for i in range(plate_count)}
+    with open(path, 'w') as f:
+        json.dump({
+            'admins': {ADMIN_USERNAME: {'username': ADMIN_USERNAME, 'password': ADMIN_PASSWORD}},
+            'plates': plates
+        }, f)
+    return list(plates)
+
+def spawn_server(mode, port, seed_path):
+    env = dict(os.environ, GATE_DB='memory', GATE_DB_SEED=seed_path, GATE_BIND=f"127.0.0.1:{port}")
+    if mode == 'gunicorn':
+        command = ['gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app']
+    elif mode == 'asgi':
+        env['GATE_SECRET_KEY'] = env.get('GATE_SECRET_KEY', 'loadtest')
+        command = ['hypercorn', 'asgi_app:app', '--bind', f"127.0.0.1:{port}",
+                   '--workers', env.get('GATE_WORKERS', '2')]
+    else:
+        command = [sys.executable, '-c',
+                   f"import app; app.init_firebase(); app.app.run(port={port}, threaded=True)"]
+    return subprocess.Popen(command, env=env)
+
+def wait_for_server(url, timeout=180):
+    """Model loading makes startup slow; poll until the API answers"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(f"{url}/check_plate?plate=PING", timeout=2)
+            return True
+        except requests.RequestException:
+            time.sleep(1)
+    return False
+
+def make_request(session, url, endpoint, plates, image_bytes):
+    if endpoint == 'check_plate':
+        # Mix registered and unknown plates
+        plate = random.choice(plates) if plates and random.random() < 0.8 else f"X{random.randint(0, 99999):05d}"
+        return session.get(f"{url}/check_plate", params={'plate': plate}, timeout=30)
+    if endpoint == 'login':
+        return session.post(f"{url}/login", data={'username': ADMIN_USERNAME, 'password': ADMIN_PASSWORD},
+                            timeout=30)
+    if endpoint == 'detect':
+        return session.post(f"{url}/detect", files={'image': ('frame.jpg', image_bytes, 'image/jpeg')},
+                            timeout=120)
+    raise ValueError(f"Unknown endpoint: {endpoint}")
+
+def run_level(url, endpoint, concurrency, duration, plates, image_bytes):
+    """Hammer one endpoint with `concurrency` client threads for `duration` seconds"""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    deadline = time.time() + duration
+
+    def client():
+        session = requests.Session()
+        while time.time() < deadline:
+            start = time.perf_counter()
+            try:
+                response = make_request(session, url, endpoint, plates, image_bytes)
+                error = f"HTTP {response.status_code}" if response.status_code >= 500 else None
+            except requests.RequestException as e:
+                error = type(e).__name__
+            elapsed = time.perf_counter() - start
+            with lock:
+                if error:
+                    errors.append(error)
+                else:
+                    latencies.append(elapsed)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.time() - started
+
+    latencies.sort()
+    total = len(latencies) + len(errors)
+
+    def pct(q):
+        return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 2) if latencies else None
+
+    return {
+        'endpoint': endpoint,
+        'concurrency': concurrency,
+        'requests': total,
+        'rps': round(len(latencies) / wall, 2),
+        'p50_ms': pct(0.5),
+        'p95_ms': pct(0.95),
+        'p99_ms': pct(0.99),
+        'error_rate': round(len(errors) / total, 4) if total else 0.0,
+        'errors': sorted(set(errors))
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the gate API")
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help="Server to test")
+    parser.add_argument('--spawn', choices=['gunicorn', 'asgi', 'dev'], help="Start the server with the memory DB")
+    parser.add_argument('--port', type=int, default=5055, help="Port for a spawned server")
+    parser.add_argument('--endpoints', default='check_plate,login,detect')
+    parser.add_argument('--concurrency', default='1,4,16,64', help="Comma-separated client counts")
+    parser.add_argument('--duration', type=float, default=10, help="Seconds per level")
+    parser.add_argument('--plates', type=int, default=1000, help="Plates seeded into the memory DB")
+    parser.add_argument('--image', help="JPEG posted to /detect (detect is skipped without it)")
+    parser.add_argument('--output', default='loadtest_results.json')
+    args = parser.parse_args()
+
+    endpoints = [e for e in args.endpoints.split(',') if e]
+    if 'detect' in endpoints and not args.image:
+        print("No --image given - skipping /detect")
+        endpoints.remove('detect')
+    image_bytes = open(args.image, 'rb').read() if args.image else None
+
+    server = None
+    plates = []
+    url = args.url
+    seed_dir = tempfile.TemporaryDirectory()
+    try:
+        if args.spawn:
+            plates = write_seed(os.path.join(seed_dir.name, 'seed.json'), args.plates)
+            url = f"http://127.0.0.1:{args.port}"
+            server = spawn_server(args.spawn, args.port, os.path.join(seed_dir.name, 'seed.json'))
+            if not wait_for_server(url):
+                print("Server did not start")
+                return
+
+        results = []
+        print(f"{'endpoint':<14}{'clients':>8}{'rps':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'errors':>9}")
+        for endpoint in endpoints:
+            for concurrency in (int(c) for c in args.concurrency.split(',')):
+                result = run_level(url, endpoint, concurrency, args.duration, plates, image_bytes)
+                results.append(result)
+                print(f"{endpoint:<14}{concurrency:>8}{result['rps']:>10}{result['p50_ms'] or 0:>8.1f}ms"
+                      f"{result['p95_ms'] or 0:>8.1f}ms{result['p99_ms'] or 0:>8.1f}ms{result['error_rate']:>9.2%}")
+
+        with open(args.output, 'w') as f:
+            json.dump({
+                'url': url,
+                'server': args.spawn or 'external',
+                'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                'duration_s': args.duration,
+                'results': results
+            }, f, indent=2)
+        print(f"\nResults saved to: {args.output}")
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=30)
+        seed_dir.cleanup()
+
+if __name__ == '__main__':
+    main()
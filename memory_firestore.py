@@ -0,0 +1,147 @@
+#memory_firestore.py
+#
+# In-process stand-in for the subset of the Firestore client used by app.py
+# and asgi_app.py (collection/document get, set, update, delete and
+# where().stream()).
+# Used for load tests and local runs without credentials: GATE_DB=memory.
+# Each process has its own store, so seed shared data with GATE_DB_SEED,
+# a JSON file shaped {"collection": {"doc_id": {...fields}}}.
+
+import copy
+import json
+import threading
+
+class MemorySnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+class MemoryDocument:
+    def __init__(self, client, collection, doc_id):
+        self.client = client
+        self.collection = collection
+        self.id = doc_id
+
+    def get(self):
+        with self.client.lock:
+            return MemorySnapshot(self.id, copy.deepcopy(self.client.store(self.collection).get(self.id)))
+
+    def set(self, data, merge=False):
+        with self.client.lock:
+            docs = self.client.store(self.collection)
+            if merge and self.id in docs:
+                docs[self.id].update(copy.deepcopy(data))
+            else:
+                docs[self.id] = copy.deepcopy(data)
+
+    def update(self, data):
+        with self.client.lock:
+            docs = self.client.store(self.collection)
+            if self.id not in docs:
+                raise KeyError(f"No document to update: {self.collection}/{self.id}")
+            docs[self.id].update(copy.deepcopy(data))
+
+    def delete(self):
+        with self.client.lock:
+            self.client.store(self.collection).pop(self.id, None)
+
+class MemoryQuery:
+    OPERATORS = {
+        '==': lambda a, b: a == b,
+        '!=': lambda a, b: a != b,
+        '<': lambda a, b: a < b,
+        '<=': lambda a, b: a <= b,
+        '>': lambda a, b: a > b,
+        '>=': lambda a, b: a >= b,
+        'in': lambda a, b: a in b,
+    }
+
+    def __init__(self, client, collection, filters=()):
+        self.client = client
+        self.collection = collection
+        self.filters = list(filters)
+
+    def where(self, field, op, value):
+        if op not in self.OPERATORS:
+            raise ValueError(f"Unsupported operator: {op}")
+        return MemoryQuery(self.client, self.collection, self.filters + [(field, op, value)])
+
+    def stream(self):
+        with self.client.lock:
+            docs = copy.deepcopy(self.client.store(self.collection))
+        for doc_id, data in docs.items():
+            if all(field in data and self.OPERATORS[op](data[field], value)
+                   for field, op, value in self.filters):
+                yield MemorySnapshot(doc_id, data)
+
+class MemoryCollection(MemoryQuery):
+    def __init__(self, client, name):
+        super().__init__(client, name)
+
+    def document(self, doc_id):
+        return MemoryDocument(self.client, self.collection, doc_id)
+
+class MemoryClient:
+    """Thread-safe dict-backed Firestore client"""
+    def __init__(self, seed_path=None):
+        self.lock = threading.Lock()
+        self.collections = {}
+        if seed_path:
+            with open(seed_path) as f:
+                self.collections = json.load(f)
+
+    def store(self, name):
+        return self.collections.setdefault(name, {})
+
+    def collection(self, name):
+        return MemoryCollection(self, name)
+
+# ========== ASYNC VARIANT ==========
+# Mirrors firebase_admin.firestore_async for asgi_app.py. Operations are
+# in-memory, so the coroutines complete without suspending.
+
+class AsyncMemoryDocument:
+    def __init__(self, document):
+        self._document = document
+        self.id = document.id
+
+    async def get(self):
+        return self._document.get()
+
+    async def set(self, data, merge=False):
+        self._document.set(data, merge=merge)
+
+    async def update(self, data):
+        self._document.update(data)
+
+    async def delete(self):
+        self._document.delete()
+
+class AsyncMemoryQuery:
+    def __init__(self, query):
+        self._query = query
+
+    def where(self, field, op, value):
+        return AsyncMemoryQuery(self._query.where(field, op, value))
+
+    async def stream(self):
+        for snapshot in self._query.stream():
+            yield snapshot
+
+class AsyncMemoryCollection(AsyncMemoryQuery):
+    def document(self, doc_id):
+        return AsyncMemoryDocument(self._query.document(doc_id))
+
+class AsyncMemoryClient:
+    def __init__(self, seed_path=None):
+        self._client = MemoryClient(seed_path=seed_path)
+
+    def collection(self, name):
+        return AsyncMemoryCollection(self._client.collection(name))
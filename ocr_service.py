@@ -0,0 +1,213 @@
+#ocr_service.py
+#
+# Plate OCR on a pool of worker processes so EasyOCR and Tesseract run
+# outside the main process's GIL:
+#
+#   service = OCRService(workers=4)
+#   future = service.submit(plate_img)   # concurrent.futures.Future
+#   future.result()['text']
+#
+# Each worker loads EasyOCR once in its initializer. Crops are copied into a
+# shared memory segment split into fixed-size slots, and workers read them
+# in place, so only the slot offset and shape are pickled. When all slots are
+# in flight, submit() blocks until one frees up. Crops larger than a slot get
+# a segment of their own.
+#
+# Throughput check on saved crops:
+#
+#   python ocr_service.py detection_results/plate_crops --workers 1,2,4
+
+import argparse
+import glob
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import cv2
+import numpy as np
+import pytesseract
+
+import plate_ocr
+
+# ========== WORKER PROCESS ==========
+_worker = {}
+
+def _attach(name):
+    """Attach to a segment owned by the parent without letting this process unlink it"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        segment = shared_memory.SharedMemory(name=name)
+        if os.name == 'posix':
+            resource_tracker.unregister(segment._name, 'shared_memory')
+        return segment
+
+def _init_worker(segment_name, languages, gpu, tesseract_cmd, tesseract_lang):
+    """Load the OCR engines once per worker process"""
+    import easyocr
+    import torch
+
+    # One thread per process; scaling comes from the process count
+    cv2.setNumThreads(1)
+    torch.set_num_threads(1)
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    _worker['reader'] = easyocr.Reader(list(languages), gpu=gpu, verbose=False)
+    _worker['segment'] = _attach(segment_name)
+    _worker['tesseract_lang'] = tesseract_lang
+
+def _worker_ready():
+    time.sleep(0.2)  # Keep this worker busy so the others take their own ping
+    return os.getpid()
+
+def _run_ocr(segment_name, offset, shape, save_path):
+    """Read one crop from shared memory and run both OCR engines"""
+    shared = segment_name == _worker['segment'].name
+    segment = _worker['segment'] if shared else _attach(segment_name)
+    spans = []
+    try:
+        start = time.time()
+        # The temporary view is released before the segment is closed or reused
+        processed = plate_ocr.preprocess_plate(np.ndarray(shape, np.uint8, buffer=segment.buf, offset=offset))
+        spans.append(('preprocessing', start, time.time()))
+    finally:
+        if not shared:
+            segment.close()
+
+    if save_path:
+        start = time.time()
+        cv2.imwrite(save_path, processed)
+        spans.append(('artifact_write', start, time.time()))
+
+    start = time.time()
+    easyocr_text = plate_ocr.read_easyocr(_worker['reader'], processed)
+    spans.append(('ocr_easyocr', start, time.time()))
+    start = time.time()
+    tesseract_text = plate_ocr.read_tesseract(processed, _worker['tesseract_lang'])
+    spans.append(('ocr_tesseract', start, time.time()))
+
+    return {
+        'text': plate_ocr.pick_result(easyocr_text, tesseract_text),
+        'easyocr': easyocr_text,
+        'tesseract': tesseract_text,
+        'spans': spans,
+        'worker': os.getpid()
+    }
+
+# ========== SERVICE ==========
+class OCRService:
+    """Pool of OCR worker processes fed through shared memory"""
+    def __init__(self, workers=2, slot_shape=(256, 768, 3), slots=None, languages=('en',), gpu=False,
+                 tesseract_cmd=None, tesseract_lang='amh+eng'):
+        self.workers = workers
+        self.slot_bytes = int(np.prod(slot_shape))  # Largest crop that fits a slot
+        self.slot_count = slots or workers * 2  # Two in flight per worker keeps workers fed
+        self.segment = shared_memory.SharedMemory(create=True, size=self.slot_bytes * self.slot_count)
+        self.free_slots = queue.Queue()
+        for slot in range(self.slot_count):
+            self.free_slots.put(slot)
+        # spawn: workers must not inherit the parent's torch threads or CUDA state
+        self.pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                        initializer=_init_worker,
+                                        initargs=(self.segment.name, tuple(languages), gpu,
+                                                  tesseract_cmd, tesseract_lang))
+        self.lock = threading.Lock()
+        self.stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'oversized': 0}
+
+    def start(self):
+        """Start every worker and wait for its models to load; returns worker pids"""
+        pids = {future.result() for future in [self.pool.submit(_worker_ready) for _ in range(self.workers)]}
+        print(f"OCR service ready: {len(pids)} workers")
+        return sorted(pids)
+
+    def submit(self, plate_img, save_path=None):
+        """Queue one BGR crop for OCR; the future resolves to a result dict"""
+        plate_img = np.ascontiguousarray(plate_img, dtype=np.uint8)
+        if plate_img.nbytes > self.slot_bytes:
+            return self.submit_oversized(plate_img, save_path)
+
+        slot = self.free_slots.get()  # Blocks while every slot is in flight
+        offset = slot * self.slot_bytes
+        np.ndarray(plate_img.shape, np.uint8, buffer=self.segment.buf, offset=offset)[...] = plate_img
+        try:
+            future = self.pool.submit(_run_ocr, self.segment.name, offset, plate_img.shape, save_path)
+        except Exception:
+            self.free_slots.put(slot)
+            raise
+        self.count('submitted')
+        future.add_done_callback(lambda f: self.finish(f, slot=slot))
+        return future
+
+    def submit_oversized(self, plate_img, save_path):
+        segment = shared_memory.SharedMemory(create=True, size=plate_img.nbytes)
+        np.ndarray(plate_img.shape, np.uint8, buffer=segment.buf)[...] = plate_img
+        try:
+            future = self.pool.submit(_run_ocr, segment.name, 0, plate_img.shape, save_path)
+        except Exception:
+            segment.close()
+            segment.unlink()
+            raise
+        self.count('submitted')
+        self.count('oversized')
+        future.add_done_callback(lambda f: self.finish(f, segment=segment))
+        return future
+
+    def finish(self, future, slot=None, segment=None):
+        """Done callback: hand the crop's memory back"""
+        if slot is not None:
+            self.free_slots.put(slot)
+        if segment is not None:
+            segment.close()
+            segment.unlink()
+        self.count('failed' if future.cancelled() or future.exception() else 'completed')
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def map(self, plate_imgs):
+        """OCR a batch of crops; returns results in input order"""
+        futures = [self.submit(plate_img) for plate_img in plate_imgs]
+        return [future.result() for future in futures]
+
+    def shutdown(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        self.segment.close()
+        self.segment.unlink()
+
+# ========== THROUGHPUT CHECK ==========
+def measure_throughput(crops, workers):
+    service = OCRService(workers=workers)
+    try:
+        service.start()
+        service.map(crops[:workers])  # Warm-up
+        start = time.perf_counter()
+        service.map(crops)
+        return len(crops) / (time.perf_counter() - start)
+    finally:
+        service.shutdown()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure OCR worker pool throughput")
+    parser.add_argument('crops', help="Directory of plate crop images")
+    parser.add_argument('--workers', default='1,2,4', help="Comma-separated worker counts")
+    parser.add_argument('--limit', type=int, default=200, help="Maximum crops to load")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.crops, '*.jpg')) + glob.glob(os.path.join(args.crops, '*.png')))
+    crops = [crop for crop in (cv2.imread(path) for path in paths[:args.limit]) if crop is not None]
+    if not crops:
+        print(f"No crops found in {args.crops}")
+        raise SystemExit(1)
+
+    print(f"{len(crops)} crops, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8}{'crops/s':>10}{'speedup':>9}")
+    baseline = None
+    for workers in (int(w) for w in args.workers.split(',')):
+        rate = measure_throughput(crops, workers)
+        baseline = baseline or rate
+        print(f"{workers:>8}{rate:>10.1f}{rate / baseline:>8.2f}x")
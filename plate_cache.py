@@ -0,0 +1,117 @@
+#plate_cache.py
+#
+# Recently recognized plate crops, so a car standing in front of the camera
+# is not OCRed again on every retry or frame. A crop is keyed by its scope
+# (lane and sensor trigger), the dHash of its normalized grayscale image and
+# its box quantized to a coarse grid. A new crop reuses a cached text only
+# within the same scope, when its box lands in the same or a neighbouring
+# grid cell and its hash is within `max_distance` bits.
+#
+# The scope is what keeps a reused text on the same car: two plates of the
+# same layout hash close together, so a crop from another lane or a later
+# trigger is always read again.
+#
+# The candidate frames of one trigger are OCRed concurrently
+# (process_speculative), so a frame usually looks up before its siblings
+# have stored anything: in practice the hits come from sequential retries
+# and single-frame replays. Lookups are counted per `path` ('sequential' or
+# 'concurrent') so the hit rate of each is visible in stats() and /metrics.
+
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+def dhash(plate_img, hash_size=8):
+    """Difference hash: one bit per horizontally adjacent pixel pair"""
+    gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY) if plate_img.ndim == 3 else plate_img
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+class PlateCache:
+    """Bounded LRU of OCR results with a TTL and near-duplicate matching"""
+    def __init__(self, max_entries=256, ttl=10.0, max_distance=10, hash_size=16, grid=24):
+        self.max_entries = max_entries
+        self.ttl = ttl  # Seconds a result stays reusable
+        self.max_distance = max_distance  # Hamming bits out of hash_size**2
+        self.hash_size = hash_size
+        self.grid = grid  # Box quantization step in pixels
+        self.entries = OrderedDict()  # (scope, hash, geometry) -> (text, stored_at)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.paths = {}  # path -> {'hits': n, 'misses': n}
+
+    def key(self, plate_img, box=None, scope=None):
+        geometry = tuple(int(v) // self.grid for v in box) if box is not None else None
+        return scope, dhash(plate_img, self.hash_size), geometry
+
+    def near(self, key, other):
+        (scope, crop_hash, geometry), (other_scope, other_hash, other_geometry) = key, other
+        if scope != other_scope:
+            return False
+        if (geometry is None) != (other_geometry is None):
+            return False
+        if geometry is not None and any(abs(a - b) > 1 for a, b in zip(geometry, other_geometry)):
+            return False
+        return bin(crop_hash ^ other_hash).count('1') <= self.max_distance
+
+    def lookup(self, plate_img, box=None, key=None, scope=None, path='sequential'):
+        """Cached text for a near-identical recent crop in the same scope, or None"""
+        key = key or self.key(plate_img, box, scope)
+        now = time.time()
+        with self.lock:
+            counts = self.paths.setdefault(path, {'hits': 0, 'misses': 0})
+            for stored_key in list(self.entries):
+                text, stored_at = self.entries[stored_key]
+                if now - stored_at > self.ttl:
+                    del self.entries[stored_key]
+                    self.evictions += 1
+                elif self.near(key, stored_key):
+                    self.entries.move_to_end(stored_key)
+                    self.hits += 1
+                    counts['hits'] += 1
+                    return text
+            self.misses += 1
+            counts['misses'] += 1
+        return None
+
+    def store(self, plate_img, text, box=None, key=None, scope=None):
+        key = key or self.key(plate_img, box, scope)
+        with self.lock:
+            self.entries[key] = (text, time.time())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'paths': {path: dict(counts, hit_rate=round(counts['hits'] / (counts['hits'] + counts['misses']), 4))
+                          for path, counts in self.paths.items()}
+            }
+
+    def prometheus_text(self):
+        """Cache counters for /metrics"""
+        stats = self.stats()
+        return (f"gate_plate_cache_hits_total {stats['hits']}\n"
+                f"gate_plate_cache_misses_total {stats['misses']}\n"
+                f"gate_plate_cache_evictions_total {stats['evictions']}\n"
+                f"gate_plate_cache_entries {stats['entries']}\n"
+                + ''.join(f"gate_plate_cache_path_{result}_total{{path=\"{path}\"}} {counts[result]}\n"
+                          for path, counts in stats['paths'].items() for result in ('hits', 'misses')))
@@ -0,0 +1,151 @@
+#plate_ethiopic.py
+#
+# Ethiopian plate mode. A plate carries a category code (a single digit in
+# its own box on the left), a region abbreviation (Amharic, usually with the
+# Latin code under it) and the serial number (digits, newer series with a
+# leading letter). Instead of reading the plate as one word, the crop is
+# split into those segments by its ink column profile, and each segment is
+# read with its own alphabet and page mode:
+#
+#   code    digits only, single character
+#   region  full Ethiopic block (U+1200-U+137F) plus Latin capitals, block of text
+#   number  digits and Latin capitals, single line
+#
+# The three segment reads go through plate_ocr.run_tesseract on in-process
+# tesserocr handles. tesserocr is required: without it every read would start
+# three tesseract processes per crop, so the reader refuses to be built.
+
+import re
+import unicodedata
+from collections import namedtuple
+
+import cv2
+
+import plate_ocr
+from plate_ocr import PSM_BLOCK, PSM_SINGLE_CHAR, PSM_SINGLE_LINE, run_tesseract
+
+DIGITS = '0123456789'
+LATIN = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+ETHIOPIC = ''.join(ch for ch in map(chr, range(0x1200, 0x1380)) if unicodedata.name(ch, ''))
+ETHIOPIC_LETTERS = ''.join(ch for ch in ETHIOPIC if unicodedata.category(ch) == 'Lo')
+
+# Latin region code -> Amharic abbreviation as printed on the plate
+REGIONS = {
+    'AA': 'አአ',  # Addis Ababa
+    'AF': 'አፋ',  # Afar
+    'AM': 'አማ',  # Amhara
+    'BG': 'ቤጉ',  # Benishangul-Gumuz
+    'DR': 'ድሬ',  # Dire Dawa
+    'ET': 'ኢት',  # Federal
+    'GM': 'ጋም',  # Gambela
+    'HR': 'ሐረ',  # Harari
+    'OR': 'ኦሮ',  # Oromia
+    'SD': 'ሲዳ',  # Sidama
+    'SM': 'ሶማ',  # Somali
+    'DH': 'ደሕ',  # South Ethiopia / SNNP
+    'TG': 'ትግ',  # Tigray
+}
+REGION_BY_AMHARIC = {amharic: code for code, amharic in REGIONS.items()}
+
+EthiopianPlate = namedtuple('EthiopianPlate', ['code', 'region', 'number', 'raw'])
+
+def plate_text(plate):
+    """Canonical string used for lookups, e.g. 3AA12345"""
+    return f"{plate.code}{plate.region}{plate.number}"
+
+def preprocess_ethiopic(plate_img, height=96):
+    """LAB contrast enhancement, upscaled so characters are ~30px for Tesseract; returns ink mask"""
+    lab = cv2.cvtColor(plate_img, cv2.COLOR_BGR2LAB)
+    l_channel, a, b = cv2.split(lab)
+    clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
+    gray = clahe.apply(l_channel)
+    if gray.shape[0] < height:
+        scale = height / gray.shape[0]
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+    _, ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    return ink
+
+def segment_columns(ink, gap_fraction=0.04, border_fraction=0.85):
+    """Split the ink mask into [x0, x1) groups separated by wide blank gaps"""
+    height, width = ink.shape
+    column_ink = (ink > 0).sum(0)
+    # Frame lines and the code box border are ink top to bottom; ignore them
+    columns = (column_ink > 0.05 * height) & (column_ink < border_fraction * height)
+    min_gap = max(2, int(gap_fraction * width))
+
+    groups = []
+    start = None
+    gap = 0
+    for x, has_ink in enumerate(columns):
+        if has_ink:
+            if start is None:
+                start = x
+            gap = 0
+        elif start is not None:
+            gap += 1
+            if gap >= min_gap:
+                groups.append((start, x - gap + 1))
+                start, gap = None, 0
+    if start is not None:
+        groups.append((start, width - gap))
+    return [(x0, x1) for x0, x1 in groups if x1 - x0 >= 0.02 * width]
+
+def assign_segments(groups, width):
+    """Map column groups to (code, region, number) spans; missing parts are None"""
+    if not groups:
+        return None, None, None
+    if len(groups) == 1:
+        return None, None, groups[0]
+    number_index = max(range(1, len(groups)), key=lambda i: groups[i][1] - groups[i][0])
+    number = groups[number_index]
+    rest = groups[:number_index] + groups[number_index + 1:]
+    code = None
+    if rest and rest[0][1] - rest[0][0] < 0.12 * width and rest[0][0] < number[0]:
+        code, rest = rest[0], rest[1:]
+    region = (min(x0 for x0, _ in rest), max(x1 for _, x1 in rest)) if rest else None
+    return code, region, number
+
+def parse_region(text):
+    """Latin region code from a region segment read (Amharic and/or Latin)"""
+    latin = ''.join(c for c in text.upper() if c in LATIN)
+    for i in range(len(latin) - 1):
+        if latin[i:i + 2] in REGIONS:
+            return latin[i:i + 2]
+    ethiopic = ''.join(c for c in text if c in ETHIOPIC_LETTERS)
+    for amharic, code in REGION_BY_AMHARIC.items():
+        if amharic in ethiopic:
+            return code
+    # Fall back to the first syllable: abbreviations rarely share it
+    matches = [code for amharic, code in REGION_BY_AMHARIC.items() if ethiopic and amharic[0] == ethiopic[0]]
+    return matches[0] if len(matches) == 1 else latin[:2]
+
+class EthiopicPlateReader:
+    """Layout-aware Ethiopian plate reader on top of Tesseract"""
+    def __init__(self, language='amh+eng'):
+        if plate_ocr.tesserocr is None:
+            raise ImportError("The Ethiopic plate reader needs tesserocr (pip install tesserocr); "
+                              "pytesseract would start three tesseract processes per plate")
+        self.language = language
+
+    def read_segment(self, ink, span, psm, whitelist):
+        x0, x1 = span
+        pad = max(2, ink.shape[0] // 10)
+        segment = cv2.copyMakeBorder(255 - ink[:, x0:x1], pad, pad, pad, pad, cv2.BORDER_CONSTANT, value=255)
+        return run_tesseract(segment, self.language, psm, whitelist).strip()
+
+    def read(self, plate_img):
+        """EthiopianPlate for the crop, or None if no serial number was read"""
+        ink = preprocess_ethiopic(plate_img)
+        code_span, region_span, number_span = assign_segments(segment_columns(ink), ink.shape[1])
+        if number_span is None:
+            return None
+
+        code = self.read_segment(ink, code_span, PSM_SINGLE_CHAR, DIGITS) if code_span else ''
+        region_raw = self.read_segment(ink, region_span, PSM_BLOCK, ETHIOPIC + LATIN) if region_span else ''
+        number_raw = self.read_segment(ink, number_span, PSM_SINGLE_LINE, DIGITS + LATIN)
+
+        number = re.sub(r'[^0-9A-Z]', '', number_raw.upper())
+        if not any(c.isdigit() for c in number):
+            return None
+        return EthiopianPlate(code=re.sub(r'\D', '', code)[:1], region=parse_region(region_raw),
+                              number=number, raw=' | '.join(filter(None, [code, region_raw, number_raw])))
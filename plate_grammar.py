@@ -0,0 +1,174 @@
+#plate_grammar.py
+#
+# Plate-format grammar: rejects OCR reads that cannot be a plate before they
+# cost an API lookup or a capture retry, and repairs reads that are one
+# look-alike character away from a valid plate (0/O, 8/B, 5/S, ...).
+#
+# Formats are written one slot per character:
+#   c  category code 1-5      d  digit
+#   r  region code (2 chars)  l  Latin letter
+#   Uppercase letters and digits are literal.
+# Each format is expanded into fixed-length slot sequences when the
+# grammar is built, so decoding only compares candidates against sequences
+# of the same length.
+#
+# Candidates are either strings (EasyOCR/Tesseract) or per-character
+# alternatives [(char, prob), ...] (CTC recognizer). Strings are turned
+# into alternatives through the confusion table, at a penalty. Scores are
+# relative to what the engine read, not absolute confidences; engines keep
+# their own confidence cut.
+#
+# FORMATS only covers the plates we have seen. A plate_formats.json next to
+# the script ({"name": ["pattern", ...]}) replaces it, and every rejected
+# read is counted in /metrics (gate_plate_grammar_rejected_total) so an
+# unlisted format shows up instead of being silently denied.
+
+import json
+import os
+import re
+import threading
+from collections import namedtuple
+
+from plate_ethiopic import REGION_BY_AMHARIC, REGIONS
+
+FORMATS_PATH = "plate_formats.json"
+
+DIGITS = '0123456789'
+LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+FORMATS = {
+    'ethiopia': ['crddddd', 'crlddddd'],  # 3AA12345, 3AAB12345 (newer lettered series)
+    'ethiopia_legacy': ['crdddd'],  # 2OR1234, before five-digit serials
+    'kenya': ['Klldddl'],  # KAA123A
+    'djibouti': ['ddddDJ'],  # 1234DJ
+    'sudan': ['lldddd'],  # KH1234
+}
+
+# Characters OCR engines mix up on plates
+CONFUSIONS = {
+    '0': 'ODQ', 'O': '0DQ', 'D': '0O', 'Q': '0O',
+    '1': 'ILT', 'I': '1L', 'L': '1I', 'T': '17',
+    '2': 'Z', 'Z': '2',
+    '4': 'A', 'A': '4',
+    '5': 'S', 'S': '5',
+    '6': 'G', 'G': '6',
+    '7': 'T',
+    '8': 'B', 'B': '8',
+}
+
+PlateMatch = namedtuple('PlateMatch', ['text', 'format', 'score'])
+
+class PlateGrammar:
+    """Validate, canonicalize and score plate candidates against known formats"""
+    def __init__(self, formats=None, regions=None, confusion_penalty=0.5, edge_penalty=0.4, min_score=0.3):
+        self.formats = formats or FORMATS
+        self.regions = sorted(regions or REGIONS)
+        self.confusion_penalty = confusion_penalty  # Probability given to a look-alike substitution
+        self.edge_penalty = edge_penalty  # Score factor for dropping a stray first/last character
+        self.min_score = min_score
+        self.sequences = self.compile()
+        self.region_first = re.compile(rf"^({'|'.join(self.regions)})([1-5])(.+)$")
+        self.lock = threading.Lock()
+        self.counts = {'accepted': 0, 'rejected': 0}
+
+    @classmethod
+    def load(cls, path=FORMATS_PATH, **settings):
+        """Grammar with the formats from `path` if it exists, otherwise FORMATS"""
+        if os.path.exists(path):
+            with open(path) as f:
+                settings['formats'] = json.load(f)
+            print(f"Loaded plate formats: {path}")
+        return cls(**settings)
+
+    def compile(self):
+        """Expand formats into {length: [(format name, tuple of allowed-char sets)]}"""
+        slot_chars = {'c': '12345', 'd': DIGITS, 'l': LETTERS}
+        sequences = {}
+        for name, patterns in self.formats.items():
+            for pattern in patterns:
+                expansions = [[]]
+                for slot in pattern:
+                    if slot == 'r':
+                        expansions = [seq + [frozenset(region[0]), frozenset(region[1])]
+                                      for seq in expansions for region in self.regions]
+                    else:
+                        chars = frozenset(slot_chars.get(slot, slot))
+                        expansions = [seq + [chars] for seq in expansions]
+                for seq in expansions:
+                    sequences.setdefault(len(seq), []).append((name, tuple(seq)))
+        return sequences
+
+    def canonicalize(self, text):
+        """Uppercase alphanumerics, Latin region codes, code before region"""
+        for amharic, code in REGION_BY_AMHARIC.items():
+            text = text.replace(amharic, code)
+        text = ''.join(c for c in text.upper() if c in DIGITS or c in LETTERS)
+        return self.region_first.sub(r'\2\1\3', text)
+
+    def validate(self, text):
+        """Format name if the canonical text is a valid plate as-is, else None"""
+        text = self.canonicalize(text)
+        for name, seq in self.sequences.get(len(text), ()):
+            if all(c in chars for c, chars in zip(text, seq)):
+                return name
+        return None
+
+    def alternatives(self, text):
+        """Per-character alternatives for a string read, look-alikes at a penalty"""
+        return [[(c, 1.0)] + [(alt, self.confusion_penalty) for alt in CONFUSIONS.get(c, '')] for c in text]
+
+    def decode(self, alternatives, penalty=1.0):
+        """Best-scoring valid plate for per-character alternatives, or None.
+
+        Each character scores its probability relative to the best option at
+        that position, so a read that already fits scores 1.0 and every
+        substitution costs what the engine thought of it.
+        """
+        best = None
+        tops = [max((p for _, p in options), default=0.0) or 1.0 for options in alternatives]
+        for name, seq in self.sequences.get(len(alternatives), ()):
+            score = penalty
+            chars = []
+            for options, allowed, top in zip(alternatives, seq, tops):
+                char, prob = max(((c, p) for c, p in options if c in allowed), key=lambda o: o[1],
+                                 default=(None, 0.0))
+                score *= prob / top
+                if char is None or (best and score <= best.score):
+                    break
+                chars.append(char)
+            else:
+                best = PlateMatch(''.join(chars), name, score)
+        return best
+
+    def match(self, candidate):
+        """Best PlateMatch for one candidate (string or alternatives), or None"""
+        if isinstance(candidate, str):
+            text = self.canonicalize(candidate)
+            if not text:
+                return None
+            # Plate frames and screws are often read as an extra I/1 at either end
+            variants = [(self.alternatives(text), 1.0)]
+            if len(text) > 1:
+                variants += [(self.alternatives(text[1:]), self.edge_penalty),
+                             (self.alternatives(text[:-1]), self.edge_penalty)]
+        else:
+            variants = [([[(c.upper(), p) for c, p in options] for options in candidate], 1.0)]
+
+        matches = [m for m in (self.decode(alternatives, penalty) for alternatives, penalty in variants) if m]
+        return max(matches, key=lambda m: m.score, default=None)
+
+    def best(self, candidates):
+        """Highest-scoring valid plate over several candidates; None rejects them all"""
+        matches = [m for m in (self.match(c) for c in candidates if c) if m and m.score >= self.min_score]
+        best = max(matches, key=lambda m: m.score, default=None)
+        if any(candidates):  # Unreadable crops are not a format problem
+            with self.lock:
+                self.counts['accepted' if best else 'rejected'] += 1
+        return best
+
+    def prometheus_text(self):
+        """Accepted/rejected read counters for /metrics"""
+        with self.lock:
+            counts = dict(self.counts)
+        return (f"gate_plate_grammar_accepted_total {counts['accepted']}\n"
+                f"gate_plate_grammar_rejected_total {counts['rejected']}\n")
@@ -0,0 +1,101 @@
+#plate_ocr.py
+#
+# Plate preprocessing and OCR engines, free of LicensePlateSystem state so
+# they can also run inside OCR worker processes (ocr_service.py).
+#
+# With tesserocr installed, Tesseract runs in-process on a persistent
+# per-thread handle; otherwise pytesseract starts a tesseract process per call.
+
+import os
+import threading
+
+import cv2
+import numpy as np
+import pytesseract
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+OCR_ALLOWLIST = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+PSM_BLOCK = 6
+PSM_SINGLE_LINE = 7
+PSM_SINGLE_WORD = 8
+PSM_SINGLE_CHAR = 10
+
+_tesseract_handles = threading.local()
+
+def preprocess_plate(plate_img):
+    """Enhanced image preprocessing combining both methods"""
+    # Convert to grayscale
+    gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY)
+
+    # Denoising
+    denoised = cv2.fastNlMeansDenoising(gray, h=10)
+
+    # Contrast enhancement
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
+    enhanced = clahe.apply(denoised)
+
+    # Binarization
+    _, thresh = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+
+    # Morphological operations
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3,3))
+    processed = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
+
+    return processed
+
+def read_easyocr(reader, processed):
+    """Extract text using EasyOCR"""
+    results = reader.readtext(processed, detail=0, allowlist=OCR_ALLOWLIST)
+    return results[0] if results else ""
+
+def tessdata_path():
+    """tessdata folder for tesserocr: TESSDATA_PREFIX, else next to the configured tesseract binary"""
+    if os.environ.get('TESSDATA_PREFIX'):
+        return os.environ['TESSDATA_PREFIX']
+    path = os.path.join(os.path.dirname(pytesseract.pytesseract.tesseract_cmd), 'tessdata')
+    return path if os.path.isdir(path) else None
+
+def tesseract_handle(language, psm, whitelist):
+    """This thread's tesserocr API for a language/mode/whitelist, created on first use"""
+    handles = getattr(_tesseract_handles, 'apis', None)
+    if handles is None:
+        handles = _tesseract_handles.apis = {}
+    key = (language, psm, whitelist)
+    api = handles.get(key)
+    if api is None:
+        options = {'lang': language, 'psm': psm}
+        if tessdata_path():
+            options['path'] = tessdata_path()
+        api = handles[key] = tesserocr.PyTessBaseAPI(**options)
+        if whitelist:
+            api.SetVariable('tessedit_char_whitelist', whitelist)
+    return api
+
+def run_tesseract(image, language, psm, whitelist=None):
+    """Raw Tesseract text for a grayscale or binary uint8 image"""
+    if tesserocr is not None:
+        image = np.ascontiguousarray(image, dtype=np.uint8)
+        api = tesseract_handle(language, psm, whitelist)
+        api.SetImageBytes(image.tobytes(), image.shape[1], image.shape[0], 1, image.shape[1])
+        return api.GetUTF8Text()
+    config = f'--oem 3 --psm {psm}' + (f' -c tessedit_char_whitelist={whitelist}' if whitelist else '')
+    return pytesseract.image_to_string(image, lang=language, config=config)
+
+def read_tesseract(processed, language='amh+eng'):
+    """Extract text with Tesseract from an already preprocessed plate"""
+    text = run_tesseract(processed, language, PSM_SINGLE_WORD, OCR_ALLOWLIST)
+
+    # Post-process the extracted text
+    text = text.strip()
+    text = ' '.join(text.split())  # Remove extra whitespace
+    return text
+
+def pick_result(easyocr_text, tesseract_text):
+    """Return the most confident result"""
+    if len(easyocr_text) >= len(tesseract_text):
+        return easyocr_text
+    return tesseract_text
@@ -0,0 +1,334 @@
+#plate_recognizer.py
+#
+# Compact CTC plate recognizer (small CRNN) to replace EasyOCR + Tesseract
+# on plate crops:
+#
+#   python plate_recognizer.py train data/gate_dataset/ocr --output models/plate_ctc.onnx
+#   python plate_recognizer.py compare data/gate_dataset/ocr/val --model models/plate_ctc.onnx
+#
+# Training reads the crops and labels.tsv written by dataset_builder.py and
+# exports the best epoch to ONNX. Only human-verified labels are used: the
+# builder's own labels are the ensemble's OCR output, so training or
+# comparing on them would only measure agreement with EasyOCR + Tesseract.
+# Verify crops by adding "<crop name>\t<correct text>" lines to
+# ocr/verified.tsv and rerunning dataset_builder.py (--include-unverified
+# bootstraps from pseudo-labels anyway). Inference only needs onnxruntime: crops
+# are resized to a fixed 32x128 grayscale input and run in batches. Each
+# output is greedily decoded over the plate alphabet, with a confidence per
+# character. Select it in LicensePlateSystem with ocr_engine = 'ctc'.
+
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+
+from plate_ocr import OCR_ALLOWLIST
+
+ALPHABET = OCR_ALLOWLIST  # Class 0 is the CTC blank, class i is ALPHABET[i - 1]
+INPUT_HEIGHT = 32
+INPUT_WIDTH = 128
+
+def preprocess(crop):
+    """BGR or grayscale crop -> normalized float32 array of shape (1, 32, 128)"""
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    resized = cv2.resize(gray, (INPUT_WIDTH, INPUT_HEIGHT), interpolation=cv2.INTER_AREA)
+    return ((resized.astype(np.float32) / 255.0 - 0.5) / 0.5)[None]
+
+def normalize_label(text):
+    return ''.join(c for c in text.upper() if c in ALPHABET)
+
+def ctc_decode(probs, allowed=None):
+    """Greedy CTC decode of a (T, classes) probability matrix.
+
+    Returns (text, confidences): the best-path characters with repeats
+    collapsed and blanks removed, each with the highest probability it had
+    over its timesteps. `allowed` restricts the alphabet further.
+    """
+    if allowed is not None:
+        mask = np.zeros(probs.shape[1], bool)
+        mask[0] = True
+        mask[[ALPHABET.index(c) + 1 for c in allowed if c in ALPHABET]] = True
+        probs = np.where(mask, probs, 0.0)
+    best = probs.argmax(1)
+    best_prob = probs.max(1)
+    chars = []
+    confidences = []
+    previous = 0
+    for k, p in zip(best, best_prob):
+        if k != 0:
+            if k == previous:
+                confidences[-1] = max(confidences[-1], float(p))
+            else:
+                chars.append(ALPHABET[k - 1])
+                confidences.append(float(p))
+        previous = k
+    return ''.join(chars), confidences
+
+def ctc_alternatives(probs, k=3):
+    """Top-k (char, prob) alternatives per best-path character, for plate_grammar decoding.
+
+    Each character is taken at the timestep where its best-path class was
+    most confident; blank is never offered as an alternative.
+    """
+    best = probs.argmax(1)
+    alternatives = []
+    peak = None
+    previous = 0
+    for t, c in enumerate(best):
+        if c != 0 and c == previous and probs[t, c] > probs[peak, c]:
+            peak = t
+        elif c != 0 and c != previous:
+            if peak is not None:
+                alternatives.append(peak)
+            peak = t
+        previous = c
+    if peak is not None:
+        alternatives.append(peak)
+
+    result = []
+    for t in alternatives:
+        order = np.argsort(probs[t, 1:])[::-1][:k]
+        result.append([(ALPHABET[i], float(probs[t, i + 1])) for i in order])
+    return result
+
+# ========== INFERENCE ==========
+class PlateRecognizer:
+    """ONNX Runtime session for the exported recognizer (thread-safe)"""
+    def __init__(self, model_path, threads=1, providers=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.model_path = model_path
+        self.session = ort.InferenceSession(model_path, options,
+                                            providers=providers or ['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def recognize_batch(self, crops, allowed=None):
+        """(text, per-character confidences) for each crop, in one forward pass"""
+        if not crops:
+            return []
+        batch = np.stack([preprocess(crop) for crop in crops])
+        log_probs = self.session.run(None, {self.input_name: batch})[0]  # N, T, classes
+        return [ctc_decode(np.exp(sample), allowed) for sample in log_probs]
+
+    def recognize(self, crop, allowed=None):
+        return self.recognize_batch([crop], allowed)[0]
+
+    def recognize_alternatives(self, crop, k=3):
+        """Per-character top-k alternatives for one crop"""
+        log_probs = self.session.run(None, {self.input_name: preprocess(crop)[None]})[0]
+        return ctc_alternatives(np.exp(log_probs[0]), k)
+
+# ========== TRAINING ==========
+def load_labeled_crops(split_dir, verified_only=True):
+    """(crop path, label) pairs from a dataset_builder.py OCR split (name, text, verified columns)"""
+    items = []
+    skipped = 0
+    with open(os.path.join(split_dir, 'labels.tsv'), encoding='utf-8') as f:
+        for line in f:
+            name, text, verified = (line.rstrip('\n').split('\t') + ['', '0'])[:3]
+            label = normalize_label(text)
+            if not label:
+                continue
+            if verified_only and verified != '1':
+                skipped += 1
+                continue
+            items.append((os.path.join(split_dir, name), label))
+    if verified_only and not items:
+        raise ValueError(f"No verified labels in {split_dir} ({skipped} unverified); add them to ocr/verified.tsv "
+                         f"and rerun dataset_builder.py, or pass --include-unverified")
+    return items
+
+class CropDataset:
+    """Map-style dataset of preprocessed crops and encoded labels"""
+    def __init__(self, items, augment=False):
+        self.items = items
+        self.augment = augment
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, i):
+        path, label = self.items[i]
+        crop = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if crop is None:
+            crop = np.zeros((INPUT_HEIGHT, INPUT_WIDTH), np.uint8)
+        if self.augment:
+            # Lighting and framing vary between gate cameras
+            crop = cv2.convertScaleAbs(crop, alpha=np.random.uniform(0.7, 1.3), beta=np.random.uniform(-30, 30))
+            h, w = crop.shape
+            dx, dy = np.random.randint(-max(1, w // 20), max(1, w // 20) + 1, 2)
+            crop = cv2.warpAffine(crop, np.float32([[1, 0, dx], [0, 1, dy]]), (w, h),
+                                  borderMode=cv2.BORDER_REPLICATE)
+        return preprocess(crop), [ALPHABET.index(c) + 1 for c in label]
+
+def collate(batch):
+    import torch
+
+    images = torch.from_numpy(np.stack([image for image, _ in batch]))
+    targets = torch.tensor([k for _, target in batch for k in target], dtype=torch.long)
+    lengths = torch.tensor([len(target) for _, target in batch], dtype=torch.long)
+    return images, targets, lengths
+
+def build_model():
+    import torch.nn as nn
+
+    def block(cin, cout, pool):
+        return [nn.Conv2d(cin, cout, 3, padding=1, bias=False), nn.BatchNorm2d(cout), nn.ReLU(inplace=True),
+                nn.MaxPool2d(pool)]
+
+    class CRNN(nn.Module):
+        def __init__(self, num_classes):
+            super().__init__()
+            # 1x32x128 -> 128x2x32: 32 timesteps, enough for any plate
+            self.features = nn.Sequential(*block(1, 32, (2, 2)), *block(32, 64, (2, 2)),
+                                          *block(64, 128, (2, 1)), *block(128, 128, (2, 1)))
+            self.rnn = nn.GRU(128 * 2, 96, bidirectional=True, batch_first=True)
+            self.classifier = nn.Linear(192, num_classes)
+
+        def forward(self, x):
+            features = self.features(x).permute(0, 3, 1, 2).flatten(2)  # N, T, C*H
+            out, _ = self.rnn(features)
+            return self.classifier(out).log_softmax(2)
+
+    return CRNN(len(ALPHABET) + 1)
+
+def evaluate(model, loader):
+    """Exact-match accuracy with greedy decoding"""
+    import torch
+
+    model.eval()
+    correct = total = 0
+    with torch.no_grad():
+        for images, targets, lengths in loader:
+            batch_probs = model(images).exp().numpy()
+            expected = np.split(targets.numpy(), np.cumsum(lengths.numpy())[:-1])
+            for probs, target in zip(batch_probs, expected):
+                correct += ctc_decode(probs)[0] == ''.join(ALPHABET[k - 1] for k in target)
+                total += 1
+    return correct / total if total else 0.0
+
+def export_onnx(model, output_path):
+    import torch
+
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    model.eval()
+    torch.onnx.export(model, torch.zeros(1, 1, INPUT_HEIGHT, INPUT_WIDTH), output_path,
+                      input_names=['image'], output_names=['log_probs'],
+                      dynamic_axes={'image': {0: 'batch'}, 'log_probs': {0: 'batch'}}, opset_version=17)
+    print(f"Exported recognizer to: {output_path}")
+
+def train(data_dir, output_path, epochs=40, batch_size=64, lr=1e-3, workers=2, verified_only=True):
+    """Train on <data_dir>/train, keep the best epoch on <data_dir>/val, export ONNX"""
+    import copy
+    import torch
+    from torch.utils.data import DataLoader
+
+    if not verified_only:
+        print("Warning: training on unverified labels (the ensemble's own OCR output)")
+    train_loader = DataLoader(CropDataset(load_labeled_crops(os.path.join(data_dir, 'train'), verified_only),
+                                          augment=True),
+                              batch_size=batch_size, shuffle=True, num_workers=workers, collate_fn=collate)
+    # Model selection always uses verified labels, or it would pick the epoch closest to the ensemble
+    val_loader = DataLoader(CropDataset(load_labeled_crops(os.path.join(data_dir, 'val'))),
+                            batch_size=batch_size, num_workers=workers, collate_fn=collate)
+
+    model = build_model()
+    optimizer = torch.optim.AdamW(model.parameters(), lr=lr)
+    scheduler = torch.optim.lr_scheduler.OneCycleLR(optimizer, lr, epochs=epochs,
+                                                    steps_per_epoch=max(1, len(train_loader)))
+    ctc_loss = torch.nn.CTCLoss(blank=0, zero_infinity=True)
+    best_accuracy, best_state = -1.0, None
+
+    for epoch in range(epochs):
+        model.train()
+        total_loss = 0.0
+        for images, targets, lengths in train_loader:
+            log_probs = model(images).permute(1, 0, 2)  # T, N, classes for CTCLoss
+            input_lengths = torch.full((images.shape[0],), log_probs.shape[0], dtype=torch.long)
+            loss = ctc_loss(log_probs, targets, input_lengths, lengths)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            scheduler.step()
+            total_loss += loss.item()
+
+        accuracy = evaluate(model, val_loader)
+        print(f"Epoch {epoch + 1}/{epochs}: loss {total_loss / max(1, len(train_loader)):.4f}, "
+              f"val exact {accuracy:.2%}")
+        if accuracy > best_accuracy:
+            best_accuracy, best_state = accuracy, copy.deepcopy(model.state_dict())
+
+    model.load_state_dict(best_state)
+    export_onnx(model, output_path)
+    return best_accuracy
+
+# ========== ENGINE COMPARISON ==========
+def compare(split_dir, model_path, tesseract_cmd=None, batch_size=32):
+    """Accuracy and latency of EasyOCR + Tesseract vs the CTC recognizer on human-verified crops"""
+    import easyocr
+    import pytesseract
+
+    import plate_ocr
+    from benchmark import edit_distance
+
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    items = load_labeled_crops(split_dir)
+    crops = [cv2.imread(path) for path, _ in items]
+    items, crops = zip(*[(item, crop) for item, crop in zip(items, crops) if crop is not None])
+    labels = [label for _, label in items]
+
+    reader = easyocr.Reader(['en'])
+    recognizer = PlateRecognizer(model_path)
+
+    def ensemble(crop):
+        processed = plate_ocr.preprocess_plate(crop)
+        return plate_ocr.pick_result(plate_ocr.read_easyocr(reader, processed), plate_ocr.read_tesseract(processed))
+
+    engines = {'easyocr+tesseract': ensemble, 'ctc': lambda crop: recognizer.recognize(crop)[0]}
+    print(f"{len(crops)} verified crops")
+    print(f"{'engine':<20}{'exact':>8}{'cer':>8}{'p50':>10}{'p95':>10}")
+    for name, engine in engines.items():
+        latencies, exact, errors = [], 0, 0
+        for crop, label in zip(crops, labels):
+            start = time.perf_counter()
+            predicted = normalize_label(engine(crop))
+            latencies.append((time.perf_counter() - start) * 1000)
+            exact += predicted == label
+            errors += edit_distance(predicted, label)
+        latencies.sort()
+        print(f"{name:<20}{exact / len(labels):>8.2%}{errors / sum(map(len, labels)):>8.2%}"
+              f"{latencies[len(latencies) // 2]:>8.1f}ms{latencies[int(len(latencies) * 0.95)]:>8.1f}ms")
+
+    start = time.perf_counter()
+    for offset in range(0, len(crops), batch_size):
+        recognizer.recognize_batch(list(crops[offset:offset + batch_size]))
+    elapsed = time.perf_counter() - start
+    print(f"ctc batched ({batch_size}): {len(crops) / elapsed:.0f} crops/s")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Train, export and evaluate the CTC plate recognizer")
+    commands = parser.add_subparsers(dest='command', required=True)
+    sub = commands.add_parser('train')
+    sub.add_argument('data', help="dataset_builder.py ocr/ directory with train/ and val/")
+    sub.add_argument('--output', default=os.path.join('models', 'plate_ctc.onnx'))
+    sub.add_argument('--epochs', type=int, default=40)
+    sub.add_argument('--batch', type=int, default=64)
+    sub.add_argument('--lr', type=float, default=1e-3)
+    sub.add_argument('--include-unverified', action='store_true',
+                     help="Also train on pseudo-labels from the ensemble (validation stays verified)")
+    sub = commands.add_parser('compare')
+    sub.add_argument('crops', help="Labeled crop split (crops + labels.tsv)")
+    sub.add_argument('--model', default=os.path.join('models', 'plate_ctc.onnx'))
+    sub.add_argument('--tesseract-cmd', help="Path to the tesseract binary")
+    args = parser.parse_args()
+
+    if args.command == 'train':
+        train(args.data, args.output, args.epochs, args.batch, args.lr, verified_only=not args.include_unverified)
+    else:
+        compare(args.crops, args.model, args.tesseract_cmd)
@@ -0,0 +1,96 @@
+#plate_rectify.py
+#
+# Plate rectification between detection and OCR. YOLO boxes are axis
+# aligned, so a plate seen from an angled gate camera arrives skewed, with
+# background in the corners. The rectifier looks for the plate outline in a
+# slightly padded crop of the frame, then warps the four corners to a fixed
+# canonical size:
+#
+#   1. Edges -> the largest convex 4-point contour (approxPolyDP) covering
+#      enough of the crop.
+#   2. Otherwise the minAreaRect of the largest bright blob (the plate
+#      background); this handles rotation but not perspective.
+#   3. Otherwise the plain YOLO crop, resized to the canonical size.
+#
+# Preprocessing and OCR always see the same small image size, whatever the
+# distance to the camera.
+
+import cv2
+import numpy as np
+
+SINGLE_ROW_SIZE = (384, 96)  # width, height; Ethiopian plates are ~4.6:1
+DOUBLE_ROW_SIZE = (256, 128)  # Square-ish two-row plates (motorcycles, some foreign)
+
+def order_corners(points):
+    """Corners as float32 [top-left, top-right, bottom-right, bottom-left]"""
+    points = np.asarray(points, np.float32).reshape(4, 2)
+    total = points.sum(1)
+    diff = points[:, 1] - points[:, 0]
+    return np.array([points[total.argmin()], points[diff.argmin()],
+                     points[total.argmax()], points[diff.argmax()]], np.float32)
+
+def find_plate_quad(crop, min_area_fraction=0.3):
+    """(corners, method) for the plate outline in the crop, or (None, None)"""
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+    area = gray.shape[0] * gray.shape[1]
+    gray = cv2.bilateralFilter(gray, 7, 50, 50)
+
+    edges = cv2.dilate(cv2.Canny(gray, 50, 150), None)
+    contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+    for contour in sorted(contours, key=cv2.contourArea, reverse=True)[:5]:
+        if cv2.contourArea(contour) < min_area_fraction * area:
+            break
+        approx = cv2.approxPolyDP(contour, 0.03 * cv2.arcLength(contour, True), True)
+        if len(approx) == 4 and cv2.isContourConvex(approx):
+            return order_corners(approx), 'polygon'
+
+    _, bright = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    contours, _ = cv2.findContours(bright, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if contours:
+        largest = max(contours, key=cv2.contourArea)
+        if cv2.contourArea(largest) >= min_area_fraction * area:
+            return order_corners(cv2.boxPoints(cv2.minAreaRect(largest))), 'min_area_rect'
+    return None, None
+
+class PlateRectifier:
+    """Deskew/perspective-correct plate crops to a canonical size"""
+    def __init__(self, pad=0.1, min_area_fraction=0.3, double_row_aspect=2.5):
+        self.pad = pad  # Box growth per side, so corners cut off by a tight box are still found
+        self.min_area_fraction = min_area_fraction
+        self.double_row_aspect = double_row_aspect  # Below this width/height the plate has two rows
+        self.counts = {'polygon': 0, 'min_area_rect': 0, 'fallback': 0}
+
+    def canonical_size(self, corners):
+        top_left, top_right, bottom_right, bottom_left = corners
+        width = (np.linalg.norm(top_right - top_left) + np.linalg.norm(bottom_right - bottom_left)) / 2
+        height = (np.linalg.norm(bottom_left - top_left) + np.linalg.norm(bottom_right - top_right)) / 2
+        return DOUBLE_ROW_SIZE if width < self.double_row_aspect * max(height, 1) else SINGLE_ROW_SIZE
+
+    def rectify(self, frame, box):
+        """Rectified plate image for an (x1, y1, x2, y2) box in the frame"""
+        x1, y1, x2, y2 = box
+        frame_h, frame_w = frame.shape[:2]
+        pad_x, pad_y = int((x2 - x1) * self.pad), int((y2 - y1) * self.pad)
+        px1, py1 = max(0, x1 - pad_x), max(0, y1 - pad_y)
+        px2, py2 = min(frame_w, x2 + pad_x), min(frame_h, y2 + pad_y)
+        region = frame[py1:py2, px1:px2]
+
+        corners, method = find_plate_quad(region, self.min_area_fraction) if region.size else (None, None)
+        if corners is None:
+            self.counts['fallback'] += 1
+            crop = frame[y1:y2, x1:x2]
+            if not crop.size:
+                return crop
+            size = DOUBLE_ROW_SIZE if (x2 - x1) < self.double_row_aspect * max(y2 - y1, 1) else SINGLE_ROW_SIZE
+            return cv2.resize(crop, size, interpolation=cv2.INTER_AREA if crop.shape[1] > size[0] else cv2.INTER_CUBIC)
+
+        self.counts[method] += 1
+        width, height = self.canonical_size(corners)
+        target = np.array([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]], np.float32)
+        matrix = cv2.getPerspectiveTransform(corners, target)
+        return cv2.warpPerspective(region, matrix, (width, height), flags=cv2.INTER_LINEAR,
+                                   borderMode=cv2.BORDER_REPLICATE)
+
+    def stats(self):
+        total = sum(self.counts.values())
+        return dict(self.counts, rectified_rate=round((total - self.counts['fallback']) / total, 4) if total else 0.0)
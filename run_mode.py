@@ -0,0 +1,173 @@
+#run_mode.py
+#
+# How the recognition loop runs. The mode comes from run_mode.json (next to
+# the script), and the GATE_RUN_MODE environment variable overrides it:
+#
+#   {"mode": "debug", "viewer": "mjpeg", "viewer_port": 8081}
+#
+#   production  no display work at all. There is no GUI probe at startup and
+#               nothing is shown per attempt. This is the default.
+#   debug       results go to a viewer that never blocks recognition:
+#                 "window"  OpenCV windows, drawn from the viewer's own thread
+#                 "mjpeg"   http://127.0.0.1:8081/ (one MJPEG stream per window)
+#   benchmark   headless like production. Decisions are not cached, so repeat
+#               frames of the same plate are measured instead of answered
+#               from decision_cache.py.
+#   collect     production plus training samples: every recorded attempt's
+#               plate boxes are saved next to its frame for dataset_builder.py.
+#
+# Callers hand frames to FrameViewer.show(), which only replaces the latest
+# frame per window. Drawing and JPEG encoding happen on viewer threads at
+# `fps`, so a slow display or client never delays a gate decision.
+
+import json
+import os
+import threading
+import time
+from urllib.parse import quote
+
+MODES = ('production', 'debug', 'benchmark', 'collect')
+VIEWERS = ('window', 'mjpeg')
+CONFIG_PATH = "run_mode.json"
+
+class RunMode:
+    """Run mode settings"""
+    def __init__(self, mode='production', viewer='window', viewer_port=8081, viewer_host='127.0.0.1', viewer_fps=10):
+        if mode not in MODES:
+            raise ValueError(f"Unknown run mode {mode!r}, expected one of {MODES}")
+        if viewer not in VIEWERS:
+            raise ValueError(f"Unknown viewer {viewer!r}, expected one of {VIEWERS}")
+        self.mode = mode
+        self.viewer = viewer
+        self.viewer_port = viewer_port
+        self.viewer_host = viewer_host
+        self.viewer_fps = viewer_fps
+
+    @classmethod
+    def load(cls, path=CONFIG_PATH):
+        """Settings from `path` if it exists, with GATE_RUN_MODE taking precedence for the mode"""
+        settings = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                settings = json.load(f)
+        if os.environ.get('GATE_RUN_MODE'):
+            settings['mode'] = os.environ['GATE_RUN_MODE']
+        return cls(**settings)
+
+    @property
+    def display(self):
+        return self.mode == 'debug'
+
+    @property
+    def cache_decisions(self):
+        return self.mode != 'benchmark'
+
+    @property
+    def save_training_samples(self):
+        return self.mode == 'collect'
+
+    def create_viewer(self):
+        """A started FrameViewer in debug mode, otherwise None"""
+        if not self.display:
+            return None
+        return FrameViewer(self.viewer, self.viewer_port, self.viewer_host, self.viewer_fps).start()
+
+class FrameViewer:
+    """Shows the latest frame per window without ever blocking the caller"""
+    def __init__(self, backend='window', port=8081, host='127.0.0.1', fps=10):
+        self.backend = backend
+        self.port = port
+        self.host = host
+        self.interval = 1.0 / fps
+        self.frames = {}  # window name -> (version, frame)
+        self.version = 0
+        self.updated = threading.Condition()
+        self.running = False
+        self.thread = None
+
+    def show(self, name, frame):
+        with self.updated:
+            self.version += 1
+            self.frames[name] = (self.version, frame)
+            self.updated.notify_all()
+
+    def start(self):
+        self.running = True
+        target = self.window_loop if self.backend == 'window' else self.serve_mjpeg
+        self.thread = threading.Thread(target=target, name=f"viewer-{self.backend}", daemon=True)
+        self.thread.start()
+        if self.backend == 'mjpeg':
+            print(f"Debug viewer at http://{self.host}:{self.port}/")
+        return self
+
+    def stop(self):
+        self.running = False
+        with self.updated:
+            self.updated.notify_all()
+        if self.thread and self.backend == 'window':
+            self.thread.join(timeout=3)
+
+    def wait_for_update(self, seen, timeout, names=None):
+        """Frames newer than version `seen` (only `names` if given), as {name: (version, frame)}"""
+        def newer():
+            return {name: entry for name, entry in self.frames.items()
+                    if entry[0] > seen and (names is None or name in names)}
+
+        with self.updated:
+            self.updated.wait_for(lambda: not self.running or newer(), timeout)
+            return newer()
+
+    # ========== WINDOW BACKEND ==========
+    def window_loop(self):
+        """Owns the HighGUI windows; a missing display just ends the viewer"""
+        import cv2
+
+        seen = 0
+        try:
+            while self.running:
+                for name, (version, frame) in self.wait_for_update(seen, self.interval).items():
+                    cv2.imshow(name, frame)
+                    seen = max(seen, version)
+                cv2.waitKey(1)
+        except cv2.error as e:
+            print(f"GUI not available - debug viewer stopped ({e})")
+            self.running = False
+        finally:
+            try:
+                cv2.destroyAllWindows()
+            except cv2.error:
+                pass
+
+    # ========== MJPEG BACKEND ==========
+    def stream(self, name):
+        """multipart/x-mixed-replace body for one window, at most `fps` frames per second"""
+        import cv2
+
+        seen = 0
+        while self.running:
+            entry = self.wait_for_update(seen, 1.0, {name}).get(name)
+            if entry is None:
+                continue
+            seen, frame = entry
+            ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+            if ok:
+                yield b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + jpeg.tobytes() + b"\r\n"
+            time.sleep(self.interval)
+
+    def serve_mjpeg(self):
+        from flask import Flask, Response
+
+        viewer_app = Flask('viewer')
+
+        @viewer_app.route('/')
+        def index():
+            with self.updated:
+                names = sorted(self.frames)
+            images = ''.join(f'<h3>{name}</h3><img src="/stream/{quote(name)}">' for name in names)
+            return f"<html><body>{images or 'No frames yet - reload after the first detection'}</body></html>"
+
+        @viewer_app.route('/stream/<name>')
+        def stream(name):
+            return Response(self.stream(name), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+        viewer_app.run(host=self.host, port=self.port, threaded=True)
@@ -0,0 +1,265 @@
+#shard_dataset.py
+#
+# Packs a dataset of many small image/label files into a few large shard
+# files, and reads them back through mmap:
+#
+#   python shard_dataset.py pack-yolo data/voc2012_yolo data/voc2012_packed
+#   python shard_dataset.py pack-benchmark bench_images data/bench_packed
+#
+# Each split directory (<output>/train, <output>/val, or <output>/test for
+# benchmark packs) holds:
+#   shard-00000.bin ...  JPEG bytes followed by UTF-8 label bytes, per sample
+#   index.npy            one INDEX_DTYPE row per sample
+#   names.txt            original file name per sample
+# Labels are the YOLO label file text for pack-yolo and the plate text for
+# pack-benchmark.
+#
+# Train on a YOLO pack with ShardDetectionTrainer (the pack's data.yaml
+# points train/val at the split directories), or replay a benchmark pack
+# with `python benchmark.py data/bench_packed/test --shards`.
+
+import argparse
+import mmap
+import os
+
+import cv2
+import numpy as np
+import yaml
+from PIL import Image
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+INDEX_DTYPE = np.dtype([('shard', '<u4'), ('offset', '<u8'), ('length', '<u4'), ('label_length', '<u4'),
+                        ('height', '<u4'), ('width', '<u4')])
+
+# ========== PACKER ==========
+def pack_records(records, split_dir, shard_mb=512):
+    """Write (name, image_path, label_text) records into shards; returns the sample count"""
+    os.makedirs(split_dir, exist_ok=True)
+    shard_bytes = shard_mb * 1024 * 1024
+    index = []
+    names = []
+    shard_id = 0
+    shard = None
+    try:
+        for name, image_path, label in records:
+            with open(image_path, 'rb') as f:
+                data = f.read()
+            with Image.open(image_path) as image:
+                width, height = image.size  # Header only, no decode
+            label_bytes = label.encode('utf-8')
+
+            if shard is None or (shard.tell() and shard.tell() + len(data) + len(label_bytes) > shard_bytes):
+                if shard:
+                    shard.close()
+                    shard_id += 1
+                shard = open(os.path.join(split_dir, f"shard-{shard_id:05d}.bin"), 'wb')
+            index.append((shard_id, shard.tell(), len(data), len(label_bytes), height, width))
+            names.append(name)
+            shard.write(data)
+            shard.write(label_bytes)
+    finally:
+        if shard:
+            shard.close()
+
+    np.save(os.path.join(split_dir, 'index.npy'), np.array(index, dtype=INDEX_DTYPE))
+    with open(os.path.join(split_dir, 'names.txt'), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(names))
+    return len(names)
+
+def pack_yolo(yolo_dir, output_dir, shard_mb=512):
+    """Pack a YOLO dataset (images/<split>, labels/<split>, data.yaml) per split"""
+    for split in ['train', 'val']:
+        image_dir = os.path.join(yolo_dir, 'images', split)
+        if not os.path.isdir(image_dir):
+            continue
+        files = sorted(name for name in os.listdir(image_dir) if name.lower().endswith(IMAGE_EXTENSIONS))
+
+        def records():
+            for name in files:
+                label_path = os.path.join(yolo_dir, 'labels', split, os.path.splitext(name)[0] + '.txt')
+                label = open(label_path).read() if os.path.exists(label_path) else ''
+                yield name, os.path.join(image_dir, name), label
+
+        count = pack_records(records(), os.path.join(output_dir, split), shard_mb)
+        print(f"Packed {count} {split} samples")
+
+    with open(os.path.join(yolo_dir, 'data.yaml')) as f:
+        data = yaml.safe_load(f)
+    data.update(path=os.path.abspath(output_dir), train='train', val='val')
+    with open(os.path.join(output_dir, 'data.yaml'), 'w') as f:
+        yaml.safe_dump(data, f, sort_keys=False)
+
+def pack_benchmark(dataset_dir, output_dir, shard_mb=512):
+    """Pack the images of a benchmark folder with their plate labels (videos are skipped)"""
+    from benchmark import dataset_files
+
+    records = ((name, os.path.join(dataset_dir, name), label)
+               for name, label in dataset_files(dataset_dir)
+               if name.lower().endswith(IMAGE_EXTENSIONS))
+    count = pack_records(records, os.path.join(output_dir, 'test'), shard_mb)
+    print(f"Packed {count} benchmark images")
+
+# ========== READER ==========
+class ShardReader:
+    """Random access to a packed split through memory-mapped shards"""
+    def __init__(self, split_dir):
+        self.split_dir = split_dir
+        self.index = np.load(os.path.join(split_dir, 'index.npy'))
+        with open(os.path.join(split_dir, 'names.txt'), encoding='utf-8') as f:
+            self.names = f.read().split('\n') if len(self.index) else []
+        self.maps = {}
+        self.pid = os.getpid()
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getstate__(self):
+        # mmaps cannot be pickled; DataLoader workers reopen their own
+        state = self.__dict__.copy()
+        state['maps'] = {}
+        return state
+
+    def shard(self, shard_id):
+        if self.pid != os.getpid():
+            self.maps, self.pid = {}, os.getpid()  # Forked worker: don't share the parent's maps
+        shard_map = self.maps.get(shard_id)
+        if shard_map is None:
+            with open(os.path.join(self.split_dir, f"shard-{shard_id:05d}.bin"), 'rb') as f:
+                shard_map = self.maps[shard_id] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return shard_map
+
+    def image_bytes(self, i):
+        entry = self.index[i]
+        offset = int(entry['offset'])
+        return memoryview(self.shard(int(entry['shard'])))[offset:offset + int(entry['length'])]
+
+    def image(self, i):
+        """Decoded BGR image"""
+        return cv2.imdecode(np.frombuffer(self.image_bytes(i), np.uint8), cv2.IMREAD_COLOR)
+
+    def label(self, i):
+        entry = self.index[i]
+        start = int(entry['offset']) + int(entry['length'])
+        return self.shard(int(entry['shard']))[start:start + int(entry['label_length'])].decode('utf-8')
+
+    def shape(self, i):
+        return int(self.index[i]['height']), int(self.index[i]['width'])
+
+    def close(self):
+        for shard_map in self.maps.values():
+            shard_map.close()
+        self.maps = {}
+
+# ========== ULTRALYTICS TRAINING ==========
+def _ultralytics_classes():
+    """Dataset/trainer subclasses, defined lazily so packing does not need ultralytics"""
+    from ultralytics.data.dataset import YOLODataset
+    from ultralytics.models.yolo.detect import DetectionTrainer
+    from ultralytics.utils.torch_utils import de_parallel
+
+    class ShardYOLODataset(YOLODataset):
+        """YOLODataset whose images and labels come from a packed split"""
+        def get_img_files(self, img_path):
+            self.reader = ShardReader(img_path)
+            return [os.path.join(img_path, name) for name in self.reader.names]
+
+        def get_labels(self):
+            labels = []
+            for i, im_file in enumerate(self.im_files):
+                rows = np.array([line.split() for line in self.reader.label(i).splitlines() if line.strip()],
+                                dtype=np.float32).reshape(-1, 5)
+                labels.append({
+                    'im_file': im_file,
+                    'shape': self.reader.shape(i),
+                    'cls': rows[:, :1],
+                    'bboxes': rows[:, 1:],
+                    'segments': [],
+                    'keypoints': None,
+                    'normalized': True,
+                    'bbox_format': 'xywh'
+                })
+            return labels
+
+        def load_image(self, i, rect_mode=True):
+            """BaseDataset.load_image with the file read replaced by a shard read"""
+            if self.ims[i] is not None:
+                return self.ims[i], self.im_hw0[i], self.im_hw[i]
+            im = self.reader.image(i)
+            if im is None:
+                raise FileNotFoundError(f"Image not decodable: {self.im_files[i]}")
+            h0, w0 = im.shape[:2]
+            if rect_mode:  # Resize long side to imgsz, keep aspect ratio
+                r = self.imgsz / max(h0, w0)
+                if r != 1:
+                    w, h = (min(int(np.ceil(w0 * r)), self.imgsz), min(int(np.ceil(h0 * r)), self.imgsz))
+                    im = cv2.resize(im, (w, h), interpolation=cv2.INTER_LINEAR)
+            elif not (h0 == w0 == self.imgsz):
+                im = cv2.resize(im, (self.imgsz, self.imgsz), interpolation=cv2.INTER_LINEAR)
+
+            if self.augment:  # Mosaic needs recently loaded images
+                self.ims[i], self.im_hw0[i], self.im_hw[i] = im, (h0, w0), im.shape[:2]
+                self.buffer.append(i)
+                if len(self.buffer) >= self.max_buffer_length:
+                    j = self.buffer.pop(0)
+                    self.ims[j], self.im_hw0[j], self.im_hw[j] = None, None, None
+            return im, (h0, w0), im.shape[:2]
+
+    class ShardDetectionTrainer(DetectionTrainer):
+        """DetectionTrainer reading packed splits instead of image folders"""
+        def build_dataset(self, img_path, mode='train', batch=None):
+            gs = max(int(de_parallel(self.model).stride.max() if self.model else 0), 32)
+            return ShardYOLODataset(
+                img_path=img_path,
+                imgsz=self.args.imgsz,
+                batch_size=batch,
+                augment=mode == 'train',
+                hyp=self.args,
+                rect=self.args.rect or mode == 'val',
+                cache=None,  # Shards are already the cache
+                single_cls=self.args.single_cls or False,
+                stride=gs,
+                pad=0.0 if mode == 'train' else 0.5,
+                prefix=f"{mode}: ",
+                task=self.args.task,
+                classes=self.args.classes,
+                data=self.data,
+                fraction=self.args.fraction if mode == 'train' else 1.0
+            )
+
+    return ShardYOLODataset, ShardDetectionTrainer
+
+def train(pack_dir, model='yolov8n.pt', epochs=100, imgsz=640, batch=16):
+    """Train a detector on a packed YOLO dataset"""
+    _, ShardDetectionTrainer = _ultralytics_classes()
+    trainer = ShardDetectionTrainer(overrides={
+        'model': model,
+        'data': os.path.join(pack_dir, 'data.yaml'),
+        'epochs': epochs,
+        'imgsz': imgsz,
+        'batch': batch
+    })
+    trainer.train()
+    return trainer
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Pack datasets into memory-mapped shards")
+    commands = parser.add_subparsers(dest='command', required=True)
+    for command in ['pack-yolo', 'pack-benchmark']:
+        sub = commands.add_parser(command)
+        sub.add_argument('source', help="YOLO dataset root" if command == 'pack-yolo' else "Benchmark folder")
+        sub.add_argument('output', help="Packed dataset directory")
+        sub.add_argument('--shard-mb', type=int, default=512, help="Target shard size")
+    sub = commands.add_parser('train')
+    sub.add_argument('pack', help="Packed YOLO dataset directory")
+    sub.add_argument('--model', default='yolov8n.pt')
+    sub.add_argument('--epochs', type=int, default=100)
+    sub.add_argument('--imgsz', type=int, default=640)
+    sub.add_argument('--batch', type=int, default=16)
+    args = parser.parse_args()
+
+    if args.command == 'pack-yolo':
+        pack_yolo(args.source, args.output, args.shard_mb)
+    elif args.command == 'pack-benchmark':
+        pack_benchmark(args.source, args.output, args.shard_mb)
+    else:
+        train(args.pack, args.model, args.epochs, args.imgsz, args.batch)
@@ -1,9 +1,16 @@
-#include <Arduino.h> 
+#include <Arduino.h>
 #include <Servo.h>
 
+// Protocol is documented in gate_protocol.py. Everything in loop() is
+// driven by millis() timers so serial commands are handled while the
+// gate is open and the sensor keeps sampling.
+
 Servo gateServo;
 bool gateOpen = false;
-const unsigned long GATE_OPEN_DURATION = 10000; // 10 seconds
+bool holdOpen = false;
+unsigned long gateOpenDuration = 10000; // 10 seconds, changed with DURATION
+unsigned long gateOpenedAt = 0;
+const unsigned long MAX_HOLD = 120000;  // HOLD closes by itself after this if the host never sends CLOSE
 
 // Ultrasonic sensor pins
 const int triggerPin = 6;
@@ -11,6 +18,25 @@ const int echoPin = 7;
 const int servoPin = 9;
 const int detectionThreshold = 30; // 30cm detection range
 
+// Sampling and reporting
+const unsigned long SAMPLE_INTERVAL = 60;    // Ultrasonic needs ~60ms between pings
+const unsigned long ECHO_TIMEOUT = 30000;    // us, ~5m max range
+const unsigned long DETECT_REPEAT = 1000;    // Re-send DETECTED while a vehicle waits
+const int DETECT_SAMPLES = 3;                // Consecutive samples to change presence
+unsigned long streamInterval = 200;          // DIST report period, 0 = off, set with RATE
+unsigned long lastSample = 0;
+unsigned long lastStream = 0;
+unsigned long lastDetect = 0;
+long lastDistance = 0;
+bool vehiclePresent = false;
+int presenceCount = 0;
+
+// Serial command buffer
+const int COMMAND_BUFFER_SIZE = 32;
+char commandBuffer[COMMAND_BUFFER_SIZE];
+int commandLength = 0;
+bool inCommand = false;
+
 void setup() {
   pinMode(triggerPin, OUTPUT);
   pinMode(echoPin, INPUT);
@@ -26,42 +52,154 @@ long getDistance() {
   digitalWrite(triggerPin, HIGH);
   delayMicroseconds(10);
   digitalWrite(triggerPin, LOW);
-  return pulseIn(echoPin, HIGH) * 0.034 / 2; // Convert to cm
+  return pulseIn(echoPin, HIGH, ECHO_TIMEOUT) * 0.034 / 2; // Convert to cm, 0 on timeout
 }
 
 void closeGate() {
   gateServo.write(0); // Close gate
   gateOpen = false;
+  holdOpen = false;
   Serial.println("CLOSED");
 }
 
-void openGate() {
+void openGate(bool hold) {
   gateServo.write(120); // Open gate
-  gateOpen = true;
-  Serial.println("OPENED");
-  delay(GATE_OPEN_DURATION); 
-  closeGate(); // Close gate after duration
+  holdOpen = hold;
+  gateOpenedAt = millis(); // Re-opening restarts the timer
+  if (!gateOpen) {
+    gateOpen = true;
+    Serial.println("OPENED");
+  }
 }
 
-void loop() {
-  // Automatic ultrasonic detection
-  int distance = getDistance();
-  if (distance > 0 && distance < detectionThreshold && !gateOpen) {
-    Serial.println("DETECTED"); // Send detection signal to Python
-    delay(1000); // Debounce delay
+void acknowledge(long seq, const char* name) {
+  Serial.print("ACK ");
+  Serial.print(seq);
+  Serial.print(' ');
+  Serial.println(name);
+}
+
+void reject(long seq, const char* reason) {
+  Serial.print("NAK ");
+  Serial.print(seq);
+  Serial.print(' ');
+  Serial.println(reason);
+}
+
+// Handle ">seq NAME [arg]"
+void handleCommand(char* line) {
+  char* seqText = strtok(line, " ");
+  char* name = strtok(NULL, " ");
+  char* argText = strtok(NULL, " ");
+  if (seqText == NULL || name == NULL) {
+    return;
+  }
+  long seq = atol(seqText);
+  long arg = argText != NULL ? atol(argText) : -1;
+
+  if (strcmp(name, "OPEN") == 0) {
+    acknowledge(seq, name);
+    openGate(false);
+  } else if (strcmp(name, "HOLD") == 0) {
+    acknowledge(seq, name);
+    openGate(true);
+  } else if (strcmp(name, "CLOSE") == 0) {
+    acknowledge(seq, name);
+    closeGate();
+  } else if (strcmp(name, "RATE") == 0 || strcmp(name, "DURATION") == 0) {
+    if (arg < 0) {
+      reject(seq, "BADARG");
+      return;
+    }
+    acknowledge(seq, name);
+    if (name[0] == 'R') {
+      streamInterval = arg;
+    } else {
+      gateOpenDuration = arg;
+    }
+  } else if (strcmp(name, "PING") == 0) {
+    acknowledge(seq, name);
+  } else {
+    reject(seq, "UNKNOWN");
+  }
+}
+
+void readSerial() {
+  while (Serial.available() > 0) {
+    char c = Serial.read();
+
+    if (!inCommand) {
+      // Legacy single-byte commands
+      if (c == '1' && !gateOpen) {
+        openGate(false);
+      } else if (c == '0') {
+        closeGate();
+      } else if (c == '>') {
+        inCommand = true;
+        commandLength = 0;
+      }
+      continue;
+    }
+
+    if (c == '\n' || c == '\r') {
+      commandBuffer[commandLength] = '\0';
+      inCommand = false;
+      handleCommand(commandBuffer);
+    } else if (commandLength < COMMAND_BUFFER_SIZE - 1) {
+      commandBuffer[commandLength++] = c;
+    } else {
+      inCommand = false; // Overlong line, drop it
+    }
   }
+}
 
-  // Handle serial commands from Python
-  if (Serial.available() > 0) {
-    char command = Serial.read();
-    
-    if (command == '1' && !gateOpen) {
-      openGate();
-    } 
-    else if (command == '0') {
-      closeGate();
+void updateSensor(unsigned long now) {
+  if (now - lastSample < SAMPLE_INTERVAL) {
+    return;
+  }
+  lastSample = now;
+  lastDistance = getDistance();
+
+  bool inRange = lastDistance > 0 && lastDistance < detectionThreshold;
+  if (inRange != vehiclePresent) {
+    presenceCount++;
+    if (presenceCount >= DETECT_SAMPLES) {
+      vehiclePresent = inRange;
+      presenceCount = 0;
+      // PRESENT/CLEAR report every edge, whatever the gate state
+      Serial.println(vehiclePresent ? "PRESENT" : "CLEAR");
+      lastDetect = 0;
     }
+  } else {
+    presenceCount = 0;
+  }
+
+  // Send detection signal to Python while a vehicle waits at a closed gate
+  if (vehiclePresent && !gateOpen && (lastDetect == 0 || now - lastDetect >= DETECT_REPEAT)) {
+    Serial.println("DETECTED");
+    lastDetect = now;
   }
 
-  delay(100);
-}
\ No newline at end of file
+  if (streamInterval > 0 && now - lastStream >= streamInterval) {
+    Serial.print("DIST ");
+    Serial.println(lastDistance);
+    lastStream = now;
+  }
+}
+
+void updateGate(unsigned long now) {
+  if (!gateOpen || vehiclePresent) {
+    return; // Never lower the boom onto a vehicle
+  }
+  unsigned long limit = holdOpen ? MAX_HOLD : gateOpenDuration;
+  if (now - gateOpenedAt >= limit) {
+    closeGate(); // Close gate after duration, or after MAX_HOLD if the host went away
+  }
+}
+
+void loop() {
+  unsigned long now = millis();
+  readSerial();
+  updateSensor(now);
+  updateGate(now);
+}
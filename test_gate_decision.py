@@ -0,0 +1,108 @@
+#test_gate_decision.py
+#
+# GateDecisionService safety rules against a sim:// gate (no hardware):
+#
+#   python -m pytest -q test_gate_decision.py
+#
+# Like the controller tests in test_gate_protocol.py these need the
+# recognition dependencies and are skipped without them. Policy times are
+# scaled down to fractions of a second.
+
+import time
+
+import pytest
+
+from gate_decision import GateDecisionService
+from gate_protocol import SIMULATED_PORT
+
+PRESENT = 10  # cm, inside the simulator's detection threshold
+CLEAR = 400
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+@pytest.fixture
+def controller():
+    lpr = pytest.importorskip('license_plate_recognition')
+    controller = lpr.ArduinoGateController(port=SIMULATED_PORT)
+    yield controller
+    controller.stop_reader()
+    controller.serial_conn.close()
+
+@pytest.fixture
+def service(controller):
+    service = GateDecisionService(controller, name='test', debounce=0.05, min_open=0.2, max_hold=0.5,
+                                  clear_delay=0.3, cooldown=5.0, tick=0.01).start()
+    yield service
+    service.stop()
+
+def drive_through(controller):
+    """Move a vehicle under the sensor and out again"""
+    controller.serial_conn.distance = PRESENT
+    assert wait_until(lambda: controller.vehicle_present)
+    time.sleep(0.05)  # A few service ticks, so the service sees it
+    controller.serial_conn.distance = CLEAR
+    assert wait_until(lambda: not controller.vehicle_present)
+    time.sleep(0.05)
+
+def test_closes_after_vehicle_clears(controller, service):
+    service.post('3AA12345', True)
+    assert wait_until(lambda: controller.gate_status)
+    drive_through(controller)
+    assert wait_until(lambda: service.stats()['closed'] == 1)
+    assert not controller.gate_status
+
+def test_never_closes_onto_vehicle(controller, service):
+    controller.serial_conn.distance = PRESENT
+    assert wait_until(lambda: controller.vehicle_present)
+    service.post('3AA12345', True)
+    assert wait_until(lambda: controller.gate_status)
+    time.sleep(service.max_hold * 2)
+    assert controller.gate_status  # Past max_hold, but the vehicle is still there
+
+    controller.serial_conn.distance = CLEAR
+    assert wait_until(lambda: service.stats()['forced_close'] == 1)
+    assert not controller.gate_status
+
+def test_tailgating_alarm_refuses_admission(controller, service):
+    service.post('3AA12345', True)
+    assert wait_until(lambda: controller.gate_status)
+    drive_through(controller)
+    controller.serial_conn.distance = PRESENT  # A second vehicle before the gate closed
+    assert wait_until(lambda: service.stats()['alarm'])
+
+    service.post('3AA54321', True)
+    assert wait_until(lambda: service.stats()['refused'] == 1)
+    time.sleep(service.clear_delay * 2)
+    assert controller.gate_status  # Not lowered onto the tailgater
+
+    controller.serial_conn.distance = CLEAR
+    assert wait_until(lambda: not service.stats()['alarm'])  # Reset when the gate closes
+    assert service.stats()['tailgating'] == 1 and not controller.gate_status
+
+def test_cooldown_after_passing(controller, service):
+    service.post('3AA12345', True)
+    assert wait_until(lambda: controller.gate_status)
+    drive_through(controller)
+    assert wait_until(lambda: not controller.gate_status)
+
+    service.post('3AA12345', True)
+    assert wait_until(lambda: service.stats()['cooldown'] == 1)
+    assert not controller.gate_status
+
+def test_replaced_admission_keeps_cooldown(controller, service):
+    controller.serial_conn.distance = PRESENT
+    assert wait_until(lambda: controller.vehicle_present)
+    service.post('3AA12345', True)
+    assert wait_until(lambda: controller.gate_status)
+    service.post('3AA54321', True)  # Next vehicle admitted on the same opening
+    assert wait_until(lambda: service.stats()['extended'] == 1)
+
+    time.sleep(service.debounce * 2)  # A new request, not a merged repeat
+    service.post('3AA12345', True)
+    assert wait_until(lambda: service.stats()['cooldown'] == 1)
@@ -0,0 +1,86 @@
+#test_gate_protocol.py
+#
+# Host/Arduino protocol checks against SimulatedGateDevice (no hardware):
+#
+#   python -m pytest -q test_gate_protocol.py
+#
+# The controller tests need the recognition dependencies (cv2, ultralytics,
+# ...) because ArduinoGateController lives in license_plate_recognition.py;
+# they are skipped when those are not installed.
+
+import time
+
+import pytest
+
+from gate_protocol import SIMULATED_PORT, SimulatedGateDevice, encode_command, parse_line
+
+def read_until(device, names, seq=None, timeout=1.0):
+    """First event named in `names` (with `seq` for ACK/NAK), or None after `timeout`"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        event = parse_line(device.readline().decode())
+        if event and event.name in names and (seq is None or event.seq == seq):
+            return event
+    return None
+
+@pytest.fixture
+def device():
+    device = SimulatedGateDevice(timeout=0.05)
+    assert read_until(device, ('READY',)) is not None
+    yield device
+    device.close()
+
+# ========== SIMULATOR ==========
+def test_open_hold_close(device):
+    device.write(encode_command(1, 'OPEN'))
+    assert read_until(device, ('ACK',), seq=1).value == 'OPEN'
+    assert read_until(device, ('OPENED',)) is not None
+
+    device.write(encode_command(2, 'HOLD'))
+    assert read_until(device, ('ACK',), seq=2).value == 'HOLD'
+    assert device.gate_open and device.hold_open
+
+    device.write(encode_command(3, 'CLOSE'))
+    assert read_until(device, ('ACK',), seq=3).value == 'CLOSE'
+    assert read_until(device, ('CLOSED',)) is not None
+    assert not device.gate_open
+
+def test_nak(device):
+    device.write(encode_command(4, 'RATE'))  # Missing argument
+    event = read_until(device, ('ACK', 'NAK'), seq=4)
+    assert event.name == 'NAK' and event.value == 'BADARG'
+
+    device.write(b">5 JUMP\n")
+    event = read_until(device, ('ACK', 'NAK'), seq=5)
+    assert event.name == 'NAK' and event.value == 'UNKNOWN'
+
+def test_reply_timeout(device):
+    device.reply_delay = 0.5
+    device.write(encode_command(6, 'PING'))
+    assert read_until(device, ('ACK', 'NAK'), seq=6, timeout=0.2) is None
+    assert read_until(device, ('ACK',), seq=6, timeout=1.0) is not None  # Arrives late
+
+# ========== CONTROLLER ==========
+@pytest.fixture
+def controller():
+    lpr = pytest.importorskip('license_plate_recognition')
+    controller = lpr.ArduinoGateController(port=SIMULATED_PORT)
+    yield controller
+    controller.stop_reader()
+    controller.serial_conn.close()
+
+def test_controller_commands(controller):
+    controller.open_gate()
+    assert controller.gate_status
+    controller.hold_gate()
+    assert controller.serial_conn.hold_open
+    controller.close_gate()
+    assert not controller.gate_status
+    assert not controller.send_command('RATE')  # NAK BADARG
+
+def test_controller_drops_late_ack(controller):
+    controller.ack_timeout = 0.2
+    controller.serial_conn.reply_delay = 0.5
+    assert not controller.send_command('PING')
+    time.sleep(0.6)
+    assert controller.acks == {} and controller.awaiting == set()
@@ -0,0 +1,203 @@
+#tracing.py
+
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+_current_event = contextvars.ContextVar('trace_event', default=None)
+
+class _NullSpan:
+    """Shared no-op span handed out while tracing is disabled"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record_span(self.name, self.start, time.time(), **self.args)
+        return False
+
+class TraceEvent:
+    """All spans belonging to one detection, for Chrome trace dumps"""
+    def __init__(self, name, start=None):
+        self.name = name
+        self.start = time.time() if start is None else start
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def add(self, name, start, end, args):
+        with self.lock:
+            self.spans.append((name, start, end, threading.get_ident(), args))
+
+    def chrome_trace(self):
+        """Trace in the chrome://tracing / Perfetto JSON format"""
+        with self.lock:
+            spans = list(self.spans)
+        return {'traceEvents': [{
+            'name': name,
+            'ph': 'X',
+            'ts': int(start * 1e6),
+            'dur': int((end - start) * 1e6),
+            'pid': os.getpid(),
+            'tid': tid,
+            'args': args
+        } for name, start, end, tid, args in spans]}
+
+class _EventScope:
+    def __init__(self, tracer, name, start):
+        self.tracer = tracer
+        self.event = TraceEvent(name, start)
+
+    def __enter__(self):
+        self.token = _current_event.set(self.event)
+        return self.event
+
+    def __exit__(self, *exc):
+        _current_event.reset(self.token)
+        end = time.time()
+        self.tracer.record_span(self.event.name, self.event.start, end, event=self.event)
+        self.tracer.maybe_dump(self.event, end - self.event.start)
+        return False
+
+class Tracer:
+    """Per-stage latency spans with percentile summaries.
+
+    Spans inside `with tracer.event('detection'):` are also collected per
+    event, and events slower than `slow_event_ms` are written to
+    `trace_dir` as Chrome trace JSON. Worker threads only see the current
+    event if they are submitted through `contextvars.copy_context().run`.
+    """
+    def __init__(self, enabled=True, max_samples=2048, slow_event_ms=None, trace_dir=None):
+        self.enabled = enabled
+        self.max_samples = max_samples  # Recent samples kept per stage for percentiles
+        self.slow_event_ms = slow_event_ms
+        self.trace_dir = trace_dir
+        self.stages = {}  # name -> [recent durations deque, count, total seconds]
+        self.lock = threading.Lock()
+
+    def span(self, name, **args):
+        """Context manager timing one stage"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def event(self, name, start=None):
+        """Context manager grouping the spans of one end-to-end event.
+
+        `start` backdates the event, e.g. to when the sensor fired.
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _EventScope(self, name, start)
+
+    def record_span(self, name, start, end, event=None, **args):
+        """Record a stage measured elsewhere, e.g. from an Arduino timestamp"""
+        if not self.enabled:
+            return
+        duration = end - start
+        with self.lock:
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = self.stages[name] = [deque(maxlen=self.max_samples), 0, 0.0]
+            stage[0].append(duration)
+            stage[1] += 1
+            stage[2] += duration
+        event = event or _current_event.get()
+        if event is not None:
+            event.add(name, start, end, args)
+
+    def reset(self):
+        """Drop all recorded samples"""
+        with self.lock:
+            self.stages = {}
+
+    def percentiles(self, name, quantiles=(0.5, 0.95, 0.99)):
+        with self.lock:
+            stage = self.stages.get(name)
+            samples = sorted(stage[0]) if stage else []
+        if not samples:
+            return {}
+        return {q: samples[min(len(samples) - 1, int(q * len(samples)))] for q in quantiles}
+
+    def summary(self):
+        """{stage: {'count', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms'}}"""
+        with self.lock:
+            totals = {name: (stage[1], stage[2]) for name, stage in self.stages.items()}
+        report = {}
+        for name, (count, total) in sorted(totals.items()):
+            pct = self.percentiles(name)
+            report[name] = {
+                'count': count,
+                'mean_ms': round(total / count * 1000, 2),
+                'p50_ms': round(pct[0.5] * 1000, 2),
+                'p95_ms': round(pct[0.95] * 1000, 2),
+                'p99_ms': round(pct[0.99] * 1000, 2)
+            }
+        return report
+
+    def prometheus_text(self, metric='gate_stage_seconds'):
+        """Stage latencies in the Prometheus text exposition format"""
+        lines = [f"# HELP {metric} Latency of each gate pipeline stage",
+                 f"# TYPE {metric} summary"]
+        with self.lock:
+            totals = {name: (stage[1], stage[2]) for name, stage in self.stages.items()}
+        for name, (count, total) in sorted(totals.items()):
+            for q, value in self.percentiles(name).items():
+                lines.append(f'{metric}{{stage="{name}",quantile="{q}"}} {value:.6f}')
+            lines.append(f'{metric}_sum{{stage="{name}"}} {total:.6f}')
+            lines.append(f'{metric}_count{{stage="{name}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def maybe_dump(self, event, duration):
+        """Write a Chrome trace for events slower than slow_event_ms"""
+        if self.slow_event_ms is None or not self.trace_dir or duration * 1000 < self.slow_event_ms:
+            return None
+        os.makedirs(self.trace_dir, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        path = os.path.join(self.trace_dir, f"{event.name}_{timestamp}.json")
+        with open(path, 'w') as f:
+            json.dump(event.chrome_trace(), f)
+        print(f"Slow {event.name} ({duration * 1000:.0f} ms) - trace saved to: {path}")
+        return path
+
+# ========== METRICS ENDPOINT ==========
+def register_metrics_route(app, tracer, extra=None):
+    """Add a Prometheus-style /metrics route to a Flask app.
+
+    `extra` is an optional callable returning more exposition text.
+    """
+    from flask import Response
+
+    def metrics():
+        text = tracer.prometheus_text() + (extra() if extra else '')
+        return Response(text, mimetype='text/plain; version=0.0.4')
+
+    app.add_url_rule('/metrics', 'metrics', metrics)
+
+def serve_metrics(tracer, port=9100, host='127.0.0.1', extra=None):
+    """Serve /metrics from a background thread in processes without a web app"""
+    from flask import Flask
+
+    metrics_app = Flask('metrics')
+    register_metrics_route(metrics_app, tracer, extra)
+    thread = threading.Thread(target=metrics_app.run, kwargs={'host': host, 'port': port},
+                              name="metrics", daemon=True)
+    thread.start()
+    return thread
@@ -2,6 +2,8 @@ import cv2
 import pytesseract
 import numpy as np
 
+from plate_ethiopic import ETHIOPIC, LATIN, EthiopicPlateReader, plate_text
+
 # Configure Tesseract path (if not in system PATH)
 # pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 
@@ -40,16 +42,18 @@ def recognize_amharic_plate(image_path):
         if processed is None:
             return None
         
-        # OCR with both Amharic and English
-        custom_config = r'--oem 3 --psm 6'
-        text = pytesseract.image_to_string(processed, lang='amh+eng', config=custom_config)
+        # Layout-aware read: code, region and number segments
+        plate = EthiopicPlateReader().read(cv2.imread(image_path))
+        text = plate.raw if plate else ''
         
-        # Clean and format the output
-        allowed_chars = set('0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZአኡኢኣኤእኦኧከኩኪካኬክኮኯ')  # Add more Amharic chars as needed
+        # Clean and format the output (full Ethiopic block, not a hand-picked subset)
+        allowed_chars = set('0123456789' + LATIN + ETHIOPIC)
         cleaned_text = ''.join(c for c in text if c.upper() in allowed_chars or c.isspace())
         
         print("Raw OCR Output:", text)
         print("Cleaned Plate:", cleaned_text.strip())
+        if plate:
+            print("Canonical Plate:", plate_text(plate))
         
         # Display processed image
         cv2.imshow("Processed Plate", processed)
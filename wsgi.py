@@ -0,0 +1,15 @@
+#wsgi.py
+#
+# Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Importing app loads the YOLO and EasyOCR models once in the gunicorn
+# master (preload_app), so forked workers share those pages copy-on-write.
+# Firestore is connected per worker in gunicorn.conf.py's post_fork.
+
+import gc
+
+from app import app
+
+# Move everything loaded so far out of the GC's reach so collections in the
+# workers don't write to (and un-share) the preloaded model pages
+gc.freeze()